@@ -0,0 +1,70 @@
+"""Compare latency and retained content of the compression modes on a built knowledge base.
+
+Usage (from the repository root):
+    python src/Benchmarks/compression_benchmark.py --kb <name> "first query" "second query"
+
+The LLM extractor output is used as the reference; for every other mode the
+benchmark reports how much of the reference's vocabulary it kept.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Settings.config import RETRIEVAL_SETTINGS, EMBEDDING_SETTINGS
+from Core.kb_version import get_kb_path
+from Core.compressors import COMPRESSION_MODES, build_compressor
+from Core.vector_store import open_vector_store, maximal_marginal_relevance
+from Core.embedding_backends import build_embedding_backend
+
+def token_set(docs):
+    return set(re.findall(r"\w+", " ".join(doc.page_content for doc in docs).lower()))
+
+def run(kb, queries, repeats):
+    embedding_function = build_embedding_backend(EMBEDDING_SETTINGS)
+    store = open_vector_store(get_kb_path(kb), embedding_function)
+    compressors = {mode: build_compressor(mode, embedding_function, RETRIEVAL_SETTINGS["compression_max_chars"]) for mode in COMPRESSION_MODES}
+
+    results = {mode: {"latencies": [], "chars": [], "overlap": []} for mode in COMPRESSION_MODES}
+    for query in queries:
+        query_embedding = embedding_function.embed_query(query)
+        candidates, embeddings = store.search(query_embedding, RETRIEVAL_SETTINGS["fetch_k"])
+        picked = maximal_marginal_relevance(query_embedding, embeddings, RETRIEVAL_SETTINGS["top_k"], RETRIEVAL_SETTINGS["mmr_lambda"])
+        docs = [candidates[i] for i in picked]
+
+        outputs = {}
+        for mode, compressor in compressors.items():
+            for _ in range(repeats):
+                start = time.perf_counter()
+                outputs[mode] = compressor.compress_documents(docs, query, query_embedding=query_embedding)
+                results[mode]["latencies"].append(time.perf_counter() - start)
+            results[mode]["chars"].append(sum(len(doc.page_content) for doc in outputs[mode]))
+
+        reference = token_set(outputs["llm"])
+        for mode in COMPRESSION_MODES:
+            kept = token_set(outputs[mode])
+            results[mode]["overlap"].append(len(reference & kept) / len(reference) if reference else 1.0)
+
+    summary = {}
+    for mode, stats in results.items():
+        summary[mode] = {
+            "mean_latency_s": sum(stats["latencies"]) / len(stats["latencies"]),
+            "mean_chars": sum(stats["chars"]) / len(stats["chars"]),
+            "mean_reference_overlap": sum(stats["overlap"]) / len(stats["overlap"]),
+        }
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kb", required=True, help="Knowledge base to query")
+    parser.add_argument("--repeats", type=int, default=1, help="Compression runs per query and mode")
+    parser.add_argument("queries", nargs="+")
+    args = parser.parse_args()
+    print(json.dumps(run(args.kb, args.queries, args.repeats), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Measure embedding throughput of the configured embedding backends.
+
+Embeds synthetic chunk-sized texts in batches the way ingestion does and
+single queries the way retrieval does, and reports chunks per second and
+query latency percentiles for each backend as JSON. The OpenAI backend makes
+real API calls, so it is skipped unless OPENAI_API_KEY is set.
+
+Usage (from the repository root):
+    python src/Benchmarks/embedding_benchmark.py --backends hashing,openai --chunks 2000 --queries 50
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from Settings.config import EMBEDDING_SETTINGS, INGEST_SETTINGS
+from Core.embedding_backends import build_embedding_backend
+
+WORDS = [
+    "router", "firmware", "sensor", "battery", "kitchen", "garden", "printer", "camera", "thermostat",
+    "schedule", "network", "password", "update", "voltage", "speaker", "display", "backup", "calendar",
+    "the", "a", "and", "of", "to", "with", "after", "before", "when", "is", "was", "should", "must",
+]
+
+def synthetic_text(rng, chars):
+    words = []
+    length = 0
+    while length < chars:
+        word = rng.choice(WORDS) if rng.random() > 0.05 else f"E{rng.randint(100, 9999)}"
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+def measure(backend, texts, queries, batch_size):
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        backend.embed_documents(texts[i:i + batch_size])
+    seconds = time.perf_counter() - start
+
+    latencies = []
+    for query in queries:
+        query_start = time.perf_counter()
+        backend.embed_query(query)
+        latencies.append(time.perf_counter() - query_start)
+
+    return {
+        "model": backend.model,
+        "dimensions": len(backend.embed_query(queries[0])),
+        "chunks_per_second": len(texts) / seconds if seconds else 0.0,
+        "query_p50_ms": float(np.percentile(latencies, 50)) * 1000,
+        "query_p95_ms": float(np.percentile(latencies, 95)) * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="hashing,openai")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=INGEST_SETTINGS["embedding_batch_size"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    texts = [synthetic_text(rng, args.chunk_chars) for _ in range(args.chunks)]
+    queries = [synthetic_text(rng, 40) for _ in range(args.queries)]
+
+    report = {"parameters": vars(args), "results": []}
+    for name in [name for name in args.backends.split(",") if name]:
+        if name == "openai" and not os.environ.get("OPENAI_API_KEY"):
+            print("Skipping openai: OPENAI_API_KEY is not set", file=sys.stderr)
+            continue
+        backend = build_embedding_backend(dict(EMBEDDING_SETTINGS, backend=name))
+        stats = measure(backend, texts, queries, args.batch_size)
+        stats["backend"] = name
+        report["results"].append(stats)
+        print(f"{name} ({stats['model']}): {stats['chunks_per_second']:.1f} chunks/s, "
+              f"query p50 {stats['query_p50_ms']:.2f}ms", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Measure the CPU cost of streaming a response into the chat window.
+
+Streams synthetic tokens from a worker thread into a Tk text widget, once the
+old way (insert, see and update_idletasks for every token, called from the
+worker) and once through the ChatRenderer queue drained at a fixed frame
+rate, and reports process CPU time, wall time and widget inserts as JSON.
+Needs a display, since it creates a real Tk window.
+
+Usage (from the repository root):
+    python src/Benchmarks/render_benchmark.py --tokens 3000 --tokens-per-second 150 --fps 20
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from UI.chat_renderer import ChatRenderer
+from UI.transcript import ChatTranscript
+
+class ListHistory:
+    # Finished messages in memory; the benchmark only measures drawing
+    def __init__(self):
+        self.messages = []
+
+    def count(self):
+        return len(self.messages)
+
+    def append(self, segments):
+        self.messages.append(segments)
+
+    def load(self, start, stop):
+        return self.messages[start:stop]
+
+def synthetic_tokens(rng, count):
+    words = ["the", "router", "should", "restart", "after", "the", "firmware", "update", "finishes", "and", "then"]
+    return [(" " if rng.random() > 0.1 else "\n") + rng.choice(words) for _ in range(count)]
+
+def stream(root, tokens, tokens_per_second, emit, done):
+    def worker():
+        for token in tokens:
+            emit(token)
+            time.sleep(1 / tokens_per_second)
+        done()
+    threading.Thread(target=worker, daemon=True).start()
+    root.mainloop()
+
+def measure_direct(tokens, tokens_per_second):
+    root = tk.Tk()
+    text = tk.Text(root)
+    text.pack()
+    inserts = [0]
+
+    def emit(token):
+        text.insert("end", token, "bot_stream")
+        text.see("end")
+        root.update_idletasks()
+        inserts[0] += 1
+
+    wall, cpu = time.monotonic(), time.process_time()
+    stream(root, tokens, tokens_per_second, emit, lambda: root.after(0, root.quit))
+    result = {"cpu_ms": (time.process_time() - cpu) * 1000, "wall_s": time.monotonic() - wall, "inserts": inserts[0]}
+    root.destroy()
+    return result
+
+def measure_queued(tokens, tokens_per_second, fps):
+    root = tk.Tk()
+    text = tk.Text(root)
+    text.pack()
+    transcript = ChatTranscript(ListHistory())
+    transcript.attach(text)
+    renderer = ChatRenderer(root, transcript, fps=fps)
+    renderer.begin_stream()
+    renderer.begin_message()
+    stats = renderer.stream
+
+    def done():
+        renderer.end_stream()
+        # Quit once the renderer has drawn the end of the stream
+        def wait():
+            if renderer.stream is None:
+                root.quit()
+            else:
+                root.after(renderer.interval_ms, wait)
+        root.after(0, wait)
+
+    wall, cpu = time.monotonic(), time.process_time()
+    stream(root, tokens, tokens_per_second, renderer.write, done)
+    result = {"cpu_ms": (time.process_time() - cpu) * 1000, "wall_s": time.monotonic() - wall,
+              "inserts": stats["inserts"], "frames": stats["frames"]}
+    root.destroy()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=3000)
+    parser.add_argument("--tokens-per-second", type=float, default=150)
+    parser.add_argument("--fps", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    tokens = synthetic_tokens(random.Random(args.seed), args.tokens)
+    report = {"parameters": vars(args), "results": {}}
+    for mode, run in [("direct", lambda: measure_direct(tokens, args.tokens_per_second)),
+                      ("queued", lambda: measure_queued(tokens, args.tokens_per_second, args.fps))]:
+        result = run()
+        result["cpu_percent"] = 100 * result["cpu_ms"] / 1000 / result["wall_s"] if result["wall_s"] else 0.0
+        report["results"][mode] = result
+        print(f"{mode}: {result['cpu_ms']:.0f}ms CPU over {result['wall_s']:.1f}s "
+              f"({result['cpu_percent']:.0f}%), {result['inserts']} inserts", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
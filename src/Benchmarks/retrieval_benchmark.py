@@ -0,0 +1,257 @@
+"""Offline retrieval micro-benchmark for ContextManager.query_vector_database.
+
+Builds synthetic knowledge bases under a temporary KB_PATH/CHROMA_PATH, replaces
+OpenAIEmbeddings and ChatOpenAI with deterministic local stand-ins that can
+simulate API latency, and reports latency percentiles, throughput and peak RSS
+for every combination of the given parameters as JSON.
+
+Usage (from the repository root):
+    python src/Benchmarks/retrieval_benchmark.py --kb-counts 1,4 --chunks 200,2000 \\
+        --compression-modes none,extractive,llm --output results.json
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import random
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import langchain_openai
+from langchain.schema import Document
+from langchain_core.language_models.chat_models import SimpleChatModel
+
+class FakeEmbeddings:
+    """Deterministic bag-of-words hashing embeddings with optional simulated latency."""
+
+    model = "fake-embeddings"
+
+    def __init__(self, dimensions=256, latency_ms=0.0, **kwargs):
+        self.dimensions = dimensions
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    def vector(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        time.sleep(self.latency_ms / 1000)
+        return [self.vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self.calls += 1
+        time.sleep(self.latency_ms / 1000)
+        return self.vector(text)
+
+class FakeChatModel(SimpleChatModel):
+    """Stands in for ChatOpenAI in the LLM extractor by echoing the start of the context."""
+
+    latency_ms: float = 0.0
+    extract_chars: int = 300
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency_ms / 1000)
+        prompt = messages[-1].content
+        match = re.search(r">>>\n(.*?)\n>>>", prompt, re.S)
+        return (match.group(1) if match else prompt)[:self.extract_chars]
+
+WORDS = [
+    "router", "firmware", "sensor", "battery", "kitchen", "garden", "printer", "camera", "thermostat",
+    "schedule", "network", "password", "update", "voltage", "speaker", "display", "backup", "calendar",
+    "invoice", "warranty", "manual", "install", "reset", "signal", "storage", "cable", "module", "driver",
+]
+
+def synthetic_text(rng, chunk_chars):
+    words = []
+    length = 0
+    while length < chunk_chars:
+        if rng.random() < 0.05:
+            word = f"{rng.choice('ABCDEFGH')}{rng.randint(100, 9999)}"
+        else:
+            word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+        if rng.random() < 0.08:
+            words[-1] += "."
+    return " ".join(words)
+
+def patch_environment(kb_path, chroma_path, embed_latency_ms, llm_latency_ms):
+    # Modules import the paths with "from Settings.config import ...", so each copy is patched
+    import Settings.config as config
+    config.KB_PATH = kb_path
+    config.CHROMA_PATH = chroma_path
+    for name, module in list(sys.modules.items()):
+        if name.startswith("Core.") and module is not None:
+            if hasattr(module, "KB_PATH"):
+                module.KB_PATH = kb_path
+            if hasattr(module, "CHROMA_PATH"):
+                module.CHROMA_PATH = chroma_path
+
+    embeddings = FakeEmbeddings(latency_ms=embed_latency_ms)
+    factory = lambda *args, **kwargs: embeddings
+    for name, module in list(sys.modules.items()):
+        if name.startswith("Core.") and module is not None and hasattr(module, "OpenAIEmbeddings"):
+            module.OpenAIEmbeddings = factory
+    langchain_openai.OpenAIEmbeddings = factory
+    langchain_openai.ChatOpenAI = lambda *args, **kwargs: FakeChatModel(latency_ms=llm_latency_ms)
+    return embeddings
+
+def build_kbs(knowledge_manager, kb_names, chunks_per_kb, chunk_chars, seed):
+    rng = random.Random(seed)
+    texts = {}
+    for kb in kb_names:
+        documents = [
+            Document(page_content=synthetic_text(rng, chunk_chars), metadata={"source": f"{kb}/doc_{i}.txt"})
+            for i in range(chunks_per_kb)
+        ]
+        chunks = knowledge_manager.split_text(documents)
+        knowledge_manager.save_to_chroma(chunks, kb)
+        texts[kb] = [doc.page_content for doc in documents]
+    return texts
+
+def make_queries(texts, count, seed):
+    rng = random.Random(seed)
+    corpus = [text for kb_texts in texts.values() for text in kb_texts]
+    queries = []
+    for _ in range(count):
+        words = rng.choice(corpus).split()
+        start = rng.randrange(max(1, len(words) - 8))
+        queries.append(" ".join(words[start:start + rng.randint(3, 8)]))
+    return queries
+
+def percentile(values, q):
+    return float(np.percentile(np.asarray(values), q)) if values else 0.0
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_config(context_manager, kb_names, queries, warmup):
+    for query in queries[:warmup]:
+        context_manager.query_vector_database(query, kb_names)
+
+    latencies = []
+    start = time.perf_counter()
+    for query in queries:
+        query_start = time.perf_counter()
+        context_manager.query_vector_database(query, kb_names)
+        latencies.append(time.perf_counter() - query_start)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "throughput_qps": len(queries) / elapsed if elapsed else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+def str_list(value):
+    return [v for v in value.split(",") if v]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kb-counts", type=int_list, default=[1, 2, 4])
+    parser.add_argument("--chunks", type=int_list, default=[200, 1000], help="Chunks per knowledge base")
+    parser.add_argument("--chunk-chars", type=int, default=800)
+    parser.add_argument("--fetch-k", type=int_list, default=[20])
+    parser.add_argument("--top-k", type=int_list, default=[6])
+    parser.add_argument("--compression-modes", type=str_list, default=["none", "extractive"])
+    parser.add_argument("--retrieval-modes", type=str_list, default=["vector", "hybrid"])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--semantic-cache", action="store_true", help="Leave the semantic cache enabled")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="openpi-bench-")
+    kb_path = os.path.join(workdir, "Knowledge")
+    chroma_path = os.path.join(workdir, "Databases")
+    os.makedirs(kb_path)
+    os.makedirs(chroma_path)
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+    from Settings.config import RETRIEVAL_SETTINGS, INGEST_SETTINGS
+    import Core.knowledge_manager
+    import Core.context_manager
+    embeddings = patch_environment(kb_path, chroma_path, args.embed_latency_ms, args.llm_latency_ms)
+
+    RETRIEVAL_SETTINGS["query_cache_path"] = None
+    INGEST_SETTINGS["embedding_cache_path"] = os.path.join(chroma_path, "embedding_cache.sqlite")
+    if not args.semantic_cache:
+        RETRIEVAL_SETTINGS["semantic_cache_threshold"] = 2.0  # Cosine similarity never reaches this
+
+    report = {"parameters": vars(args), "results": []}
+    try:
+        knowledge_manager = Core.knowledge_manager.KnowledgeManager(None)
+        for chunks_per_kb in args.chunks:
+            kb_names = [f"bench_{chunks_per_kb}_{i}" for i in range(max(args.kb_counts))]
+            build_start = time.perf_counter()
+            texts = build_kbs(knowledge_manager, kb_names, chunks_per_kb, args.chunk_chars, args.seed)
+            build_seconds = time.perf_counter() - build_start
+            queries = make_queries(texts, args.queries + args.warmup, args.seed + 1)
+
+            for kb_count, fetch_k, top_k, compression_mode, retrieval_mode in itertools.product(
+                args.kb_counts, args.fetch_k, args.top_k, args.compression_modes, args.retrieval_modes
+            ):
+                RETRIEVAL_SETTINGS["fetch_k"] = fetch_k
+                RETRIEVAL_SETTINGS["top_k"] = top_k
+                RETRIEVAL_SETTINGS["retrieval_mode"] = retrieval_mode
+                RETRIEVAL_SETTINGS["compression_mode"] = compression_mode
+                context_manager = Core.context_manager.ContextManager(None)
+                embeddings.calls = 0
+
+                stats = run_config(context_manager, kb_names[:kb_count], queries[args.warmup:], args.warmup)
+                stats.update({
+                    "kb_count": kb_count,
+                    "chunks_per_kb": chunks_per_kb,
+                    "fetch_k": fetch_k,
+                    "top_k": top_k,
+                    "compression_mode": compression_mode,
+                    "retrieval_mode": retrieval_mode,
+                    "build_seconds": build_seconds,
+                    "embedding_calls": embeddings.calls,
+                })
+                report["results"].append(stats)
+                context_manager.executor.shutdown(wait=False)
+                print(f"kb={kb_count} chunks={chunks_per_kb} fetch_k={fetch_k} top_k={top_k} "
+                      f"{retrieval_mode}/{compression_mode}: p50={stats['p50_ms']:.1f}ms p95={stats['p95_ms']:.1f}ms",
+                      file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
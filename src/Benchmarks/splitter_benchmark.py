@@ -0,0 +1,106 @@
+"""Compare the streaming splitter with langchain's RecursiveCharacterTextSplitter.
+
+Splits synthetic multi-megabyte documents with each splitter and reports
+throughput, chunk counts and sizes, and memory use measured with tracemalloc:
+the peak traced size while splitting, and the number of memory blocks
+allocated during the split that are still alive afterwards.
+
+Usage (from the repository root):
+    python src/Benchmarks/splitter_benchmark.py --sizes-mb 1,4 --repeats 3
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from Core.text_splitter import StreamingTextSplitter
+from Core.context_packer import count_tokens
+
+WORDS = [
+    "router", "firmware", "sensor", "battery", "kitchen", "garden", "printer", "camera", "thermostat",
+    "schedule", "network", "password", "update", "voltage", "speaker", "display", "backup", "calendar",
+    "the", "a", "and", "of", "to", "with", "after", "before", "when", "is", "was", "should", "must",
+]
+
+def synthetic_document(rng, size_bytes):
+    paragraphs = []
+    length = 0
+    while length < size_bytes:
+        sentences = []
+        for _ in range(rng.randint(1, 8)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(4, 30))]
+            sentences.append(" ".join(words).capitalize() + rng.choice([".", ".", "?", "!"]))
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+def build_splitters():
+    return {
+        "recursive_chars_1000": RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, add_start_index=True),
+        "streaming_chars_1000": StreamingTextSplitter(1000, 200, unit="chars"),
+        "streaming_tokens_250": StreamingTextSplitter(250, 50, unit="tokens"),
+    }
+
+def measure(splitter, document, repeats):
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        chunks = splitter.split_documents([document])
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    chunks = splitter.split_documents([document])
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+
+    tokens = [count_tokens(chunk.page_content) for chunk in chunks]
+    best = min(seconds)
+    return {
+        "seconds": best,
+        "mb_per_second": len(document.page_content) / (1024 * 1024) / best if best else 0.0,
+        "chunks": len(chunks),
+        "mean_chunk_tokens": sum(tokens) / len(tokens) if tokens else 0.0,
+        "max_chunk_tokens": max(tokens) if tokens else 0,
+        "peak_traced_mb": peak / (1024 * 1024),
+        "retained_blocks": blocks,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", default="1,4", help="Comma separated document sizes in megabytes")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report = {"parameters": vars(args), "results": []}
+    for size_mb in [float(size) for size in args.sizes_mb.split(",") if size]:
+        document = Document(page_content=synthetic_document(rng, int(size_mb * 1024 * 1024)), metadata={"source": "synthetic"})
+        for name, splitter in build_splitters().items():
+            stats = measure(splitter, document, args.repeats)
+            stats.update({"splitter": name, "size_mb": size_mb})
+            report["results"].append(stats)
+            print(f"{name} {size_mb}MB: {stats['mb_per_second']:.2f} MB/s, {stats['chunks']} chunks, "
+                  f"peak {stats['peak_traced_mb']:.1f}MB", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Compare the NumPy vector store backend with Chroma on recall and latency.
+
+Writes the same synthetic clustered embeddings into a Chroma store and into
+NumPy stores at each vector precision, then reports time to open a store,
+search latency percentiles, recall@k against exact float32 search, and the
+size on disk, as JSON.
+
+Usage (from the repository root):
+    python src/Benchmarks/vector_store_benchmark.py --chunks 2000,10000 --dimensions 1536 --queries 100
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from Core.vector_store import ChromaStore, NumpyStore, VECTOR_DTYPES, NUMPY_DIR
+from Core.retriever_pool import directory_size
+
+def synthetic_embeddings(rng, count, dimensions, clusters=50):
+    centers = rng.standard_normal((clusters, dimensions)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.6 * rng.standard_normal((count, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def make_queries(rng, vectors, count):
+    # Perturbed copies of stored vectors, like a question paraphrasing a chunk
+    picked = vectors[rng.integers(0, len(vectors), count)]
+    queries = picked + 0.5 * rng.standard_normal(picked.shape).astype(np.float32) / np.sqrt(vectors.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+def exact_top_k(vectors, queries, k):
+    scores = queries @ vectors.T
+    return [set(np.argsort(-row)[:k].tolist()) for row in scores]
+
+def open_store(backend, path):
+    if backend == "chroma":
+        return ChromaStore(path, None)
+    return NumpyStore(os.path.join(path, NUMPY_DIR), backend.split("-")[1])
+
+def measure(backend, path, vectors, queries, truth, k, batch_size=1000):
+    ids = [str(i) for i in range(len(vectors))]
+    start = time.perf_counter()
+    store = open_store(backend, path)
+    for i in range(0, len(ids), batch_size):
+        batch = slice(i, i + batch_size)
+        store.add(ids[batch], [f"chunk {j}" for j in ids[batch]], [{"source": "synthetic"}] * len(ids[batch]), vectors[batch])
+    store.close()
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    store = open_store(backend, path)
+    open_ms = (time.perf_counter() - start) * 1000
+
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        query_start = time.perf_counter()
+        docs, _ = store.search(query.tolist(), k)
+        latencies.append(time.perf_counter() - query_start)
+        hits += len({int(doc.page_content.split()[1]) for doc in docs} & expected)
+    store.close()
+
+    return {
+        "build_seconds": build_seconds,
+        "open_ms": open_ms,
+        "first_query_ms": latencies[0] * 1000,
+        "p50_ms": float(np.percentile(latencies, 50)) * 1000,
+        "p95_ms": float(np.percentile(latencies, 95)) * 1000,
+        "recall_at_k": hits / (len(queries) * k),
+        "disk_mb": directory_size(path) / (1024 * 1024),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", default="2000,10000", help="Comma separated store sizes")
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--backends", default="chroma," + ",".join(f"numpy-{dtype}" for dtype in VECTOR_DTYPES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    workdir = tempfile.mkdtemp(prefix="openpi-vector-bench-")
+    report = {"parameters": vars(args), "results": []}
+    try:
+        for count in [int(count) for count in args.chunks.split(",") if count]:
+            vectors = synthetic_embeddings(rng, count, args.dimensions)
+            queries = make_queries(rng, vectors, args.queries)
+            truth = exact_top_k(vectors, queries, args.k)
+            for backend in [backend for backend in args.backends.split(",") if backend]:
+                path = os.path.join(workdir, f"{backend}_{count}")
+                stats = measure(backend, path, vectors, queries, truth, args.k)
+                stats.update({"backend": backend, "chunks": count})
+                report["results"].append(stats)
+                print(f"{backend} {count} chunks: open {stats['open_ms']:.1f}ms, p50 {stats['p50_ms']:.2f}ms, "
+                      f"recall@{args.k} {stats['recall_at_k']:.3f}, {stats['disk_mb']:.1f}MB", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,9 @@ import threading
 from interpreter import interpreter
 from Core.command_manager import CommandExecutor
 from Core.context_manager import ContextManager
+from Core.context_packer import count_tokens
+from Core.conversation_store import ConversationStore
+from Core.chat_memory import ChatMemory
 from Settings.config import *
 
 class ChatManager:
@@ -16,6 +19,28 @@ class ChatManager:
     self.context_manager = ContextManager(chat_ui)
     self.command_executor = CommandExecutor()
 
+    self.conversation_store = ConversationStore(CONVERSATION_SETTINGS["store_path"])
+    if CONVERSATION_SETTINGS["resume_last_session"]:
+      interpreter.messages = self.conversation_store.resume_last_session(CONVERSATION_SETTINGS["resume_max_messages"])
+    self.saved_messages = len(interpreter.messages)
+
+    self.chat_memory = None
+    if MEMORY_SETTINGS["enabled"]:
+      self.chat_memory = ChatMemory(
+        self.conversation_store,
+        self.context_manager.embedding_function,
+        MEMORY_SETTINGS["path"],
+        dtype=INGEST_SETTINGS["vector_dtype"],
+        top_k=MEMORY_SETTINGS["top_k"],
+        min_score=MEMORY_SETTINGS["min_score"]
+      )
+      # Indexes anything written since the last run, or all history the first time
+      self.chat_memory.index_pending()
+    self.compaction = None
+    if CONVERSATION_SETTINGS["keep_days"] is not None:
+      self.compaction = threading.Thread(target=self.compact_history, daemon=True)
+      self.compaction.start()
+
   def update_selected_kbs(self, selected_kbs):
     self.selected_kbs = selected_kbs
 
@@ -35,21 +60,83 @@ class ChatManager:
           response_generator = self.get_interpreter_response(context=None, query=command_response)
           return response_generator, []
 
+      # Earlier conversations get their fixed share of the budget first
+      token_budget = self.context_token_budget()
+      memory_text, query_embedding = self.recall_memory(user_input, min(MEMORY_SETTINGS["max_tokens"], token_budget))
+      if memory_text:
+          token_budget = max(token_budget - count_tokens(memory_text), 0)
+
       # Query the database if no command is found
       if selected_kbs:
           print(f"Querying selected knowledge bases: {selected_kbs}")
-          context_text, sources = self.context_manager.query_vector_database(user_input, selected_kbs)
+          context_text, sources = self.context_manager.query_vector_database(user_input, selected_kbs, token_budget, query_embedding)
       else:
           context_text, sources = None, []
 
-      response_generator = self.get_interpreter_response(context_text, user_input)
+      response_generator = self.get_interpreter_response(context_text, user_input, memory_text)
 
       return response_generator, sources
 
-  def get_interpreter_response(self, context, query):
-    if context is None:
+  def compact_history(self):
+    self.conversation_store.compact(CONVERSATION_SETTINGS["keep_days"])
+    # Also catches sessions removed by a run that exited before memory was pruned
+    if self.chat_memory is not None:
+      self.chat_memory.prune_pending()
+
+  def recall_memory(self, user_input, token_budget):
+    # Returns the recalled text and the query embedding, if one was needed, for the knowledge base search to reuse
+    if self.chat_memory is None or token_budget <= 0 or self.chat_memory.is_empty():
+      return "", None
+    query_embedding = None
+    try:
+      # Keyword-like queries skip the embedding API here too and only recall by time
+      if self.context_manager.choose_retrieval_mode(user_input) != "lexical":
+        query_embedding = self.context_manager.embed_query(user_input)
+      return self.chat_memory.recall(user_input, query_embedding, token_budget), query_embedding
+    except Exception as e:
+      print(f"Warning: could not recall earlier conversations: {str(e)}")
+      return "", query_embedding
+
+  def save_conversation(self, user_input):
+    # Appends whatever the interpreter added since the last save
+    new_messages = interpreter.messages[self.saved_messages:]
+    self.conversation_store.append_messages(new_messages, query=user_input)
+    self.saved_messages = len(interpreter.messages)
+    if self.chat_memory is not None:
+      self.chat_memory.index_pending()
+
+  def new_conversation(self):
+    interpreter.reset()
+    self.conversation_store.start_session()
+    self.saved_messages = 0
+
+  def context_token_budget(self):
+    # Whatever the live conversation and the reply leave free in the context window
+    conversation_tokens = sum(count_tokens(str(message.get('content', ''))) for message in interpreter.messages)
+    budget = (
+      self.interpreter_settings["context_window"]
+      - self.interpreter_settings["max_tokens"]
+      - RETRIEVAL_SETTINGS["prompt_reserve_tokens"]
+      - conversation_tokens
+    )
+    return max(budget, 0)
+
+  def close(self):
+    # Compaction and memory indexing write to the store, so they finish before it closes
+    if self.compaction is not None:
+      self.compaction.join()
+    if self.chat_memory is not None:
+      self.chat_memory.close()
+    self.conversation_store.close()
+
+  def get_interpreter_response(self, context, query, memory=None):
+    if context is None and not memory:
       prompt = query
     else:
-      prompt = f"Context: {context}\n\nQuery: {query}"
+      prompt = f"Query: {query}"
+      if context is not None:
+        prompt = f"Context: {context}\n\n{prompt}"
+      if memory:
+        prompt = f"Earlier conversations: {memory}\n\n{prompt}"
     print(prompt)
     return interpreter.chat(prompt, display=False, stream=True)
\ No newline at end of file
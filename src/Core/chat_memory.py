@@ -0,0 +1,144 @@
+from concurrent.futures import ThreadPoolExecutor
+from langchain.schema import Document
+import datetime
+import logging
+import shutil
+import json
+import time
+import os
+import re
+from Core.vector_store import NumpyStore, NUMPY_DIR
+from Core.embedding_backends import write_embedding_info, read_embedding_model
+from Core.context_packer import pack_context
+
+MEMORY_FILE = "memory.json"
+
+def exchange_text(exchange):
+    when = time.strftime("%Y-%m-%d %H:%M", time.localtime(exchange["created"]))
+    return f"[{when}] User: {exchange['question']}\nAssistant: {exchange['answer']}"
+
+def time_window(query_text, now=None):
+    # Questions about a day or week can't be matched by meaning, so they select by time instead
+    text = query_text.lower()
+    now = now or time.time()
+    midnight = datetime.datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    if re.search(r"\byesterday\b", text):
+        return midnight - 86400, midnight
+    if re.search(r"\b(today|earlier)\b", text):
+        return midnight, now
+    if re.search(r"\b(last|this|past) week\b", text):
+        return now - 7 * 86400, now
+    return None
+
+class ChatMemory:
+    """Past exchanges from the ConversationStore in their own vector collection.
+
+    Each question and the answer that followed it are embedded together as one
+    document. Indexing follows the store through a cursor on message ids, so
+    exchanges written since the last run, or before memory existed, are picked
+    up by the same catch-up. Exchanges whose session the store has compacted
+    away are pruned the same way. Both run on a background thread. Recall returns the
+    exchanges closest to a query that fit a token budget. Exchanges the
+    interpreter still holds in its own context are left out.
+    """
+
+    def __init__(self, store, embedding_function, path, dtype="float32", top_k=4, min_score=0.8, batch_size=64):
+        self.store = store
+        self.embedding_function = embedding_function
+        self.path = path
+        self.top_k = top_k
+        self.min_score = min_score
+        self.batch_size = batch_size
+
+        model = read_embedding_model(path)
+        if model is not None and model != embedding_function.model:
+            # Memory is derived from the store, so it is simply indexed again with the new model
+            logging.info(f"Chat memory was embedded with {model}, re-indexing it with {embedding_function.model}")
+            shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+        self.vectors = NumpyStore(os.path.join(path, NUMPY_DIR), dtype)
+
+        self.cursor = 0
+        memory_path = os.path.join(path, MEMORY_FILE)
+        if os.path.exists(memory_path):
+            with open(memory_path, "r") as f:
+                self.cursor = json.load(f)["cursor"]
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-memory")
+
+    def is_empty(self):
+        return self.vectors.count() == 0
+
+    def index_pending(self):
+        return self.executor.submit(self.catch_up)
+
+    def catch_up(self):
+        try:
+            while True:
+                exchanges, cursor = self.store.exchanges(self.cursor, self.batch_size * 4)
+                if cursor == self.cursor:
+                    return
+                for i in range(0, len(exchanges), self.batch_size):
+                    batch = exchanges[i:i + self.batch_size]
+                    texts = [exchange_text(exchange) for exchange in batch]
+                    self.vectors.add(
+                        [f"exchange-{exchange['id']}" for exchange in batch],
+                        texts,
+                        [{"session": exchange["session"], "message_id": exchange["id"], "created": exchange["created"]} for exchange in batch],
+                        self.embedding_function.embed_documents(texts)
+                    )
+                self.cursor = cursor
+                self.save_cursor()
+        except Exception as e:
+            logging.error(f"Error indexing chat memory: {str(e)}")
+
+    def prune_pending(self):
+        return self.executor.submit(self.prune)
+
+    def prune(self):
+        try:
+            ids = self.vectors.ids()
+            existing = self.store.existing_messages(int(chunk_id.split("-", 1)[1]) for chunk_id in ids)
+            removed = [chunk_id for chunk_id in ids if int(chunk_id.split("-", 1)[1]) not in existing]
+            if removed:
+                self.vectors.delete(removed)
+                logging.info(f"Removed {len(removed)} exchanges of deleted sessions from chat memory")
+        except Exception as e:
+            logging.error(f"Error pruning chat memory: {str(e)}")
+
+    def save_cursor(self):
+        write_embedding_info(self.path, self.embedding_function)
+        path = os.path.join(self.path, MEMORY_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"cursor": self.cursor}, f)
+        os.replace(path + ".tmp", path)
+
+    def recall(self, query_text, query_embedding, token_budget):
+        """Return earlier exchanges relevant to the query as prompt text, within token_budget."""
+        if token_budget <= 0:
+            return ""
+        docs = {}
+        window = time_window(query_text)
+        if window is not None:
+            for exchange in self.store.exchanges_between(*window, limit=self.top_k * 2):
+                if not self.store.is_live(exchange["session"], exchange["id"]):
+                    metadata = {"message_id": exchange["id"], "created": exchange["created"], "relevance_score": 1.0}
+                    docs[exchange["id"]] = Document(page_content=exchange_text(exchange), metadata=metadata)
+
+        if query_embedding is not None:
+            hits, _ = self.vectors.search(query_embedding, self.top_k * 2)
+            similar = [
+                doc for doc in hits
+                if doc.metadata["relevance_score"] >= self.min_score
+                and not self.store.is_live(doc.metadata["session"], doc.metadata["message_id"])
+            ]
+            for doc in similar[:self.top_k]:
+                docs.setdefault(doc.metadata["message_id"], doc)
+
+        # Exchanges from an asked-about time come first, then the most similar ones
+        packed = pack_context(list(docs.values()), token_budget)
+        # Oldest first, so the exchanges read as the conversation happened
+        return "\n\n".join(doc.page_content for doc in sorted(packed, key=lambda doc: doc.metadata["created"]))
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.vectors.close()
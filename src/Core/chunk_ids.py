@@ -0,0 +1,15 @@
+import hashlib
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8", errors="replace")).hexdigest()
+
+def make_chunk_id(source, start_index, text):
+    # Same source, position and text always give the same ID, across rebuilds and devices
+    key = f"{source}\n{start_index}\n{content_hash(text)}"
+    return hashlib.sha1(key.encode("utf-8", errors="replace")).hexdigest()
+
+def chunk_id(doc):
+    metadata = doc.metadata
+    if metadata.get('chunk_id'):
+        return metadata['chunk_id']
+    return make_chunk_id(metadata.get('source', ''), metadata.get('start_index', -1), doc.page_content)
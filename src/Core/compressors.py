@@ -0,0 +1,99 @@
+from langchain.schema import Document
+import numpy as np
+import re
+
+COMPRESSION_MODES = ["llm", "extractive", "none"]
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n\s*\n')
+
+def split_sentences(text):
+    return [s.strip() for s in SENTENCE_BOUNDARY.split(text) if s and s.strip()]
+
+class LLMCompressor:
+    """Extracts the relevant parts of each document with one LLM call per document."""
+
+    def __init__(self):
+        # Imported here so the other modes work without building an LLM client
+        from langchain.retrievers.document_compressors import LLMChainExtractor
+        from langchain_openai import ChatOpenAI
+        llm = ChatOpenAI(temperature=0, model_name="gpt-4o-mini")
+        self.extractor = LLMChainExtractor.from_llm(llm)
+
+    def compress_documents(self, documents, query, query_embedding=None):
+        compressed = []
+        for doc in self.extractor.compress_documents(documents, query):
+            # The extracted text no longer lines up with the chunk's start_index
+            metadata = dict(doc.metadata)
+            metadata['compressed'] = True
+            compressed.append(Document(page_content=doc.page_content, metadata=metadata))
+        return compressed
+
+class NoCompressor:
+    """Passes retrieved documents through unchanged."""
+
+    def compress_documents(self, documents, query, query_embedding=None):
+        return list(documents)
+
+class ExtractiveCompressor:
+    """Keeps the sentences most similar to the query, without calling an LLM.
+
+    All sentences of all documents are embedded in a single batch and scored
+    against the query embedding at once. Each document keeps its best sentences,
+    in their original order, up to a character budget. The batch goes through
+    the configured embedding function, so with a remote embedding API every
+    query costs one embedding request covering all retrieved sentences, which
+    can be more text than the retrieval itself embedded.
+    """
+
+    def __init__(self, embedding_function, max_chars=500):
+        self.embedding_function = embedding_function
+        self.max_chars = max_chars
+
+    def compress_documents(self, documents, query, query_embedding=None):
+        documents = list(documents)
+        sentences = [split_sentences(doc.page_content) for doc in documents]
+        flat = [s for doc_sentences in sentences for s in doc_sentences]
+        if not flat:
+            return []
+
+        if query_embedding is None:
+            query_embedding = self.embedding_function.embed_query(query)
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        sentence_vectors = np.asarray(self.embedding_function.embed_documents(flat), dtype=np.float32)
+
+        # Cosine similarity of every sentence to the query in one matrix product
+        norms = np.linalg.norm(sentence_vectors, axis=1) * np.linalg.norm(query_vector)
+        scores = sentence_vectors @ query_vector / np.maximum(norms, 1e-12)
+
+        compressed = []
+        offset = 0
+        for doc, doc_sentences in zip(documents, sentences):
+            doc_scores = scores[offset:offset + len(doc_sentences)]
+            offset += len(doc_sentences)
+            if not doc_sentences:
+                continue
+
+            keep = []
+            used = 0
+            for i in np.argsort(-doc_scores):
+                length = len(doc_sentences[i])
+                if keep and used + length > self.max_chars:
+                    continue
+                keep.append(i)
+                used += length
+
+            keep.sort()
+            metadata = dict(doc.metadata)
+            metadata['compression_score'] = float(doc_scores.max())
+            metadata['compressed'] = True
+            compressed.append(Document(page_content=" ".join(doc_sentences[i] for i in keep), metadata=metadata))
+        return compressed
+
+def build_compressor(mode, embedding_function, max_chars=500):
+    if mode == "llm":
+        return LLMCompressor()
+    if mode == "extractive":
+        return ExtractiveCompressor(embedding_function, max_chars)
+    if mode == "none":
+        return NoCompressor()
+    raise ValueError(f"Unknown compression mode: {mode}")
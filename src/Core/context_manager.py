@@ -1,49 +1,270 @@
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
-from langchain.retrievers import ContextualCompressionRetriever
-from langchain.retrievers.document_compressors import LLMChainExtractor
-from langchain_openai import ChatOpenAI
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+import logging
+import heapq
+import math
 import os
-from Settings.config import CHROMA_PATH
+import time
+from Settings.config import CHROMA_PATH, RETRIEVAL_SETTINGS, EMBEDDING_SETTINGS
+from Core.retriever_pool import RetrieverPool
+from Core.embedding_cache import QueryEmbeddingCache
+from Core.compressors import build_compressor
+from Core.vector_store import maximal_marginal_relevance
+from Core.semantic_cache import SemanticCache
+from Core.kb_version import get_kb_version
+from Core.lexical_index import is_keyword_query
+from Core.chunk_ids import chunk_id
+from Core.context_packer import pack_context
+from Core.embedding_backends import build_embedding_backend
+
+RETRIEVAL_MODES = ["vector", "hybrid", "lexical"]
+
+def reciprocal_rank_fusion(ranked_lists, k=60):
+    scores = {}
+    docs = {}
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked):
+            key = (doc.metadata.get('knowledge_base'), chunk_id(doc))
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            docs.setdefault(key, doc)
+
+    fused = []
+    for key in sorted(scores, key=scores.get, reverse=True):
+        doc = docs[key]
+        doc.metadata['relevance_score'] = scores[key]
+        fused.append(doc)
+    return fused
+
+class KBResult:
+    def __init__(self, knowledge_base):
+        self.knowledge_base = knowledge_base
+        self.vector_docs = []
+        self.embeddings = None
+        self.lexical_docs = []
 
 class ContextManager:
     def __init__(self, chat_ui):
         self.chat_ui = chat_ui
-        self.openai_key = os.environ["OPENAI_API_KEY"]
-        self.embedding_function = OpenAIEmbeddings(openai_api_key=self.openai_key)
+        self.embedding_function = build_embedding_backend(EMBEDDING_SETTINGS)
+        self.retriever_pool = RetrieverPool(self.embedding_function, RETRIEVAL_SETTINGS["pool_memory_mb"])
+        self.max_concurrent_kbs = RETRIEVAL_SETTINGS["max_concurrent_kbs"]
+        self.kb_deadline = RETRIEVAL_SETTINGS["kb_deadline_seconds"]
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrent_kbs, thread_name_prefix="kb-retrieval")
+        self.abandoned = {}  # KBs whose search missed its deadline and still holds a worker
+        self.query_cache = QueryEmbeddingCache(
+            self.embedding_function,
+            max_entries=RETRIEVAL_SETTINGS["query_cache_size"],
+            persist_path=RETRIEVAL_SETTINGS["query_cache_path"],
+            max_persisted=RETRIEVAL_SETTINGS["query_cache_persist_size"]
+        )
+        self.semantic_cache = SemanticCache(
+            threshold=RETRIEVAL_SETTINGS["semantic_cache_threshold"],
+            ttl_seconds=RETRIEVAL_SETTINGS["semantic_cache_ttl_seconds"],
+            max_entries=RETRIEVAL_SETTINGS["semantic_cache_size"]
+        )
+        self.retrieval_mode = RETRIEVAL_SETTINGS["retrieval_mode"]
+        self.set_compression_mode(RETRIEVAL_SETTINGS["compression_mode"])
+
+    def set_compression_mode(self, mode):
+        self.compression_mode = mode
+        self.compressor = build_compressor(mode, self.embedding_function, RETRIEVAL_SETTINGS["compression_max_chars"])
 
-    def query_vector_database(self, query_text, selected_kbs):
-        all_compressed_docs = []
+    def warm_up(self, knowledge_base):
+        # Open the KB store ahead of the first query so it is ready when needed
+        self.retriever_pool.get(knowledge_base)
 
-        for kb in selected_kbs:
+    def embed_query(self, query_text):
+        return self.query_cache.embed_query(query_text)
+
+    def retrieve_from_kb(self, kb, query_text, query_embedding, use_lexical, started):
+        started[kb] = time.monotonic()
+
+        # Reuse the pooled store for this knowledge base
+        pooled = self.retriever_pool.get(kb)
+        if pooled is None:
             db_path = os.path.join(CHROMA_PATH, kb)
-            if not os.path.exists(db_path):
-                print(f"Warning: Database for {kb} not found at {db_path}")
-                continue
-
-            # Prepare the DB and retriever for this knowledge base
-            db = Chroma(persist_directory=db_path, embedding_function=self.embedding_function)
-            base_retriever = db.as_retriever(search_type="mmr", search_kwargs={"k": 5, "fetch_k": 25})
-
-            # Set up the contextual compression retriever
-            llm = ChatOpenAI(temperature=0, model_name="gpt-4o-mini")
-            compressor = LLMChainExtractor.from_llm(llm)
-            compression_retriever = ContextualCompressionRetriever(
-                base_compressor=compressor,
-                base_retriever=base_retriever
-            )
-
-            # Retrieve and compress relevant documents
-            compressed_docs = compression_retriever.invoke(query_text)
-            for doc in compressed_docs:
-                doc.metadata['knowledge_base'] = kb  # Add KB info to metadata
-            all_compressed_docs.extend(compressed_docs)
-
-        # Sort all compressed docs by relevance (assuming there's a relevance score in metadata)
-        all_compressed_docs.sort(key=lambda x: x.metadata.get('relevance_score', 0), reverse=True)
-
-        # Take the top 10 most relevant documents
-        top_docs = all_compressed_docs[:10]
+            print(f"Warning: Database for {kb} not found at {db_path}")
+            return None
+
+        # Search with the shared query vector; compression happens after the global merge
+        result = KBResult(kb)
+        if query_embedding is not None and pooled.embedding_model not in (None, self.embedding_function.model):
+            # Vectors from different models aren't comparable; lexical results are still valid
+            print(f"Warning: {kb} was embedded with {pooled.embedding_model} but queries use "
+                  f"{self.embedding_function.model}, skipping its vector search until it is rebuilt")
+        elif query_embedding is not None:
+            result.vector_docs, result.embeddings = pooled.store.search(query_embedding, RETRIEVAL_SETTINGS["fetch_k"])
+        if use_lexical and pooled.lexical is not None:
+            result.lexical_docs = pooled.lexical.search(query_text, RETRIEVAL_SETTINGS["fetch_k"])
+        for doc in result.vector_docs + result.lexical_docs:
+            doc.metadata['knowledge_base'] = kb  # Add KB info to metadata
+        return result
+
+    def gather_candidates(self, query_text, query_embedding, use_lexical, selected_kbs):
+        results = []
+        complete = True
+
+        # A running search can't be stopped, so a KB that is still stuck in one is skipped
+        # rather than given a second worker
+        stuck = [kb for kb in selected_kbs if kb in self.abandoned]
+        for kb in stuck:
+            complete = False
+            print(f"Warning: {kb} is still busy with an abandoned search, skipping it")
+        selected_kbs = [kb for kb in selected_kbs if kb not in stuck]
+
+        # Query every knowledge base at once and merge results as they arrive
+        started = {}
+        futures = {self.executor.submit(self.retrieve_from_kb, kb, query_text, query_embedding, use_lexical, started): kb for kb in selected_kbs}
+
+        # KBs queued behind the concurrency limit get their deadline once they start,
+        # but the whole fan-out never waits longer than one deadline per wave
+        waves = max(1, math.ceil(len(selected_kbs) / self.max_concurrent_kbs))
+        overall_deadline = time.monotonic() + self.kb_deadline * waves
+        pending = set(futures)
+
+        while pending:
+            now = time.monotonic()
+            expired = {f for f in pending if futures[f] in started and now - started[futures[f]] >= self.kb_deadline}
+            if now >= overall_deadline:
+                expired = pending
+            for future in expired:
+                complete = False
+                kb = futures[future]
+                if not future.cancel():
+                    self.abandoned[kb] = future
+                    future.add_done_callback(lambda _, kb=kb: self.abandoned.pop(kb, None))
+                print(f"Warning: {kb} missed the {self.kb_deadline}s deadline, its search was abandoned, using partial results")
+            pending -= expired
+            if not pending:
+                break
+
+            next_expiry = [started[futures[f]] + self.kb_deadline for f in pending if futures[f] in started]
+            timeout = min(next_expiry + [overall_deadline]) - now
+            done, pending = wait(pending, timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    complete = False
+                    logging.error(f"Error querying knowledge base {futures[future]}: {str(e)}")
+                    continue
+                if result is not None:
+                    results.append(result)
+
+        return results, complete
+
+    def select_documents(self, query_embedding, results):
+        candidates = [doc for result in results for doc in result.vector_docs]
+        if not candidates:
+            return []
+        embeddings = np.vstack([result.embeddings for result in results if result.vector_docs])
+
+        # Keep the best-scoring candidates across all KBs, then enforce diversity over the merged set
+        pool_size = RETRIEVAL_SETTINGS["mmr_pool_size"]
+        best = heapq.nlargest(pool_size, range(len(candidates)), key=lambda i: candidates[i].metadata['relevance_score'])
+        picked = maximal_marginal_relevance(
+            query_embedding,
+            embeddings[best],
+            RETRIEVAL_SETTINGS["top_k"],
+            RETRIEVAL_SETTINGS["mmr_lambda"]
+        )
+        return [candidates[best[i]] for i in picked]
+
+    def fuse_documents(self, results, query_embedding=None):
+        # Cosine scores from one model rank all KBs together, but BM25 scores depend on
+        # each KB's own term statistics, so every KB keeps a lexical ranking of its own
+        candidates = [doc for result in results for doc in result.vector_docs]
+        ranked_lists = [heapq.nlargest(RETRIEVAL_SETTINGS["fetch_k"], candidates, key=lambda doc: doc.metadata['relevance_score'])]
+        ranked_lists.extend(result.lexical_docs for result in results if result.lexical_docs)
+        fused = reciprocal_rank_fusion(ranked_lists, RETRIEVAL_SETTINGS["rrf_k"])[:RETRIEVAL_SETTINGS["mmr_pool_size"]]
+        if query_embedding is None or not candidates or not fused:
+            return fused[:RETRIEVAL_SETTINGS["top_k"]]
+
+        # Enforce diversity over the fused pool; documents only found lexically have no
+        # embedding and are ranked by their fused score alone
+        embeddings = {}
+        for result in results:
+            if result.vector_docs:
+                for doc, embedding in zip(result.vector_docs, result.embeddings):
+                    embeddings[(result.knowledge_base, chunk_id(doc))] = embedding
+        vectors = np.zeros((len(fused), len(query_embedding)), dtype=np.float32)
+        for i, doc in enumerate(fused):
+            embedding = embeddings.get((doc.metadata['knowledge_base'], chunk_id(doc)))
+            if embedding is not None:
+                vectors[i] = embedding
+        scores = np.array([doc.metadata['relevance_score'] for doc in fused], dtype=np.float32)
+        picked = maximal_marginal_relevance(
+            query_embedding,
+            vectors,
+            RETRIEVAL_SETTINGS["top_k"],
+            RETRIEVAL_SETTINGS["mmr_lambda"],
+            relevance=scores / scores.max()
+        )
+        return [fused[i] for i in picked]
+
+    def choose_retrieval_mode(self, query_text):
+        if self.retrieval_mode == "hybrid" and RETRIEVAL_SETTINGS["lexical_fast_path"] and is_keyword_query(query_text):
+            return "lexical"
+        return self.retrieval_mode
+
+    def query_vector_database(self, query_text, selected_kbs, token_budget=None, query_embedding=None):
+        if not selected_kbs:
+            return "", []
+
+        mode = self.choose_retrieval_mode(query_text)
+        if mode == "lexical":
+            # Keyword-like queries skip the embedding API entirely
+            results, _ = self.gather_candidates(query_text, None, True, selected_kbs)
+            selected_docs = self.fuse_documents(results)
+            if selected_docs:
+                return self.format_context(self.compress(selected_docs, query_text, None), token_budget)
+            if self.retrieval_mode == "lexical":
+                return "", []
+            # Nothing matched lexically (or the KBs have no lexical index), so fall back to vector search
+            mode = self.retrieval_mode
+
+        # Embed the query once and share the vector across all knowledge bases, unless the caller already did
+        if query_embedding is None:
+            query_embedding = self.embed_query(query_text)
+
+        # Paraphrases of a recent query against unchanged KBs reuse its documents
+        cache_key = (tuple(sorted(selected_kbs)), mode, self.compression_mode)
+        kb_versions = {kb: get_kb_version(kb) for kb in selected_kbs}
+        top_docs = self.semantic_cache.lookup(query_embedding, cache_key, kb_versions)
+        logging.debug(f"Semantic cache stats: {self.semantic_cache.stats()}")
+
+        if top_docs is None:
+            results, complete = self.gather_candidates(query_text, query_embedding, mode == "hybrid", selected_kbs)
+            if mode == "hybrid":
+                selected_docs = self.fuse_documents(results, query_embedding)
+            else:
+                selected_docs = self.select_documents(query_embedding, results)
+            if not selected_docs:
+                return "", []
+
+            top_docs = self.compress(selected_docs, query_text, query_embedding)
+
+            # Partial results from KBs that missed their deadline are not worth reusing
+            if complete:
+                self.semantic_cache.store(query_embedding, cache_key, kb_versions, top_docs)
+
+        return self.format_context(top_docs, token_budget)
+
+    def compress(self, selected_docs, query_text, query_embedding):
+        # Only the globally selected documents are compressed. Extractive compression
+        # needs embeddings, so lexical-only results are passed through as they are
+        if query_embedding is None and self.compression_mode == "extractive":
+            compressed_docs = selected_docs
+        else:
+            compressed_docs = self.compressor.compress_documents(selected_docs, query_text, query_embedding=query_embedding)
+
+        # Compression keeps each document's metadata, so the scores carry through
+        return sorted(compressed_docs, key=lambda x: x.metadata.get('relevance_score', 0), reverse=True)
+
+    def format_context(self, top_docs, token_budget=None):
+        if token_budget is None:
+            token_budget = RETRIEVAL_SETTINGS["max_context_tokens"]
+        top_docs = pack_context(top_docs, min(token_budget, RETRIEVAL_SETTINGS["max_context_tokens"]))
 
         # Format the context
         context = "\n\n".join(doc.page_content for doc in top_docs)
@@ -53,6 +274,14 @@ class ContextManager:
 
         return context, sources
 
+    def cache_stats(self):
+        return self.semantic_cache.stats()
+
+    def invalidate_kb(self, knowledge_base=None):
+        # Forget everything derived from a KB that was rebuilt in this process
+        self.retriever_pool.invalidate(knowledge_base)
+        self.semantic_cache.invalidate(knowledge_base)
+
     def update_settings(self):
-        # This method can be used to refresh any settings if needed
-        pass
\ No newline at end of file
+        # Drop opened stores and cached results so they are rebuilt with the current settings
+        self.invalidate_kb()
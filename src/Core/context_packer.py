@@ -0,0 +1,73 @@
+from langchain.schema import Document
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _encoding = None
+
+def count_tokens(text):
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    # Rough estimate when no tokenizer is installed
+    return len(text) // 4 + 1
+
+def truncate_to_tokens(text, max_tokens):
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text, disallowed_special=())[:max_tokens])
+    # The estimate counts one token more than len(text) // 4, so a cut text must stay within it
+    return text[:max(max_tokens * 4 - 1, 0)]
+
+def merge_spans(docs):
+    # Chunks of one source that still hold their original text can be stitched back
+    # together using start_index, dropping the overlap between neighbouring chunks
+    docs = sorted(docs, key=lambda doc: doc.metadata['start_index'])
+    merged = []
+    for doc in docs:
+        start = doc.metadata['start_index']
+        if merged:
+            last = merged[-1]
+            last_end = last.metadata['start_index'] + len(last.page_content)
+            if start <= last_end:
+                end = start + len(doc.page_content)
+                if end > last_end:
+                    last.page_content += doc.page_content[last_end - start:]
+                last.metadata['relevance_score'] = max(last.metadata.get('relevance_score', 0), doc.metadata.get('relevance_score', 0))
+                continue
+        merged.append(Document(page_content=doc.page_content, metadata=dict(doc.metadata)))
+    return merged
+
+def pack_context(docs, token_budget, min_fragment_tokens=50):
+    """Return the documents that fit the token budget, with overlapping text removed.
+
+    Adjacent and overlapping chunks from the same source are merged, compressed
+    documents already contained in another document are dropped, and the rest are
+    added best-first until the budget is used up. A document that doesn't fit is
+    cut down to the remaining budget if that leaves a useful fragment.
+    """
+    groups = {}
+    loose = []
+    for doc in docs:
+        if doc.metadata.get('start_index') is not None and not doc.metadata.get('compressed'):
+            key = (doc.metadata.get('knowledge_base'), doc.metadata.get('source'))
+            groups.setdefault(key, []).append(doc)
+        else:
+            loose.append(doc)
+
+    candidates = [doc for group in groups.values() for doc in merge_spans(group)] + loose
+    candidates.sort(key=lambda doc: doc.metadata.get('relevance_score', 0), reverse=True)
+
+    packed = []
+    used = 0
+    for doc in candidates:
+        if any(doc.page_content in kept.page_content for kept in packed):
+            continue
+        tokens = count_tokens(doc.page_content)
+        if used + tokens <= token_budget:
+            packed.append(doc)
+            used += tokens
+        elif token_budget - used >= min_fragment_tokens:
+            text = truncate_to_tokens(doc.page_content, token_budget - used)
+            packed.append(Document(page_content=text, metadata=doc.metadata))
+            used += count_tokens(text)
+    return packed
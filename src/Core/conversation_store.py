@@ -0,0 +1,253 @@
+import threading
+import sqlite3
+import logging
+import json
+import time
+import os
+
+VACUUM_STEP_PAGES = 256  # Free pages returned to the file system per locked step of compaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (id INTEGER PRIMARY KEY, title TEXT, started REAL, updated REAL);
+CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated);
+CREATE TABLE IF NOT EXISTS messages (id INTEGER PRIMARY KEY, session INTEGER, created REAL, role TEXT, text TEXT, data TEXT);
+CREATE INDEX IF NOT EXISTS messages_session ON messages (session, id);
+CREATE INDEX IF NOT EXISTS messages_created ON messages (created);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5 (text, content='messages', content_rowid='id');
+CREATE TABLE IF NOT EXISTS transcript (position INTEGER PRIMARY KEY, session INTEGER, segments TEXT);
+CREATE INDEX IF NOT EXISTS transcript_session ON transcript (session, position);
+"""
+
+def message_text(message):
+    content = message.get("content")
+    return content if isinstance(content, str) else json.dumps(content)
+
+def group_exchanges(rows):
+    # Rows are (id, session, created, role, text, data) in id order; each exchange
+    # is a question and the assistant's prose that followed it, without code or output
+    exchanges = []
+    for id, session, created, role, text, data in rows:
+        if role == "user":
+            exchanges.append({"id": id, "last_id": id, "session": session, "created": created, "question": text, "answer": ""})
+        elif exchanges and exchanges[-1]["session"] == session:
+            exchanges[-1]["last_id"] = id
+            if role == "assistant" and json.loads(data).get("type", "message") == "message":
+                exchanges[-1]["answer"] = (exchanges[-1]["answer"] + "\n" + text).strip()
+    return exchanges
+
+class ConversationStore:
+    """Every chat session in one append-only SQLite database.
+
+    Messages are stored as the interpreter produced them, in the order they
+    were written, and indexed by session, time and full text (FTS5), so
+    resuming, listing and searching are index lookups. The rendered chat
+    transcript is kept alongside, so the chat window can page through it.
+    Compaction removes sessions that haven't been used for keep_days. It holds
+    the lock for one session or one vacuum step at a time, because the chat
+    window writes its transcript from the Tk thread.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        # Only takes effect when the database is created; freed pages are then returned by compact()
+        self.db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+        self.lock = threading.Lock()
+        self.session = None  # Created when the first message is written
+        self.live_from = None  # First message of the current session still in the interpreter's context
+        self.transcript_end = self.db.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM transcript").fetchone()[0]
+
+    def start_session(self):
+        with self.lock:
+            self.session = None
+            self.live_from = None
+
+    def ensure_session(self):
+        if self.session is None:
+            now = time.time()
+            self.session = self.db.execute("INSERT INTO sessions (started, updated) VALUES (?, ?)", (now, now)).lastrowid
+        return self.session
+
+    def append_messages(self, messages, query=None):
+        """Store new interpreter messages of the current session.
+
+        query replaces the text indexed for the first user message, since the
+        prompt the interpreter saw also carries the knowledge base context.
+        """
+        if not messages:
+            return
+        with self.lock:
+            session = self.ensure_session()
+            now = time.time()
+            title = (query or message_text(messages[0]))[:100]
+            for message in messages:
+                text = message_text(message)
+                if query is not None and message.get("role") == "user":
+                    text, query = query, None
+                row = self.db.execute(
+                    "INSERT INTO messages (session, created, role, text, data) VALUES (?, ?, ?, ?, ?)",
+                    (session, now, message.get("role"), text, json.dumps(message))
+                ).lastrowid
+                self.db.execute("INSERT INTO messages_fts (rowid, text) VALUES (?, ?)", (row, text))
+            self.db.execute("UPDATE sessions SET updated = ?, title = COALESCE(title, ?) WHERE id = ?", (now, title, session))
+            self.db.commit()
+
+    def resume_last_session(self, max_messages=None):
+        """Make the most recently used session current and return its latest messages."""
+        with self.lock:
+            row = self.db.execute("SELECT id FROM sessions ORDER BY updated DESC LIMIT 1").fetchone()
+            if row is None:
+                return []
+            self.session = row[0]
+            rows = self.db.execute(
+                "SELECT id, data FROM messages WHERE session = ? ORDER BY id DESC LIMIT ?",
+                (self.session, -1 if max_messages is None else max_messages)
+            ).fetchall()[::-1]
+            # A resumed conversation must start with a question, not half an exchange
+            while rows and json.loads(rows[0][1]).get("role") != "user":
+                rows.pop(0)
+            self.live_from = rows[0][0] if rows else None
+        return [json.loads(data) for _, data in rows]
+
+    def is_live(self, session, message_id):
+        # Whether a message is already part of the conversation the interpreter holds
+        return session == self.session and (self.live_from is None or message_id >= self.live_from)
+
+    def exchanges(self, after_id=0, limit=500):
+        """Question and answer exchanges after a message id, oldest first.
+
+        Returns the exchanges and the id to pass as after_id for the next page.
+        """
+        while True:
+            with self.lock:
+                rows = self.db.execute(
+                    "SELECT id, session, created, role, text, data FROM messages WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit)
+                ).fetchall()
+            exchanges = group_exchanges(rows)
+            if len(rows) < limit or len(exchanges) != 1:
+                break
+            # A single exchange filling the page may continue past it, so the page grows until it ends
+            limit *= 2
+        if not rows:
+            return [], after_id
+        if len(rows) == limit and len(exchanges) > 1:
+            # May continue past the limit; the next page returns it whole
+            return exchanges[:-1], exchanges[-1]["id"] - 1
+        return exchanges, rows[-1][0]
+
+    def existing_messages(self, message_ids, batch_size=500):
+        # The subset of message ids still stored, for pruning data derived from removed sessions
+        message_ids = list(message_ids)
+        existing = set()
+        with self.lock:
+            for i in range(0, len(message_ids), batch_size):
+                batch = message_ids[i:i + batch_size]
+                placeholders = ",".join("?" * len(batch))
+                existing.update(id for id, in self.db.execute(f"SELECT id FROM messages WHERE id IN ({placeholders})", batch))
+        return existing
+
+    def exchanges_between(self, start, end, limit=20):
+        """The latest exchanges written between two timestamps, oldest first."""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT id, session, created, role, text, data FROM messages WHERE created >= ? AND created < ? ORDER BY id DESC LIMIT ?",
+                (start, end, limit * 4)
+            ).fetchall()[::-1]
+        return group_exchanges(rows)[-limit:]
+
+    def messages(self, session, limit=None):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT data FROM messages WHERE session = ? ORDER BY id DESC LIMIT ?", (session, -1 if limit is None else limit)
+            ).fetchall()
+        return [json.loads(data) for data, in reversed(rows)]
+
+    def list_sessions(self, limit=20, before=None):
+        # Newest first; pass the last "updated" value back as before to get the next page
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT id, title, started, updated FROM sessions WHERE updated < ? ORDER BY updated DESC LIMIT ?",
+                (float("inf") if before is None else before, limit)
+            ).fetchall()
+        return [{"id": id, "title": title, "started": started, "updated": updated} for id, title, started, updated in rows]
+
+    def search(self, query, limit=20, session=None):
+        """Best matching messages for a full-text query, as dicts with a highlighted snippet."""
+        # Each word is quoted so punctuation in the query isn't read as FTS syntax
+        match = " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+        if not match:
+            return []
+        sql = ("SELECT m.id, m.session, m.created, m.role, m.text, snippet(messages_fts, 0, '[', ']', '...', 12) "
+               "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid WHERE messages_fts MATCH ?")
+        params = [match]
+        if session is not None:
+            sql += " AND m.session = ?"
+            params.append(session)
+        sql += " ORDER BY bm25(messages_fts) LIMIT ?"
+        params.append(limit)
+        with self.lock:
+            rows = self.db.execute(sql, params).fetchall()
+        return [
+            {"id": id, "session": session, "created": created, "role": role, "text": text, "snippet": snippet}
+            for id, session, created, role, text, snippet in rows
+        ]
+
+    def transcript_count(self):
+        return self.transcript_end
+
+    def transcript_start(self):
+        # Where the current session's transcript begins, so scrolling back stops at it
+        with self.lock:
+            row = self.db.execute("SELECT MIN(position) FROM transcript WHERE session = ?", (self.session,)).fetchone()
+        return self.transcript_end if row[0] is None else row[0]
+
+    def append_transcript(self, segments):
+        with self.lock:
+            session = self.ensure_session()
+            self.db.execute(
+                "INSERT INTO transcript (position, session, segments) VALUES (?, ?, ?)",
+                (self.transcript_end, session, json.dumps(segments))
+            )
+            self.db.commit()
+            self.transcript_end += 1
+
+    def load_transcript(self, start, stop):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT segments FROM transcript WHERE position >= ? AND position < ? ORDER BY position", (start, stop)
+            ).fetchall()
+        return [[tuple(segment) for segment in json.loads(segments)] for segments, in rows]
+
+    def compact(self, keep_days):
+        """Delete sessions unused for keep_days, except the current one, and return their ids."""
+        cutoff = time.time() - keep_days * 86400
+        with self.lock:
+            sessions = [row[0] for row in self.db.execute(
+                "SELECT id FROM sessions WHERE updated < ? AND id IS NOT ?", (cutoff, self.session)
+            )]
+        for session in sessions:
+            with self.lock:
+                rows = self.db.execute("SELECT id, text FROM messages WHERE session = ?", (session,)).fetchall()
+                self.db.executemany("INSERT INTO messages_fts (messages_fts, rowid, text) VALUES ('delete', ?, ?)", rows)
+                self.db.execute("DELETE FROM messages WHERE session = ?", (session,))
+                self.db.execute("DELETE FROM transcript WHERE session = ?", (session,))
+                self.db.execute("DELETE FROM sessions WHERE id = ?", (session,))
+                self.db.commit()
+        if sessions:
+            logging.info(f"Removed {len(sessions)} conversation sessions older than {keep_days} days")
+            while True:
+                with self.lock:
+                    if self.db.execute("PRAGMA freelist_count").fetchone()[0] == 0:
+                        break
+                    self.db.execute(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})").fetchall()
+                    self.db.commit()
+                    if self.db.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                        break  # Created before incremental vacuum; SQLite reuses the free pages instead
+        return sessions
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,182 @@
+import numpy as np
+import sqlite3
+import zlib
+import os
+import re
+
+DEDUP_FILE = "dedup.sqlite"
+DEDUP_SCOPES = ["kb", "all"]
+
+NUM_PERM = 64
+BANDS = 16  # 16 bands of 4 rows finds pairs from about 0.5 Jaccard similarity; candidates are then verified
+SHINGLE_SIZE = 5
+PRIME = 4294967311  # Smallest prime above 2**32
+
+WORD_PATTERN = re.compile(r"\w+")
+
+def shingle_hashes(text, size=SHINGLE_SIZE):
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) <= size:
+        return np.asarray([zlib.crc32(" ".join(words).encode("utf-8"))], dtype=np.uint64)
+    shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+
+class MinHasher:
+    def __init__(self, num_perm=NUM_PERM, bands=BANDS, seed=1):
+        rng = np.random.RandomState(seed)
+        # Below 2**31 so a * hash + b never overflows 64 bits
+        self.a = rng.randint(1, 2 ** 31, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, 2 ** 31, size=num_perm).astype(np.uint64)
+        self.bands = bands
+        self.rows = num_perm // bands
+
+    def signature(self, text):
+        hashes = shingle_hashes(text)
+        return ((np.outer(self.a, hashes) + self.b[:, None]) % PRIME).min(axis=1).astype(np.uint32)
+
+    def band_keys(self, signature):
+        # One lookup key per band, with the band number in the high bits
+        return [band << 32 | zlib.crc32(signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+def similarity(signature, other):
+    return float(np.mean(signature == other))
+
+class DedupIndex:
+    """MinHash signatures of the chunks stored in one knowledge base build.
+
+    Chunks dropped as near-duplicates are recorded as links to the chunk they
+    duplicate, so their source can be indexed again if that chunk goes away.
+    """
+
+    def __init__(self, path, read_only=False):
+        if read_only:
+            self.db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+            return
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS signatures (chunk_id TEXT PRIMARY KEY, signature BLOB);
+            CREATE TABLE IF NOT EXISTS bands (key INTEGER, chunk_id TEXT);
+            CREATE INDEX IF NOT EXISTS bands_key ON bands (key);
+            CREATE INDEX IF NOT EXISTS bands_chunk ON bands (chunk_id);
+            CREATE TABLE IF NOT EXISTS links (chunk_id TEXT, source TEXT, original_kb TEXT, original_id TEXT);
+            CREATE INDEX IF NOT EXISTS links_source ON links (source);
+            CREATE INDEX IF NOT EXISTS links_original ON links (original_id);
+        """)
+        self.db.commit()
+
+    @classmethod
+    def open_current(cls, build_path):
+        # Read-only view of a committed build, or None if it has no index
+        path = os.path.join(build_path, DEDUP_FILE)
+        return cls(path, read_only=True) if os.path.exists(path) else None
+
+    def find(self, signature, keys, threshold):
+        placeholders = ",".join("?" * len(keys))
+        rows = self.db.execute(
+            f"SELECT DISTINCT s.chunk_id, s.signature FROM bands b JOIN signatures s ON s.chunk_id = b.chunk_id WHERE b.key IN ({placeholders})",
+            keys
+        ).fetchall()
+        best_id, best_score = None, threshold
+        for chunk_id, blob in rows:
+            score = similarity(signature, np.frombuffer(blob, dtype=np.uint32))
+            if score >= best_score:
+                best_id, best_score = chunk_id, score
+        return best_id
+
+    def contains(self, chunk_id):
+        return self.db.execute("SELECT 1 FROM signatures WHERE chunk_id = ?", (chunk_id,)).fetchone() is not None
+
+    def add(self, chunk_id, signature, keys):
+        self.db.execute("INSERT OR REPLACE INTO signatures (chunk_id, signature) VALUES (?, ?)", (chunk_id, signature.tobytes()))
+        self.db.execute("DELETE FROM bands WHERE chunk_id = ?", (chunk_id,))
+        self.db.executemany("INSERT INTO bands (key, chunk_id) VALUES (?, ?)", [(key, chunk_id) for key in keys])
+
+    def link(self, chunk_id, source, original_kb, original_id):
+        self.db.execute("INSERT INTO links (chunk_id, source, original_kb, original_id) VALUES (?, ?, ?, ?)",
+                        (chunk_id, source, original_kb, original_id))
+
+    def delete(self, chunk_ids):
+        chunk_ids = list(chunk_ids)
+        for i in range(0, len(chunk_ids), 500):
+            batch = chunk_ids[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            self.db.execute(f"DELETE FROM signatures WHERE chunk_id IN ({placeholders})", batch)
+            self.db.execute(f"DELETE FROM bands WHERE chunk_id IN ({placeholders})", batch)
+
+    def remove_links(self, sources):
+        self.db.executemany("DELETE FROM links WHERE source = ?", [(source,) for source in sources])
+
+    def linked_sources(self, knowledge_base, original_ids):
+        # Sources with chunks dropped as duplicates of any of these chunks
+        sources = set()
+        original_ids = list(original_ids)
+        for i in range(0, len(original_ids), 500):
+            batch = original_ids[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.db.execute(
+                f"SELECT DISTINCT source FROM links WHERE original_kb = ? AND original_id IN ({placeholders})",
+                [knowledge_base] + batch
+            ).fetchall()
+            sources.update(row[0] for row in rows)
+        return sources
+
+    def external_links(self, knowledge_base):
+        return self.db.execute(
+            "SELECT source, original_kb, original_id FROM links WHERE original_kb != ?", (knowledge_base,)
+        ).fetchall()
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+class ChunkDeduplicator:
+    """Drops chunks that are near-duplicates of chunks already stored.
+
+    Looks in the knowledge base being written and, with scope "all", in the
+    current builds of the other knowledge bases. Kept chunks are added to the
+    index so later copies in the same rebuild are caught too.
+    """
+
+    def __init__(self, knowledge_base, index, other_indexes, threshold):
+        self.knowledge_base = knowledge_base
+        self.index = index
+        self.other_indexes = other_indexes
+        self.threshold = threshold
+        self.hasher = MinHasher()
+
+    def remember(self, chunks):
+        # Indexes chunks that are kept regardless, such as those imported from a snapshot
+        for chunk in chunks:
+            signature = self.hasher.signature(chunk.page_content)
+            self.index.add(chunk.metadata['chunk_id'], signature, self.hasher.band_keys(signature))
+        self.index.commit()
+
+    def filter(self, chunks):
+        kept = []
+        duplicates = 0
+        for chunk in chunks:
+            chunk_id = chunk.metadata['chunk_id']
+            signature = self.hasher.signature(chunk.page_content)
+            keys = self.hasher.band_keys(signature)
+
+            original_kb, original_id = self.knowledge_base, self.index.find(signature, keys, self.threshold)
+            if original_id == chunk_id:
+                original_id = None  # Rewriting the same chunk
+            if original_id is None:
+                for kb, other in self.other_indexes.items():
+                    original_id = other.find(signature, keys, self.threshold)
+                    if original_id is not None:
+                        original_kb = kb
+                        break
+
+            if original_id is None:
+                self.index.add(chunk_id, signature, keys)
+                kept.append(chunk)
+            else:
+                self.index.link(chunk_id, chunk.metadata.get('source', ''), original_kb, original_id)
+                duplicates += 1
+        self.index.commit()
+        return kept, duplicates
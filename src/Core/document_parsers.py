@@ -0,0 +1,167 @@
+from langchain.schema import Document
+from html.parser import HTMLParser
+from collections import deque
+import multiprocessing
+import logging
+import time
+import os
+import re
+
+TEXT_EXTENSIONS = {".txt", ".text", ".log", ".csv", ".json", ".yaml", ".yml", ".ini", ".cfg", ".conf"}
+MARKDOWN_EXTENSIONS = {".md", ".markdown", ".rst"}
+HTML_EXTENSIONS = {".html", ".htm", ".xhtml"}
+
+def list_files(docs_path):
+    # Recursive, skipping hidden files and folders such as .git
+    file_paths = []
+    for root, dirs, files in os.walk(docs_path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            if "." in name and not name.startswith("."):
+                file_paths.append(os.path.join(root, name))
+    return file_paths
+
+def read_text(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+class HTMLTextExtractor(HTMLParser):
+    SKIP_TAGS = {"script", "style", "noscript", "template", "svg"}
+    BLOCK_TAGS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "pre", "section", "article", "table"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skip_depth = 0
+        self.title = None
+        self.in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag == "title":
+            self.in_title = True
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self.skip_depth = max(self.skip_depth - 1, 0)
+        elif tag == "title":
+            self.in_title = False
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title = (self.title or "") + data.strip()
+        elif not self.skip_depth:
+            self.parts.append(data)
+
+    def text(self):
+        lines = (re.sub(r"[ \t\r\f\v]+", " ", line).strip() for line in "".join(self.parts).split("\n"))
+        return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+def parse_text(path):
+    return [Document(page_content=read_text(path), metadata={"source": path})]
+
+def parse_html(path):
+    extractor = HTMLTextExtractor()
+    extractor.feed(read_text(path))
+    extractor.close()
+    metadata = {"source": path}
+    if extractor.title:
+        metadata["title"] = extractor.title
+    return [Document(page_content=extractor.text(), metadata=metadata)]
+
+def parse_unstructured(path):
+    from langchain_community.document_loaders import UnstructuredFileLoader
+    return UnstructuredFileLoader(path).load()
+
+def get_parser(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in TEXT_EXTENSIONS or extension in MARKDOWN_EXTENSIONS:
+        return parse_text
+    if extension in HTML_EXTENSIONS:
+        return parse_html
+    return None
+
+def parse_file(path):
+    parser = get_parser(path) or parse_unstructured
+    return parser(path)
+
+class ParallelParser:
+    """Parses files with cheap in-process parsers, and everything else in a process pool.
+
+    Plain text, markdown and HTML are read directly. Other formats go through
+    unstructured in worker processes, at most one file per worker at a time, and
+    a file still running after timeout_seconds is abandoned by terminating the
+    pool, which is then recreated for the remaining files.
+    """
+
+    def __init__(self, workers=None, timeout_seconds=120):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.timeout_seconds = timeout_seconds
+        self.pool = None
+
+    def start_pool(self):
+        # Spawned workers don't inherit the GUI's threads and locks the way forked ones would
+        self.pool = multiprocessing.get_context("spawn").Pool(self.workers)
+
+    def stop_pool(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def iter_documents(self, file_paths):
+        heavy = deque()
+        for path in file_paths:
+            parser = get_parser(path)
+            if parser is None:
+                heavy.append(path)
+                continue
+            try:
+                yield from parser(path)
+            except Exception as e:
+                print(f"Error loading {path}: {e}")
+
+        try:
+            yield from self.iter_heavy(heavy)
+        finally:
+            self.stop_pool()
+
+    def iter_heavy(self, pending):
+        running = {}
+        while pending or running:
+            if self.pool is None:
+                self.start_pool()
+            while pending and len(running) < self.workers:
+                path = pending.popleft()
+                running[path] = (self.pool.apply_async(parse_unstructured, (path,)), time.monotonic())
+
+            oldest_result = min(running.values(), key=lambda item: item[1])[0]
+            oldest_result.wait(0.1)
+
+            for path, (result, started) in list(running.items()):
+                if not result.ready():
+                    continue
+                del running[path]
+                try:
+                    documents = result.get()
+                except Exception as e:
+                    print(f"Error loading {path}: {e}")
+                    continue
+                yield from documents
+
+            now = time.monotonic()
+            timed_out = [path for path, (result, started) in running.items() if now - started > self.timeout_seconds]
+            if timed_out:
+                for path in timed_out:
+                    print(f"Error loading {path}: timed out after {self.timeout_seconds}s")
+                    del running[path]
+                logging.warning(f"Restarting the parser pool after {len(timed_out)} timed out file(s)")
+                # The other files in flight lose their progress and are parsed again
+                self.stop_pool()
+                pending.extendleft(reversed(list(running)))
+                running = {}
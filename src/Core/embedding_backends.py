@@ -0,0 +1,104 @@
+from functools import lru_cache
+import numpy as np
+import json
+import zlib
+import os
+import re
+
+EMBEDDING_BACKENDS = ["openai", "hashing"]
+EMBEDDING_FILE = "embedding.json"
+
+WORD_PATTERN = re.compile(r"\w+")
+
+class EmbeddingMismatchError(ValueError):
+    pass
+
+class OpenAIEmbeddingBackend:
+    """Embeds with the OpenAI API; every call is a network round-trip."""
+
+    name = "openai"
+
+    def __init__(self, model="text-embedding-ada-002"):
+        # Imported here so the local backend works without the OpenAI client configured
+        from langchain_openai import OpenAIEmbeddings
+        self.embeddings = OpenAIEmbeddings(model=model)
+        # Plain model names keep the embedding caches written before backends existed valid
+        self.model = getattr(self.embeddings, "model", model)
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+@lru_cache(maxsize=1 << 18)
+def word_hashes(word):
+    # A word and, for longer words, its character trigrams. crc32 is stable
+    # across processes and devices, unlike hash(), and words repeat enough
+    # that caching them does most of the work
+    features = [word]
+    if len(word) > 4:
+        padded = f"<{word}>"
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return tuple(zlib.crc32(feature.encode("utf-8")) for feature in features)
+
+class HashingEmbeddingBackend:
+    """Embeds locally on the CPU by feature hashing, with no model or network.
+
+    Each word and the character trigrams of longer words are hashed into one of
+    a fixed number of signed buckets. A batch is counted with a single
+    np.bincount, damped with log(1 + count) and L2-normalized. Similarity is
+    purely lexical, but ingestion works offline and costs nothing per chunk.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dimensions=1024):
+        self.dimensions = dimensions
+        # The feature set is versioned, since changing it changes the vector space
+        self.model = f"hashing-v1-{dimensions}"
+
+    def embed_documents(self, texts):
+        rows = []
+        hashes = []
+        for row, text in enumerate(texts):
+            start = len(hashes)
+            for word in WORD_PATTERN.findall(text.lower()):
+                hashes.extend(word_hashes(word))
+            rows.extend([row] * (len(hashes) - start))
+        hashes = np.asarray(hashes, dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.int64)
+
+        # The top hash bit picks the sign so colliding features tend to cancel out
+        signs = np.where(hashes & (1 << 31), -1.0, 1.0)
+        buckets = rows * self.dimensions + hashes % self.dimensions
+        matrix = np.bincount(buckets, weights=signs, minlength=len(texts) * self.dimensions).reshape(len(texts), self.dimensions)
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        return matrix.astype(np.float32).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+def build_embedding_backend(settings):
+    name = settings["backend"]
+    if name == "openai":
+        return OpenAIEmbeddingBackend(settings["openai_model"])
+    if name == "hashing":
+        return HashingEmbeddingBackend(settings["hashing_dimensions"])
+    raise ValueError(f"Unknown embedding backend: {name}")
+
+def write_embedding_info(db_path, backend):
+    # Recorded with every build so queries embedded differently can be refused
+    path = os.path.join(db_path, EMBEDDING_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump({"backend": getattr(backend, "name", type(backend).__name__), "model": backend.model}, f)
+    os.replace(path + ".tmp", path)
+
+def read_embedding_model(db_path):
+    # None for builds made before the model was recorded
+    try:
+        with open(os.path.join(db_path, EMBEDDING_FILE), "r") as f:
+            return json.load(f)["model"]
+    except FileNotFoundError:
+        return None
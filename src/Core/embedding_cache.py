@@ -0,0 +1,120 @@
+from concurrent.futures import Future
+from collections import OrderedDict
+import numpy as np
+import threading
+import sqlite3
+import logging
+import time
+import os
+
+def normalize_query(text):
+    return " ".join(text.lower().split())
+
+class QueryEmbeddingCache:
+    """LRU cache of query embeddings keyed by embedding model and normalized query text.
+
+    Concurrent requests for the same key share a single embedding call. When a
+    persist path is given, entries are also stored in SQLite and survive restarts.
+    Once the database holds more than max_persisted entries, the least recently
+    used are removed until it is down to nine tenths of that, so pruning runs
+    once every max_persisted / 10 new queries rather than on every one.
+    """
+
+    def __init__(self, embedding_function, max_entries=512, persist_path=None, max_persisted=10000):
+        self.embedding_function = embedding_function
+        self.model = getattr(embedding_function, "model", type(embedding_function).__name__)
+        self.max_entries = max_entries
+        self.max_persisted = max_persisted
+        self.entries = OrderedDict()
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.db = None
+        if persist_path:
+            os.makedirs(os.path.dirname(persist_path) or ".", exist_ok=True)
+            self.db = sqlite3.connect(persist_path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS query_embeddings (key TEXT PRIMARY KEY, vector BLOB, used REAL)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS query_embeddings_used ON query_embeddings (used)")
+            self.db.commit()
+            self.persisted = self.db.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+            self.db_lock = threading.Lock()
+
+    def embed_query(self, query_text):
+        key = f"{self.model}\n{normalize_query(query_text)}"
+
+        with self.lock:
+            vector = self.entries.get(key)
+            if vector is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return vector
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.in_flight[key] = future
+
+        # Another thread is already embedding this query, wait for its result
+        if not owner:
+            with self.lock:
+                self.hits += 1
+            return future.result()
+
+        try:
+            vector = self.load(key)
+            if vector is None:
+                with self.lock:
+                    self.misses += 1
+                vector = self.embedding_function.embed_query(query_text)
+                self.store(key, vector)
+            else:
+                with self.lock:
+                    self.hits += 1
+            future.set_result(vector)
+        except BaseException as e:
+            # Waiters must be released even when the embedding call is interrupted
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+                if future.exception() is None:
+                    self.entries[key] = future.result()
+                    self.entries.move_to_end(key)
+                    while len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+
+        return vector
+
+    def load(self, key):
+        if self.db is None:
+            return None
+        with self.db_lock:
+            row = self.db.execute("SELECT vector FROM query_embeddings WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self.db.execute("UPDATE query_embeddings SET used = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+        return np.frombuffer(row[0], dtype=np.float32).tolist()
+
+    def store(self, key, vector):
+        if self.db is None:
+            return
+        try:
+            with self.db_lock:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (key, vector, used) VALUES (?, ?, ?)",
+                    (key, np.asarray(vector, dtype=np.float32).tobytes(), time.time())
+                )
+                self.persisted += 1
+                if self.persisted > self.max_persisted:
+                    self.db.execute(
+                        "DELETE FROM query_embeddings WHERE key IN (SELECT key FROM query_embeddings ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                        (self.max_persisted * 9 // 10,)
+                    )
+                    self.persisted = self.db.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+                self.db.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"Could not persist query embedding: {str(e)}")
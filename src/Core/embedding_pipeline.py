@@ -0,0 +1,135 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import threading
+import logging
+import sqlite3
+import random
+import time
+import os
+from Core.chunk_ids import content_hash
+
+def is_rate_limit_error(error):
+    if getattr(error, "status_code", None) == 429 or getattr(error, "http_status", None) == 429:
+        return True
+    return "ratelimit" in type(error).__name__.lower() or "rate limit" in str(error).lower()
+
+class EmbeddingCache:
+    """Persistent content hash -> vector store shared by every knowledge base."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS embeddings (model TEXT, hash TEXT, vector BLOB, PRIMARY KEY (model, hash))")
+        self.db.commit()
+        self.lock = threading.Lock()
+
+    def get_many(self, model, hashes):
+        found = {}
+        hashes = list(hashes)
+        with self.lock:
+            # Stay under SQLite's bound parameter limit
+            for i in range(0, len(hashes), 500):
+                batch = hashes[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.db.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                    [model] + batch
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, model, items):
+        with self.lock:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)",
+                [(model, key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items]
+            )
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+class EmbeddingStats:
+    def __init__(self):
+        self.chunks = 0
+        self.cache_hits = 0
+        self.duplicates = 0
+        self.batches = 0
+        self.retries = 0
+        self.seconds = 0.0
+
+    def add(self, other):
+        self.chunks += other.chunks
+        self.cache_hits += other.cache_hits
+        self.duplicates += other.duplicates
+        self.batches += other.batches
+        self.retries += other.retries
+        self.seconds += other.seconds
+
+    def summary(self):
+        throughput = self.chunks / self.seconds if self.seconds else 0.0
+        hit_rate = self.cache_hits / self.chunks if self.chunks else 0.0
+        return (f"Embedded {self.chunks} chunks at {throughput:.1f} chunks/s, "
+                f"cache hit rate {hit_rate:.0%}, {self.batches} API batches, {self.retries} retries, "
+                f"{self.duplicates} embeddings saved by skipping near-duplicate chunks")
+
+class BatchEmbedder:
+    """Embeds texts in batches with a bounded number of requests in flight.
+
+    Texts already in the cache, or repeated within the call, are embedded once.
+    Batches that hit a rate limit are retried with exponential backoff and jitter.
+    """
+
+    def __init__(self, embedding_function, cache=None, batch_size=64, max_in_flight=4, max_retries=6, base_delay=1.0):
+        self.embedding_function = embedding_function
+        self.model = getattr(embedding_function, "model", type(embedding_function).__name__)
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.stats_lock = threading.Lock()
+
+    def embed_batch(self, texts, stats):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.embedding_function.embed_documents(texts)
+            except Exception as e:
+                if attempt == self.max_retries or not is_rate_limit_error(e):
+                    raise
+                delay = self.base_delay * (2 ** attempt) * (0.5 + random.random())
+                logging.warning(f"Embedding rate limited, retrying in {delay:.1f}s")
+                with self.stats_lock:
+                    stats.retries += 1
+                time.sleep(delay)
+
+    def embed(self, texts, stats=None):
+        stats = stats if stats is not None else EmbeddingStats()
+        start = time.perf_counter()
+        hashes = [content_hash(text) for text in texts]
+
+        vectors = self.cache.get_many(self.model, set(hashes)) if self.cache else {}
+        stats.chunks += len(texts)
+        stats.cache_hits += sum(1 for key in hashes if key in vectors)
+
+        missing = {}
+        for key, text in zip(hashes, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        missing_keys = list(missing)
+        batches = [missing_keys[i:i + self.batch_size] for i in range(0, len(missing_keys), self.batch_size)]
+
+        if batches:
+            with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+                futures = [(batch, executor.submit(self.embed_batch, [missing[key] for key in batch], stats)) for batch in batches]
+                for batch, future in futures:
+                    batch_vectors = future.result()
+                    vectors.update(zip(batch, batch_vectors))
+                    if self.cache:
+                        self.cache.put_many(self.model, zip(batch, batch_vectors))
+            stats.batches += len(batches)
+
+        stats.seconds += time.perf_counter() - start
+        return [vectors[key] for key in hashes]
@@ -0,0 +1,137 @@
+from collections import deque
+import threading
+
+class PipelineClosed(Exception):
+    pass
+
+class ByteBoundedQueue:
+    """FIFO queue that blocks producers while the buffered items exceed a byte budget.
+
+    A single item larger than the budget is still accepted when the queue is
+    empty, so oversized documents slow the pipeline down instead of stalling it.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.items = deque()
+        self.buffered = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def put(self, item, size):
+        with self.condition:
+            while self.items and self.buffered + size > self.max_bytes and not self.closed:
+                self.condition.wait()
+            if self.closed:
+                raise PipelineClosed()
+            self.items.append((item, size))
+            self.buffered += size
+            self.condition.notify_all()
+
+    def get(self):
+        with self.condition:
+            while not self.items and not self.closed:
+                self.condition.wait()
+            if not self.items:
+                raise PipelineClosed()
+            item, size = self.items.popleft()
+            self.buffered -= size
+            self.condition.notify_all()
+            return item
+
+    def close(self):
+        # Wakes blocked producers so they can stop
+        with self.condition:
+            self.closed = True
+            self.items.clear()
+            self.buffered = 0
+            self.condition.notify_all()
+
+_DONE = object()
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+def document_size(doc):
+    return len(doc.page_content.encode("utf-8", errors="replace")) + 256
+
+class IngestPipeline:
+    """Streams documents through load -> split -> embed/write with bounded memory.
+
+    Loading and splitting run on their own threads and hand work downstream
+    through byte-bounded queues, so a slow embedding stage makes the loaders
+    wait instead of piling documents up in memory. Chunks are written in
+    batches of flush_chunks as soon as they are available.
+    """
+
+    def __init__(self, split_documents, write_chunks, max_buffered_bytes, flush_chunks):
+        self.split_documents = split_documents
+        self.write_chunks = write_chunks
+        self.flush_chunks = flush_chunks
+        # Half of the budget for loaded documents, half for chunks waiting to be embedded
+        self.document_queue = ByteBoundedQueue(max_buffered_bytes // 2)
+        self.chunk_queue = ByteBoundedQueue(max_buffered_bytes // 2)
+        self.documents = 0
+        self.chunks = 0
+
+    def load_stage(self, documents):
+        try:
+            for doc in documents:
+                self.document_queue.put(doc, document_size(doc))
+            self.document_queue.put(_DONE, 0)
+        except PipelineClosed:
+            pass
+        except Exception as e:
+            try:
+                self.document_queue.put(_Failure(e), 0)
+            except PipelineClosed:
+                pass
+
+    def split_stage(self):
+        try:
+            while True:
+                doc = self.document_queue.get()
+                if doc is _DONE or isinstance(doc, _Failure):
+                    self.chunk_queue.put(doc, 0)
+                    return
+                self.documents += 1
+                for chunk in self.split_documents([doc]):
+                    self.chunk_queue.put(chunk, document_size(chunk))
+        except PipelineClosed:
+            pass
+        except Exception as e:
+            try:
+                self.chunk_queue.put(_Failure(e), 0)
+            except PipelineClosed:
+                pass
+
+    def run(self, documents):
+        loader = threading.Thread(target=self.load_stage, args=(documents,), daemon=True)
+        splitter = threading.Thread(target=self.split_stage, daemon=True)
+        loader.start()
+        splitter.start()
+
+        batch = []
+        try:
+            while True:
+                chunk = self.chunk_queue.get()
+                if isinstance(chunk, _Failure):
+                    raise chunk.error
+                if chunk is _DONE:
+                    break
+                batch.append(chunk)
+                if len(batch) >= self.flush_chunks:
+                    self.write_chunks(batch)
+                    self.chunks += len(batch)
+                    batch = []
+            if batch:
+                self.write_chunks(batch)
+                self.chunks += len(batch)
+        finally:
+            # Stop the upstream stages if writing failed
+            self.document_queue.close()
+            self.chunk_queue.close()
+            loader.join()
+            splitter.join()
+        return self.documents, self.chunks
@@ -0,0 +1,165 @@
+from collections import deque
+import threading
+import logging
+import time
+
+class IngestCancelled(Exception):
+    pass
+
+class IngestProgress:
+    """Counters for one knowledge base job, shared with whoever displays them."""
+
+    def __init__(self, knowledge_base, on_update=None, description=None, task=None):
+        self.knowledge_base = knowledge_base
+        self.on_update = on_update
+        self.description = description  # Set for jobs other than rebuilds
+        self.task = task
+        self.status = "queued"  # queued, running, done, failed or cancelled
+        self.files = 0
+        self.chunks = 0
+        self.duplicates = 0
+        self.embedded = 0
+        self.written = 0
+        self.error = None
+        self.cancel_event = threading.Event()
+        self.last_notified = 0.0
+
+    def update(self, **counts):
+        for name, count in counts.items():
+            setattr(self, name, getattr(self, name) + count)
+        # Counters move per chunk batch; listeners don't need every step
+        now = time.monotonic()
+        if now - self.last_notified >= 0.2:
+            self.last_notified = now
+            self.notify()
+
+    def set_status(self, status, error=None):
+        self.status = status
+        self.error = error
+        self.notify()
+
+    def notify(self):
+        if self.on_update:
+            try:
+                self.on_update(self)
+            except Exception:
+                logging.exception("Error reporting ingestion progress")
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise IngestCancelled()
+
+    def summary(self):
+        if self.description:
+            text = f"{self.knowledge_base}: {self.description} {self.status}"
+        else:
+            text = (f"{self.knowledge_base}: {self.status} - {self.files} files, {self.chunks} chunks, "
+                    f"{self.duplicates} duplicates, {self.embedded} embedded, {self.written} written")
+        return text + (f" ({self.error})" if self.error else "")
+
+class IngestScheduler:
+    """Runs knowledge base jobs one at a time on a background thread.
+
+    Requests for a KB that is already waiting are merged into the queued job,
+    and a request for a KB that is being rebuilt queues one follow-up run so
+    changes made meanwhile are picked up. Queries keep using the previous build
+    until the rebuild commits its new version. Other jobs that read or write a
+    build, such as snapshot import and export, go through the same queue so
+    they never overlap a rebuild.
+    """
+
+    def __init__(self, knowledge_manager, on_update=None):
+        self.knowledge_manager = knowledge_manager
+        self.on_update = on_update
+        self.queue = deque()
+        self.queued = {}
+        self.running = None
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def submit(self, knowledge_base):
+        with self.condition:
+            progress = self.queued.get(knowledge_base)
+            if progress is not None:
+                return progress
+            progress = IngestProgress(knowledge_base, self.on_update)
+            self.queued[knowledge_base] = progress
+            self.queue.append(progress)
+            self.condition.notify_all()
+        progress.notify()
+        return progress
+
+    def submit_task(self, knowledge_base, description, task, on_update=None):
+        # Never merged with other jobs; task() runs on the scheduler thread
+        progress = IngestProgress(knowledge_base, on_update or self.on_update, description, task)
+        with self.condition:
+            self.queue.append(progress)
+            self.condition.notify_all()
+        progress.notify()
+        return progress
+
+    def submit_all(self):
+        return [self.submit(kb) for kb in self.knowledge_manager.get_knowledge_bases()]
+
+    def cancel(self, knowledge_base=None):
+        # Cancels queued and running jobs for one KB, or all of them
+        with self.condition:
+            cancelled = [p for p in self.queue if knowledge_base is None or p.knowledge_base == knowledge_base]
+            for progress in cancelled:
+                self.queue.remove(progress)
+                if self.queued.get(progress.knowledge_base) is progress:
+                    del self.queued[progress.knowledge_base]
+            running = self.running
+        for progress in cancelled:
+            progress.cancel()
+            progress.set_status("cancelled")
+        if running is not None and (knowledge_base is None or running.knowledge_base == knowledge_base):
+            running.cancel()
+
+    def is_busy(self):
+        with self.condition:
+            return self.running is not None or bool(self.queue)
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.queue and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                progress = self.queue.popleft()
+                if self.queued.get(progress.knowledge_base) is progress:
+                    del self.queued[progress.knowledge_base]
+                self.running = progress
+
+            progress.set_status("running")
+            status, error = "done", None
+            try:
+                if progress.task is not None:
+                    progress.task()
+                else:
+                    self.knowledge_manager.build_vector_database(progress.knowledge_base, progress)
+            except IngestCancelled:
+                logging.info(f"Job for {progress.knowledge_base} cancelled")
+                status = "cancelled"
+            except Exception as e:
+                logging.exception(f"Error in knowledge base job for {progress.knowledge_base}")
+                status, error = "failed", str(e)
+            with self.condition:
+                self.running = None
+                self.condition.notify_all()
+            # Reported once the job is off the scheduler, so is_busy() is already up to date
+            progress.set_status(status, error)
+
+    def shutdown(self, timeout=10):
+        # Gives a cancelled rebuild the chance to discard its staging folder before the app exits
+        self.cancel()
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        self.worker.join(timeout)
@@ -18,7 +18,8 @@ class InterpreterManager:
     interpreter.llm.temperature = INTERPRETER_SETTINGS["temperature"]
     interpreter.llm.max_tokens = INTERPRETER_SETTINGS["max_tokens"]
     interpreter.llm.context_window = INTERPRETER_SETTINGS["context_window"]
-    interpreter.conversation_history_path = INTERPRETER_SETTINGS["conversation_history_path"]
+    # Conversations are kept in the ConversationStore instead of a JSON file per message
+    interpreter.conversation_history = False
     interpreter.computer.import_computer_api = INTERPRETER_SETTINGS["import_computer_api"]
     interpreter.system_message = SYSTEM_MESSAGE
 
@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+
+MANIFEST_FILE = "manifest.json"
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class KBManifest:
+    """Records every source indexed into a KB and the IDs of the chunks it produced.
+
+    Entries are keyed by the document source (file path or URL). File entries
+    keep size and mtime so unchanged files are recognised from a stat call, and
+    a content hash so touched-but-identical files are not re-embedded.
+    """
+
+    def __init__(self, db_path, entries=None):
+        self.db_path = db_path
+        self.entries = entries or {}
+
+    @classmethod
+    def load(cls, db_path):
+        path = os.path.join(db_path, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return cls(db_path, json.load(f)["entries"])
+
+    def save(self):
+        os.makedirs(self.db_path, exist_ok=True)
+        path = os.path.join(self.db_path, MANIFEST_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": 1, "entries": self.entries}, f)
+        os.replace(tmp_path, path)
+
+    def scan_files(self, paths):
+        # Returns the files that need (re)indexing, as {path: entry without chunk_ids}
+        changed = {}
+        for path in paths:
+            stat = os.stat(path)
+            entry = self.entries.get(path)
+            if entry:
+                entry["kind"] = "file"  # Adopts a source imported from a snapshot once the file is here
+            if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+                continue
+
+            content = file_hash(path)
+            if entry and entry["hash"] == content:
+                # Touched but identical, only the stat info needs refreshing
+                entry["size"] = stat.st_size
+                entry["mtime"] = stat.st_mtime_ns
+                continue
+            changed[path] = {"kind": "file", "size": stat.st_size, "mtime": stat.st_mtime_ns, "hash": content}
+        return changed
+
+    def file_entry(self, path):
+        stat = os.stat(path)
+        return {"kind": "file", "size": stat.st_size, "mtime": stat.st_mtime_ns, "hash": file_hash(path)}
+
+    def removed_sources(self, kind, current_sources):
+        current_sources = set(current_sources)
+        return [source for source, entry in self.entries.items() if entry["kind"] == kind and source not in current_sources]
+
+    def chunk_ids(self, sources):
+        return [chunk_id for source in sources if source in self.entries for chunk_id in self.entries[source]["chunk_ids"]]
+
+    def update(self, source, entry, chunk_ids):
+        self.entries[source] = dict(entry, chunk_ids=list(chunk_ids))
+
+    def remove(self, sources):
+        for source in sources:
+            self.entries.pop(source, None)
@@ -0,0 +1,177 @@
+import numpy as np
+import tempfile
+import hashlib
+import shutil
+import struct
+import json
+import time
+import os
+
+SNAPSHOT_MAGIC = b"OPKBSNAP"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_EXTENSION = ".kbsnap"
+SNAPSHOT_DTYPES = ["float32", "float16"]
+ALIGNMENT = 64  # Sections start on this boundary so the vector matrix can be memory-mapped
+
+class SnapshotError(Exception):
+    pass
+
+def aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+class SectionWriter:
+    """Streams one section to a temporary file, hashing it on the way."""
+
+    def __init__(self, directory, name):
+        self.name = name
+        self.path = os.path.join(directory, name)
+        self.file = open(self.path, "wb")
+        self.digest = hashlib.sha256()
+        self.length = 0
+
+    def write(self, data):
+        self.file.write(data)
+        self.digest.update(data)
+        self.length += len(data)
+
+    def close(self):
+        self.file.close()
+
+def write_snapshot(path, knowledge_base, batches, manifest_entries, embedding_model, dtype="float32"):
+    """Write a knowledge base build into a single snapshot file.
+
+    batches yields (ids, texts, metadatas, embeddings) as returned by a vector
+    store's iter_batches(). The file is a magic string, a JSON header with the
+    format version, embedding model, vector shape and each section's offset,
+    length and SHA-256, then the sections: the vector matrix, chunk records as
+    JSON lines with their byte offsets, and the KB manifest.
+    """
+    if dtype not in SNAPSHOT_DTYPES:
+        raise ValueError(f"Unsupported snapshot dtype: {dtype}")
+    workdir = tempfile.mkdtemp(prefix=".snapshot-", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        vectors = SectionWriter(workdir, "vectors")
+        chunks = SectionWriter(workdir, "chunks")
+        offsets = [0]
+        dimensions = None
+        for ids, texts, metadatas, embeddings in batches:
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            if len(ids) == 0:
+                continue
+            dimensions = dimensions or embeddings.shape[1]
+            vectors.write(embeddings.astype(dtype).tobytes())
+            for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                line = (json.dumps({"id": chunk_id, "text": text, "metadata": metadata or {}}) + "\n").encode("utf-8")
+                chunks.write(line)
+                offsets.append(offsets[-1] + len(line))
+        chunk_offsets = SectionWriter(workdir, "chunk_offsets")
+        chunk_offsets.write(np.asarray(offsets, dtype=np.uint64).tobytes())
+        manifest = SectionWriter(workdir, "manifest")
+        manifest.write(json.dumps({"version": 1, "entries": manifest_entries}).encode("utf-8"))
+        sections = [vectors, chunks, chunk_offsets, manifest]
+        for section in sections:
+            section.close()
+
+        header = {
+            "version": SNAPSHOT_VERSION,
+            "knowledge_base": knowledge_base,
+            "created": time.time(),
+            "embedding_model": embedding_model,
+            "dtype": dtype,
+            "dimensions": dimensions or 0,
+            "count": len(offsets) - 1,
+            "sections": {},
+        }
+        # Offsets are relative to the end of the header, so they don't depend on its length
+        offset = 0
+        for section in sections:
+            header["sections"][section.name] = {"offset": offset, "length": section.length, "sha256": section.digest.hexdigest()}
+            offset = aligned(offset + section.length)
+        header_bytes = json.dumps(header).encode("utf-8")
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(SNAPSHOT_MAGIC + struct.pack("<Q", len(header_bytes)) + header_bytes)
+            data_start = aligned(f.tell())
+            for section in sections:
+                f.write(b"\0" * (data_start + header["sections"][section.name]["offset"] - f.tell()))
+                with open(section.path, "rb") as source:
+                    shutil.copyfileobj(source, f, 1024 * 1024)
+        os.replace(tmp_path, path)
+        return header
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+class KBSnapshot:
+    """Read access to a snapshot file; the vector matrix is memory-mapped, not loaded."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                raise SnapshotError(f"{path} is not a knowledge base snapshot")
+            header_length, = struct.unpack("<Q", f.read(8))
+            try:
+                self.header = json.loads(f.read(header_length))
+            except ValueError:
+                raise SnapshotError(f"{path} has a damaged header")
+            self.data_start = aligned(f.tell())
+        if self.header.get("version") != SNAPSHOT_VERSION:
+            raise SnapshotError(f"{path} uses snapshot format {self.header.get('version')}, expected {SNAPSHOT_VERSION}")
+        self.knowledge_base = self.header["knowledge_base"]
+        self.embedding_model = self.header["embedding_model"]
+        self.count = self.header["count"]
+
+    def section_range(self, name):
+        section = self.header["sections"][name]
+        return self.data_start + section["offset"], section["length"]
+
+    def verify(self):
+        # Checks every section against the checksum recorded at export time
+        with open(self.path, "rb") as f:
+            for name, section in self.header["sections"].items():
+                start, length = self.section_range(name)
+                f.seek(start)
+                digest = hashlib.sha256()
+                remaining = length
+                while remaining:
+                    block = f.read(min(remaining, 1024 * 1024))
+                    if not block:
+                        break
+                    digest.update(block)
+                    remaining -= len(block)
+                if remaining or digest.hexdigest() != section["sha256"]:
+                    raise SnapshotError(f"{self.path} is corrupt: checksum mismatch in its {name} section")
+
+    def vectors(self):
+        if self.count == 0:
+            return np.zeros((0, self.header["dimensions"]), dtype=np.float32)
+        start, _ = self.section_range("vectors")
+        return np.memmap(self.path, dtype=self.header["dtype"], mode="r", offset=start,
+                         shape=(self.count, self.header["dimensions"]))
+
+    def manifest_entries(self):
+        start, length = self.section_range("manifest")
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            return json.loads(f.read(length))["entries"]
+
+    def record(self, i):
+        # Random access to one chunk through the offsets section
+        offsets_start, _ = self.section_range("chunk_offsets")
+        offsets = np.memmap(self.path, dtype=np.uint64, mode="r", offset=offsets_start, shape=(self.count + 1,))
+        start, _ = self.section_range("chunks")
+        with open(self.path, "rb") as f:
+            f.seek(start + int(offsets[i]))
+            return json.loads(f.read(int(offsets[i + 1] - offsets[i])))
+
+    def iter_batches(self, batch_size=1000):
+        """Yield (ids, texts, metadatas, embeddings) in the order they were exported."""
+        vectors = self.vectors()
+        start, _ = self.section_range("chunks")
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            for i in range(0, self.count, batch_size):
+                records = [json.loads(f.readline()) for _ in range(min(batch_size, self.count - i))]
+                yield ([record["id"] for record in records], [record["text"] for record in records],
+                       [record["metadata"] for record in records], np.asarray(vectors[i:i + len(records)], dtype=np.float32))
@@ -0,0 +1,92 @@
+import os
+import time
+import shutil
+import logging
+from Settings.config import CHROMA_PATH
+
+VERSION_FILE = ".kb_version"
+VERSION_PREFIX = "v"
+STAGING_PREFIX = ".staging-"
+
+def get_kb_version(knowledge_base):
+    # The version stamp changes every time a knowledge base is rewritten
+    version_path = os.path.join(CHROMA_PATH, knowledge_base, VERSION_FILE)
+    try:
+        with open(version_path, 'r') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+def get_kb_path(knowledge_base):
+    # Each committed build lives in its own v<version> folder; databases built
+    # before versioned folders keep their data directly in the KB folder
+    root = os.path.join(CHROMA_PATH, knowledge_base)
+    version = get_kb_version(knowledge_base)
+    if version:
+        version_path = os.path.join(root, VERSION_PREFIX + version)
+        if os.path.isdir(version_path):
+            return version_path
+    return root
+
+def bump_kb_version(knowledge_base, version=None):
+    db_path = os.path.join(CHROMA_PATH, knowledge_base)
+    os.makedirs(db_path, exist_ok=True)
+    version = version or str(time.time_ns())
+
+    # Write to a temporary file first so readers never see a partial stamp
+    tmp_path = os.path.join(db_path, VERSION_FILE + ".tmp")
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(db_path, VERSION_FILE))
+    return version
+
+def is_version_entry(name):
+    return name == VERSION_FILE or name.startswith(VERSION_PREFIX) and name[len(VERSION_PREFIX):].isdigit() or name.startswith(STAGING_PREFIX)
+
+def create_staging(knowledge_base, copy_current=True):
+    """Create a private copy of the current build for a rebuild to modify."""
+    root = os.path.join(CHROMA_PATH, knowledge_base)
+    staging_path = os.path.join(root, STAGING_PREFIX + str(time.time_ns()))
+    current_path = get_kb_path(knowledge_base)
+
+    if copy_current and os.path.isdir(current_path):
+        if current_path == root:
+            ignore = lambda directory, names: [name for name in names if directory == root and is_version_entry(name)]
+        else:
+            ignore = None
+        shutil.copytree(current_path, staging_path, ignore=ignore)
+    else:
+        os.makedirs(staging_path)
+    return staging_path
+
+def commit_staging(knowledge_base, staging_path):
+    """Publish a staged build as the current version of the knowledge base.
+
+    Renaming the folder and then swapping the version stamp are each atomic, so
+    readers see either the previous build or the new one, never a mix. The
+    previous build is kept until the next commit in case a query still has it open.
+    """
+    root = os.path.join(CHROMA_PATH, knowledge_base)
+    previous_path = get_kb_path(knowledge_base)
+    version = str(time.time_ns())
+    os.rename(staging_path, os.path.join(root, VERSION_PREFIX + version))
+    bump_kb_version(knowledge_base, version)
+
+    keep = {VERSION_FILE, VERSION_PREFIX + version, os.path.basename(previous_path)}
+    for name in os.listdir(root):
+        if name in keep or name.endswith(".tmp") or name.startswith(STAGING_PREFIX):
+            # Staging folders belong to writers that haven't finished; each one removes its own
+            continue
+        if previous_path == root and not is_version_entry(name):
+            # A build in the pre-versioning layout is the previous one this time
+            continue
+        path = os.path.join(root, name)
+        logging.info(f"Removing old knowledge base build: {path}")
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+    return version
+
+def discard_staging(staging_path):
+    shutil.rmtree(staging_path, ignore_errors=True)
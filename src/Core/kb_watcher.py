@@ -0,0 +1,155 @@
+import threading
+import logging
+import time
+import os
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
+
+# Only these parts of a knowledge base folder are indexed; anything else
+# (such as the URL cache written during a rebuild) is ignored
+WATCHED_DIR = "docs"
+WATCHED_FILES = {"urls.txt"}
+
+class KBWatcher:
+    """Watches KB_PATH and reindexes a knowledge base once its changes settle.
+
+    Uses inotify when inotify_simple is installed and falls back to polling
+    file sizes and mtimes otherwise. Changes are debounced per knowledge base:
+    on_change(kb) is called once no further change has been seen for
+    quiet_seconds, so copying a whole folder of files triggers a single pass.
+    """
+
+    def __init__(self, kb_path, on_change, quiet_seconds=5.0, poll_seconds=2.0, use_inotify=True):
+        self.kb_path = kb_path
+        self.on_change = on_change
+        self.quiet_seconds = quiet_seconds
+        self.poll_seconds = poll_seconds
+        self.use_inotify = use_inotify and INotify is not None
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        target = self.watch_inotify if self.use_inotify else self.watch_polling
+        self.thread = threading.Thread(target=target, daemon=True)
+        self.thread.start()
+        logging.info(f"Watching {self.kb_path} for changes ({'inotify' if self.use_inotify else 'polling'})")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+
+    def knowledge_base_for(self, path):
+        # Maps a changed path to its knowledge base, or None if it isn't indexed
+        parts = os.path.relpath(path, self.kb_path).split(os.sep)
+        if not parts or parts[0] in (".", "..") or parts[0].startswith("."):
+            return None
+        if len(parts) == 1:
+            return parts[0]  # A knowledge base folder was created or removed
+        if parts[1] == WATCHED_DIR or len(parts) == 2 and parts[1] in WATCHED_FILES:
+            return parts[0]
+        return None
+
+    def mark(self, knowledge_base):
+        with self.lock:
+            self.pending[knowledge_base] = time.monotonic()
+
+    def flush(self):
+        # Hands over the knowledge bases that have been quiet long enough
+        now = time.monotonic()
+        with self.lock:
+            ready = [kb for kb, last_change in self.pending.items() if now - last_change >= self.quiet_seconds]
+            for kb in ready:
+                del self.pending[kb]
+        for kb in ready:
+            if not os.path.isdir(os.path.join(self.kb_path, kb)):
+                continue
+            logging.info(f"Changes detected in knowledge base {kb}, reindexing")
+            try:
+                self.on_change(kb)
+            except Exception:
+                logging.exception(f"Error scheduling reindex of {kb}")
+
+    def snapshot(self):
+        state = {}
+        if not os.path.isdir(self.kb_path):
+            return state
+        for kb in os.listdir(self.kb_path):
+            kb_dir = os.path.join(self.kb_path, kb)
+            if kb.startswith(".") or not os.path.isdir(kb_dir):
+                continue
+            state[kb_dir] = None
+            paths = [os.path.join(kb_dir, name) for name in WATCHED_FILES]
+            for root, dirs, files in os.walk(os.path.join(kb_dir, WATCHED_DIR)):
+                paths.extend(os.path.join(root, name) for name in files)
+            for path in paths:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                state[path] = (stat.st_size, stat.st_mtime_ns)
+        return state
+
+    def watch_polling(self):
+        previous = self.snapshot()
+        while not self.stop_event.wait(min(self.poll_seconds, self.quiet_seconds)):
+            current = self.snapshot()
+            for path in set(previous) | set(current):
+                if previous.get(path, -1) != current.get(path, -1):
+                    kb = self.knowledge_base_for(path)
+                    if kb:
+                        self.mark(kb)
+            previous = current
+            self.flush()
+
+    def watch_inotify(self):
+        inotify = INotify()
+        watch_flags = (inotify_flags.CREATE | inotify_flags.CLOSE_WRITE | inotify_flags.DELETE |
+                       inotify_flags.MOVED_TO | inotify_flags.MOVED_FROM | inotify_flags.DELETE_SELF)
+        watches = {}
+
+        def add_watch(path):
+            try:
+                watches[inotify.add_watch(path, watch_flags)] = path
+            except OSError:
+                pass
+
+        def add_tree(path):
+            # The KB root and each KB folder are watched for new folders; docs is watched recursively
+            add_watch(path)
+            for name in os.listdir(path) if os.path.isdir(path) else []:
+                child = os.path.join(path, name)
+                if os.path.isdir(child) and (path == self.kb_path or self.knowledge_base_for(child)):
+                    add_tree(child)
+
+        add_tree(self.kb_path)
+        try:
+            while not self.stop_event.is_set():
+                for event in inotify.read(timeout=int(min(self.poll_seconds, self.quiet_seconds) * 1000)):
+                    if event.mask & inotify_flags.Q_OVERFLOW:
+                        # Events were dropped, so every knowledge base may have changed
+                        for kb in os.listdir(self.kb_path):
+                            if os.path.isdir(os.path.join(self.kb_path, kb)):
+                                self.mark(kb)
+                        continue
+                    parent = watches.get(event.wd)
+                    if parent is None:
+                        continue
+                    if event.mask & inotify_flags.IGNORED:
+                        watches.pop(event.wd, None)
+                        continue
+                    path = os.path.join(parent, event.name) if event.name else parent
+                    if event.mask & (inotify_flags.CREATE | inotify_flags.MOVED_TO) and os.path.isdir(path):
+                        if parent == self.kb_path or self.knowledge_base_for(path):
+                            add_tree(path)
+                    kb = self.knowledge_base_for(path)
+                    if kb:
+                        self.mark(kb)
+                self.flush()
+        finally:
+            inotify.close()
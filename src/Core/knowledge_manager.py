@@ -1,21 +1,169 @@
-from langchain_community.document_loaders import DirectoryLoader, WebBaseLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
 from dotenv import load_dotenv
 import os
 from Settings.config import *
+from Core.kb_version import get_kb_path, create_staging, commit_staging, discard_staging
+from Core.lexical_index import LexicalIndex, LEXICAL_DIR
+from Core.chunk_ids import make_chunk_id, content_hash
+from Core.kb_manifest import KBManifest
+from Core.embedding_pipeline import BatchEmbedder, EmbeddingCache, EmbeddingStats
+from Core.vector_store import open_vector_store, store_backend
+from Core.ingest_pipeline import IngestPipeline
+from Core.document_parsers import ParallelParser, list_files
+from Core.url_fetcher import URLFetcher, URL_CACHE_FILE
+from Core.ingest_scheduler import IngestProgress
+from Core.text_splitter import StreamingTextSplitter
+from Core.dedup import ChunkDeduplicator, DedupIndex, DEDUP_FILE
+from Core.kb_snapshot import KBSnapshot, write_snapshot
+from Core.embedding_backends import build_embedding_backend, write_embedding_info, read_embedding_model, EmbeddingMismatchError
 import logging
 import shutil
 
 # Load environment variables
 load_dotenv()
 
+class KBWriter:
+    """Writes batches of chunks to a staged copy of one knowledge base's build.
+
+    The staging copy is made on the first write or delete, so a knowledge base
+    with nothing to change is never copied. Queries keep reading the current
+    build until commit() publishes the staged one as a new version.
+    """
+
+    def __init__(self, knowledge_base, embedder, stats, progress, fresh=False):
+        self.knowledge_base = knowledge_base
+        self.embedder = embedder
+        self.stats = stats
+        self.progress = progress
+        self.fresh = fresh
+        self.db_path = None
+        self.store = None
+        self.lexical_index = None
+        self.dedup = None
+        self.chunk_ids = {}
+        self.written = 0
+        self.deleted = 0
+        self.duplicates = 0
+
+    def open(self):
+        if self.store is None:
+            if not self.fresh:
+                # Vectors from another model would be added to the copy, and searches against them meaningless
+                model = read_embedding_model(get_kb_path(self.knowledge_base))
+                if model not in (None, self.embedder.model):
+                    raise EmbeddingMismatchError(f"{self.knowledge_base} was embedded with {model}, "
+                                                 f"but this device embeds with {self.embedder.model}")
+            # A fresh build starts empty instead of copying the current one
+            self.db_path = create_staging(self.knowledge_base, copy_current=not self.fresh)
+            self.store = open_vector_store(self.db_path, self.embedder.embedding_function,
+                                           INGEST_SETTINGS["vector_store"], INGEST_SETTINGS["vector_dtype"])
+            self.lexical_index = LexicalIndex(os.path.join(self.db_path, LEXICAL_DIR))
+            if INGEST_SETTINGS["dedup_threshold"]:
+                index = DedupIndex(os.path.join(self.db_path, DEDUP_FILE))
+                self.dedup = ChunkDeduplicator(self.knowledge_base, index, self.open_other_indexes(), INGEST_SETTINGS["dedup_threshold"])
+
+    def open_other_indexes(self):
+        # Chunks are only compared across knowledge bases with the "all" scope
+        others = {}
+        if INGEST_SETTINGS["dedup_scope"] != "all" or not os.path.isdir(CHROMA_PATH):
+            return others
+        for kb in os.listdir(CHROMA_PATH):
+            if kb != self.knowledge_base and os.path.isdir(os.path.join(CHROMA_PATH, kb)):
+                index = DedupIndex.open_current(get_kb_path(kb))
+                if index is not None:
+                    others[kb] = index
+        return others
+
+    def delete(self, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        self.open()
+        self.store.delete(ids)
+        self.lexical_index.delete(ids)
+        if self.dedup is not None:
+            self.dedup.index.delete(ids)
+        self.deleted += len(ids)
+
+    def clear_sources(self, sources, ids):
+        # Removes what changed or removed sources stored, including their duplicate links
+        self.delete(ids)
+        if sources and INGEST_SETTINGS["dedup_threshold"]:
+            self.open()
+            self.dedup.index.remove_links(sources)
+
+    def write(self, chunks):
+        if not chunks:
+            return
+        self.progress.check_cancelled()
+        self.open()
+        if self.dedup is not None:
+            chunks, duplicates = self.dedup.filter(chunks)
+            self.duplicates += duplicates
+            self.stats.duplicates += duplicates
+            self.progress.update(duplicates=duplicates)
+            if not chunks:
+                return
+
+        # Embed in batches, reusing vectors of identical text from any KB
+        texts = [chunk.page_content for chunk in chunks]
+        embeddings = self.embedder.embed(texts, self.stats)
+        self.progress.update(embedded=len(chunks))
+        self.add_embedded(chunks, embeddings)
+
+    def add_embedded(self, chunks, embeddings):
+        # Stores chunks whose vectors are already known, without deduplicating them
+        self.open()
+        ids = [chunk.metadata['chunk_id'] for chunk in chunks]
+        self.store.add(ids, [chunk.page_content for chunk in chunks], [chunk.metadata for chunk in chunks], embeddings)
+        self.lexical_index.add(chunks)
+        for chunk in chunks:
+            self.chunk_ids.setdefault(chunk.metadata.get('source', ''), []).append(chunk.metadata['chunk_id'])
+        self.written += len(chunks)
+        self.progress.update(written=len(chunks))
+
+    def close(self):
+        if self.store is not None:
+            self.lexical_index.close()
+            self.store.close()
+            self.store = None
+            self.lexical_index = None
+        if self.dedup is not None:
+            self.dedup.index.close()
+            for index in self.dedup.other_indexes.values():
+                index.close()
+            self.dedup = None
+
+    def commit(self, manifest=None):
+        self.close()
+        if self.db_path is None:
+            if manifest is None:
+                return
+            # Only the manifest's bookkeeping changed; it still goes through a
+            # staged copy so the live build is never written in place
+            self.open()
+            self.close()
+        if manifest is not None:
+            manifest.db_path = self.db_path
+            manifest.save()
+        write_embedding_info(self.db_path, self.embedder.embedding_function)
+        # The new version stamp makes pooled retrievers for this KB reopen
+        commit_staging(self.knowledge_base, self.db_path)
+        self.db_path = None
+
+    def discard(self):
+        self.close()
+        if self.db_path is not None:
+            discard_staging(self.db_path)
+            self.db_path = None
+
 class KnowledgeManager:
     def __init__(self, root):
         self.root = root
         self.selected_kbs = []
+        self.embedder = None
+        self.embedding_stats = EmbeddingStats()
+        self.url_session = None
 
     def get_knowledge_bases(self):
         return [d for d in os.listdir(KB_PATH) if os.path.isdir(os.path.join(KB_PATH, d))]
@@ -23,92 +171,306 @@ class KnowledgeManager:
     def update_selected_kbs(self, selected_kbs):
         self.selected_kbs = selected_kbs
 
-    def load_docs_folder(self, knowledge_base):
+    def load_docs_folder(self, knowledge_base, progress=None):
         kb_path = os.path.join(KB_PATH, knowledge_base)
         docs_path = os.path.join(kb_path, "docs")
         urls_file = os.path.join(kb_path, "urls.txt")
+        db_path = get_kb_path(knowledge_base)
+        progress = progress or IngestProgress(knowledge_base)
+
+        manifest = KBManifest.load(db_path)
+        # A build is written with one vector store and one embedding model, so switching either means starting over
+        rebuild_reason = None
+        if manifest is not None and store_backend(db_path) != INGEST_SETTINGS["vector_store"]:
+            rebuild_reason = f"{knowledge_base} is stored with the {store_backend(db_path)} backend, rebuilding it with {INGEST_SETTINGS['vector_store']}."
+        elif manifest is not None and read_embedding_model(db_path) not in (None, self.get_embedder().model):
+            rebuild_reason = f"{knowledge_base} was embedded with {read_embedding_model(db_path)}, rebuilding it with {self.get_embedder().model}."
+        if rebuild_reason:
+            print(rebuild_reason)
+            manifest = None
+        fresh = manifest is None
+        if fresh:
+            manifest = KBManifest(db_path)
+
+        # Only new or changed files are loaded, split and embedded
+        file_paths = self.list_docs(docs_path)
+        changed = manifest.scan_files(file_paths)
+        removed = manifest.removed_sources("file", file_paths)
+        print(f"{len(changed)} new or changed and {len(removed)} removed of {len(file_paths)} local documents in {docs_path}")
+
+        urls = self.read_urls(urls_file)
+        removed += manifest.removed_sources("url", urls)
+        fetcher = self.get_url_fetcher(kb_path)
+
+        # Sources whose chunks were dropped as duplicates of chunks that are going away are indexed again
+        forced_urls = set()
+        if not fresh and INGEST_SETTINGS["dedup_threshold"]:
+            for source in self.orphaned_duplicates(knowledge_base, db_path, manifest, list(changed) + removed):
+                entry = manifest.entries.get(source)
+                if entry is not None and entry["kind"] == "url":
+                    forced_urls.add(source)
+                elif os.path.isfile(source):
+                    changed[source] = manifest.file_entry(source)
+
+        writer = KBWriter(knowledge_base, self.get_embedder(), self.embedding_stats, progress, fresh)
+        if fresh and os.path.exists(db_path):
+            # Chunks written without stable IDs can't be updated in place
+            if rebuild_reason is None:
+                print(f"No manifest found for {knowledge_base}, rebuilding its database from scratch.")
+            writer.open()
+
+        # The old chunks of a changed source are deleted just before its new ones are written,
+        # since unchanged text keeps its chunk ID and is upserted in place
+        cleared_sources = set()
+        def write_chunks(chunks):
+            progress.update(chunks=len(chunks))
+            sources = {chunk.metadata.get('source', '') for chunk in chunks} - cleared_sources
+            writer.clear_sources(sources, manifest.chunk_ids(sources))
+            cleared_sources.update(sources)
+            writer.write(chunks)
+
+        pipeline = IngestPipeline(
+            self.split_documents,
+            write_chunks,
+            max_buffered_bytes=int(INGEST_SETTINGS["max_buffered_mb"] * 1024 * 1024),
+            flush_chunks=INGEST_SETTINGS["flush_chunks"]
+        )
+        try:
+            writer.clear_sources(removed, manifest.chunk_ids(removed))
+            documents = self.iter_changed_documents(list(changed), fetcher, urls, forced_urls, manifest, changed, progress)
+            document_count, chunk_count = pipeline.run(documents)
+            # Sources that no longer produce any chunks
+            remaining = set(changed) - cleared_sources
+            writer.clear_sources(remaining, manifest.chunk_ids(remaining))
+            progress.check_cancelled()
+
+            if not changed and not removed and writer.db_path is None:
+                print(f"Knowledge base {knowledge_base} is up to date.")
+                # Nothing was staged, so the live build and its manifest are left alone;
+                # files that were only touched get re-hashed on the next rebuild
+                fetcher.save(urls)
+                return
+            print(f"Split {document_count} documents into {chunk_count} chunks, "
+                  f"wrote {writer.written} chunks, skipped {writer.duplicates} near-duplicates "
+                  f"and removed {writer.deleted} stale chunks for {knowledge_base}.")
+
+            # Record what each source produced so the next rebuild can replace exactly those chunks
+            for source, entry in changed.items():
+                manifest.update(source, entry, writer.chunk_ids.get(source, []))
+            manifest.remove(removed)
+            writer.commit(manifest)
+            # Saved last so pages are only skipped as unchanged once their chunks are stored
+            fetcher.save(urls)
+        except BaseException:
+            writer.discard()
+            raise
+        finally:
+            fetcher.close()
+
+    def orphaned_duplicates(self, knowledge_base, db_path, manifest, stale_sources):
+        # Duplicates of chunks about to be deleted, or of chunks in other knowledge bases that no longer exist
+        index = DedupIndex.open_current(db_path)
+        if index is None:
+            return set()
+        others = {}
+        try:
+            orphaned = index.linked_sources(knowledge_base, manifest.chunk_ids(stale_sources))
+            for source, original_kb, original_id in index.external_links(knowledge_base):
+                if original_kb not in others:
+                    exists = os.path.isdir(os.path.join(CHROMA_PATH, original_kb))
+                    others[original_kb] = DedupIndex.open_current(get_kb_path(original_kb)) if exists else None
+                if others[original_kb] is None or not others[original_kb].contains(original_id):
+                    orphaned.add(source)
+        finally:
+            index.close()
+            for other in others.values():
+                if other is not None:
+                    other.close()
+        return orphaned - set(stale_sources)
 
-        # Load and process documents
-        documents = self.load_documents(docs_path, urls_file)
-        chunks = self.split_text(documents)
-        self.save_to_chroma(chunks, knowledge_base)
-
-    def load_documents(self, docs_path, urls_file):
-        # Load local documents
-        local_loader = DirectoryLoader(docs_path, glob="*.*")
-        local_documents = local_loader.load()
-        print(f"Loaded {len(local_documents)} local documents from {docs_path}")
-
-        # Load URLs
-        url_documents = self.load_urls(urls_file)
-        
-        # Combine local and URL documents
-        all_documents = local_documents + url_documents
-        print(f"Total documents loaded: {len(all_documents)}")
-        return all_documents
-
-    def load_urls(self, urls_file):
+    def iter_changed_documents(self, file_paths, fetcher, urls, forced_urls, manifest, changed, progress):
+        # Runs on the pipeline's loader thread; URL pages are compared by content hash
+        # and recorded in changed as they are found
+        source = None
+        for doc in self.iter_files(file_paths):
+            progress.check_cancelled()
+            if doc.metadata.get('source') != source:
+                source = doc.metadata.get('source')
+                progress.update(files=1)
+            yield doc
+        for url, pages in self.iter_urls(fetcher, urls, set(manifest.entries) - forced_urls):
+            progress.check_cancelled()
+            content = content_hash("\n".join(page.page_content for page in pages))
+            entry = manifest.entries.get(url)
+            if entry is None or url in forced_urls or entry["hash"] != content:
+                changed[url] = {"kind": "url", "hash": content}
+                progress.update(files=1)
+                yield from pages
+
+    def list_docs(self, docs_path):
+        return list_files(docs_path)
+
+    def iter_files(self, file_paths):
+        parser = ParallelParser(INGEST_SETTINGS["parse_workers"], INGEST_SETTINGS["parse_timeout_seconds"])
+        return parser.iter_documents(file_paths)
+
+    def read_urls(self, urls_file):
         if not os.path.exists(urls_file):
             print(f"No {urls_file} found. Skipping URL loading.")
             return []
 
         with open(urls_file, 'r') as file:
-            urls = file.read().splitlines()
+            return [url for url in file.read().splitlines() if url.strip()]
 
-        url_documents = []
-        for url in urls:
-            try:
-                loader = WebBaseLoader(url)
-                url_documents.extend(loader.load())
-                print(f"Loaded content from: {url}")
-            except Exception as e:
-                print(f"Error loading {url}: {e}")
+    def get_url_fetcher(self, kb_path):
+        return URLFetcher(
+            os.path.join(kb_path, URL_CACHE_FILE),
+            session=self.url_session,
+            max_workers=INGEST_SETTINGS["url_workers"],
+            per_host=INGEST_SETTINGS["url_per_host"],
+            timeout=INGEST_SETTINGS["url_timeout_seconds"]
+        )
 
-        print(f"Loaded {len(url_documents)} documents from URLs")
-        return url_documents
+    def iter_urls(self, fetcher, urls, ingested_urls):
+        # Pages that were never ingested are fetched unconditionally
+        loaded = unchanged = 0
+        for result in fetcher.fetch_all(urls, revalidate_urls=ingested_urls):
+            if result.status == "error":
+                print(f"Error loading {result.url}: {result.error}")
+            elif result.status == "not_modified":
+                unchanged += 1
+            else:
+                loaded += 1
+                print(f"Loaded content from: {result.url}")
+                yield result.url, result.documents
 
-    def split_text(self, documents: list[Document]):
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            add_start_index=True,
+        print(f"Loaded {loaded} changed and skipped {unchanged} unchanged of {len(urls)} URLs")
+
+    def get_text_splitter(self):
+        return StreamingTextSplitter(
+            chunk_size=INGEST_SETTINGS["chunk_size"],
+            chunk_overlap=INGEST_SETTINGS["chunk_overlap"],
+            unit=INGEST_SETTINGS["chunk_unit"]
         )
-        chunks = text_splitter.split_documents(documents)
+
+    def split_documents(self, documents):
+        chunks = self.get_text_splitter().split_documents(documents)
+        for chunk in chunks:
+            chunk.metadata['chunk_id'] = make_chunk_id(chunk.metadata.get('source', ''), chunk.metadata.get('start_index', -1), chunk.page_content)
+        return chunks
+
+    def split_text(self, documents: list[Document]):
+        chunks = self.split_documents(documents)
         print(f"Split {len(documents)} documents into {len(chunks)} chunks.")
         return chunks
 
-    def save_to_chroma(self, chunks: list[Document], knowledge_base: str):
-        db_path = os.path.join(CHROMA_PATH, knowledge_base)
-        embedding_function = OpenAIEmbeddings()
-        
-        # Check if the database already exists
-        if os.path.exists(db_path):
-            # Load the existing database
-            db = Chroma(persist_directory=db_path, embedding_function=embedding_function)
-            
-            # Add new documents to the existing database
-            db.add_documents(chunks)
-        else:
-            # Create a new database if it doesn't exist
-            db = Chroma.from_documents(chunks, embedding_function, persist_directory=db_path)
-        
-        # Persist the changes
-        db.persist()
-        print(f"Updated database with {len(chunks)} chunks in {db_path}.")
-
-    def build_vector_database(self, knowledge_base=None):
+    def get_embedder(self):
+        if self.embedder is None:
+            self.embedder = BatchEmbedder(
+                build_embedding_backend(EMBEDDING_SETTINGS),
+                cache=EmbeddingCache(INGEST_SETTINGS["embedding_cache_path"]),
+                batch_size=INGEST_SETTINGS["embedding_batch_size"],
+                max_in_flight=INGEST_SETTINGS["embedding_max_in_flight"],
+                max_retries=INGEST_SETTINGS["embedding_max_retries"]
+            )
+        return self.embedder
+
+    def save_to_chroma(self, chunks: list[Document], knowledge_base: str, stale_ids=()):
+        db_path = get_kb_path(knowledge_base)
+        if not chunks and not os.path.exists(db_path):
+            print(f"No chunks to add to {db_path}.")
+            return
+
+        writer = KBWriter(knowledge_base, self.get_embedder(), self.embedding_stats, IngestProgress(knowledge_base))
+        try:
+            # Replace the chunks of changed and removed sources
+            writer.delete(stale_ids)
+            flush_chunks = INGEST_SETTINGS["flush_chunks"]
+            for i in range(0, len(chunks), flush_chunks):
+                writer.write(chunks[i:i + flush_chunks])
+            writer.commit()
+        except BaseException:
+            writer.discard()
+            raise
+        print(f"Updated {knowledge_base} with {writer.written} chunks and removed {writer.deleted} stale chunks.")
+
+    def export_knowledge_base(self, knowledge_base, snapshot_path, dtype="float32"):
+        # Packages the current build so other devices can import it without re-embedding
+        db_path = get_kb_path(knowledge_base)
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"Knowledge base {knowledge_base} has not been built yet")
+        manifest = KBManifest.load(db_path)
+        store = open_vector_store(db_path, None)
+        try:
+            embedding_model = read_embedding_model(db_path) or self.get_embedder().model
+            header = write_snapshot(snapshot_path, knowledge_base, store.iter_batches(), manifest.entries if manifest else {},
+                                    embedding_model, dtype)
+        finally:
+            store.close()
+        print(f"Exported {header['count']} chunks of {knowledge_base} to {snapshot_path}")
+        return header
+
+    def import_knowledge_base(self, snapshot_path, knowledge_base=None):
+        snapshot = KBSnapshot(snapshot_path)
+        snapshot.verify()
+        knowledge_base = knowledge_base or snapshot.knowledge_base
+        embedder = self.get_embedder()
+        if snapshot.embedding_model != embedder.model:
+            raise EmbeddingMismatchError(f"{snapshot_path} was embedded with {snapshot.embedding_model}, "
+                             f"but this device embeds with {embedder.model}")
+
+        # Sources are paths under the KB folder, so they move with a renamed KB
+        old_prefix = os.path.join(KB_PATH, snapshot.knowledge_base) + os.sep
+        new_prefix = os.path.join(KB_PATH, knowledge_base) + os.sep
+        rename = lambda source: new_prefix + source[len(old_prefix):] if source.startswith(old_prefix) else source
+        kb_path = os.path.join(KB_PATH, knowledge_base)
+        os.makedirs(os.path.join(kb_path, "docs"), exist_ok=True)
+        urls = set(self.read_urls(os.path.join(kb_path, "urls.txt")))
+
+        # Sources this device can't read are kept as "snapshot" entries, which rebuilds never remove
+        manifest = KBManifest(None)
+        for source, entry in snapshot.manifest_entries().items():
+            source = rename(source)
+            available = os.path.isfile(source) if entry["kind"] == "file" else source in urls
+            manifest.entries[source] = entry if available else dict(entry, kind="snapshot")
+
+        # Imports don't embed anything, so they keep their counters out of the rebuild statistics
+        writer = KBWriter(knowledge_base, embedder, EmbeddingStats(), IngestProgress(knowledge_base), fresh=True)
+        try:
+            writer.open()
+            for ids, texts, metadatas, embeddings in snapshot.iter_batches(INGEST_SETTINGS["flush_chunks"]):
+                chunks = []
+                for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                    metadata = dict(metadata, chunk_id=chunk_id)
+                    if 'source' in metadata:
+                        metadata['source'] = rename(metadata['source'])
+                    chunks.append(Document(page_content=text, metadata=metadata))
+                writer.add_embedded(chunks, embeddings)
+                if writer.dedup is not None:
+                    writer.dedup.remember(chunks)
+                # Later rebuilds on this device reuse the vectors instead of calling the API
+                if embedder.cache:
+                    embedder.cache.put_many(embedder.model, zip((content_hash(text) for text in texts), embeddings))
+            writer.commit(manifest)
+        except BaseException:
+            writer.discard()
+            raise
+        print(f"Imported {writer.written} chunks from {snapshot_path} into {knowledge_base}")
+        return knowledge_base
+
+    def build_vector_database(self, knowledge_base=None, progress=None):
+        self.embedding_stats = EmbeddingStats()
         if knowledge_base:
             kb_path = os.path.join(KB_PATH, knowledge_base)
             if os.path.isdir(kb_path):
                 print(f"Processing knowledge base: {knowledge_base}")
-                self.load_docs_folder(knowledge_base)
+                self.load_docs_folder(knowledge_base, progress)
             else:
                 print(f"Creating new knowledge base.")
                 os.makedirs(os.path.join(kb_path, "docs"))
                 with open(os.path.join(kb_path, "urls.txt"), 'w') as f:
                     pass  # Create an empty urls.txt file
-                self.load_docs_folder(knowledge_base)
+                self.load_docs_folder(knowledge_base, progress)
         else:
             # Update all knowledge bases
             knowledge_bases = self.get_knowledge_bases()
@@ -117,6 +479,8 @@ class KnowledgeManager:
                 print(f"Processing knowledge base: {kb}")
                 self.load_docs_folder(kb)
 
+        print(self.embedding_stats.summary())
+
     def add_to_knowledge_base(self, kb_name, url=None, file_path=None):
         kb_path = os.path.join(KB_PATH, kb_name)
         if not os.path.exists(kb_path):
@@ -0,0 +1,277 @@
+from langchain.schema import Document
+from collections import Counter, defaultdict
+import numpy as np
+import threading
+import logging
+import shutil
+import heapq
+import json
+import math
+import os
+import re
+from Core.chunk_ids import chunk_id
+
+LEXICAL_DIR = "lexical"
+
+# Identifiers such as part numbers, hostnames and error codes are kept whole,
+# and their parts are indexed as well so partial matches still score
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_.:/][a-z0-9]+)*")
+TOKEN_SEPARATORS = re.compile(r"[-_.:/]")
+
+def tokenize(text):
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(TOKEN_SEPARATORS.split(token))
+    return tokens
+
+def is_keyword_query(query):
+    # Short queries quoting a phrase or naming an identifier don't need semantic search
+    if re.search(r'"[^"]+"', query):
+        return True
+    words = query.split()
+    if not words or len(words) > 6:
+        return False
+    return any(re.search(r"\d", word) and re.search(r"[A-Za-z]", word) or re.search(r"\w[-_.:/]\w", word) for word in words)
+
+def load_array(path):
+    # Empty arrays can't be memory-mapped
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:
+        return np.load(path)
+
+def write_json(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+class Segment:
+    """An immutable batch of indexed chunks; only its deletion list changes after it is written."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lengths = load_array(os.path.join(path, "lengths.npy"))
+        self.offsets = load_array(os.path.join(path, "offsets.npy"))
+        self.post_docs = load_array(os.path.join(path, "post_docs.npy"))
+        self.post_tf = load_array(os.path.join(path, "post_tf.npy"))
+        with open(os.path.join(path, "vocab.json"), "r") as f:
+            self.vocab = json.load(f)
+        deleted_path = os.path.join(path, "deleted.json")
+        self.deleted = set()
+        if os.path.exists(deleted_path):
+            with open(deleted_path, "r") as f:
+                self.deleted = set(json.load(f))
+        self.tombstones = np.zeros(len(self.lengths), dtype=bool)
+        self.tombstones[list(self.deleted)] = True
+        self.rows = None  # Chunk ID to row, read on the first delete
+        self.docs_file = open(os.path.join(path, "docs.jsonl"), "rb")
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def write(path, documents):
+        os.makedirs(path)
+        postings = defaultdict(list)
+        lengths = []
+        offsets = [0]
+        ids = []
+
+        with open(os.path.join(path, "docs.jsonl"), "wb") as f:
+            for i, doc in enumerate(documents):
+                doc_id = chunk_id(doc)
+                counts = Counter(tokenize(doc.page_content))
+                lengths.append(sum(counts.values()))
+                for term, tf in counts.items():
+                    postings[term].append((i, tf))
+                line = (json.dumps({"id": doc_id, "text": doc.page_content, "metadata": doc.metadata}, default=str) + "\n").encode("utf-8")
+                f.write(line)
+                offsets.append(offsets[-1] + len(line))
+                ids.append(doc_id)
+
+        vocab = {}
+        post_docs = []
+        post_tf = []
+        for term in sorted(postings):
+            start = len(post_docs)
+            for doc_index, tf in postings[term]:
+                post_docs.append(doc_index)
+                post_tf.append(tf)
+            vocab[term] = [start, len(post_docs)]
+
+        np.save(os.path.join(path, "lengths.npy"), np.asarray(lengths, dtype=np.int32))
+        np.save(os.path.join(path, "offsets.npy"), np.asarray(offsets, dtype=np.int64))
+        np.save(os.path.join(path, "post_docs.npy"), np.asarray(post_docs, dtype=np.int32))
+        np.save(os.path.join(path, "post_tf.npy"), np.asarray(post_tf, dtype=np.float32))
+        write_json(os.path.join(path, "vocab.json"), vocab)
+        write_json(os.path.join(path, "ids.json"), ids)
+
+    def row_ids(self):
+        # The segment never changes, so its IDs are parsed once
+        if self.rows is None:
+            with open(os.path.join(self.path, "ids.json"), "r") as f:
+                self.rows = {doc_id: i for i, doc_id in enumerate(json.load(f))}
+        return self.rows
+
+    def live_count(self):
+        return len(self.lengths) - len(self.deleted)
+
+    def live_length(self):
+        total = int(np.sum(self.lengths))
+        return total - sum(int(self.lengths[i]) for i in self.deleted)
+
+    def document_frequency(self, term):
+        span = self.vocab.get(term)
+        if not span:
+            return 0
+        # Deleted chunks stop counting towards IDF right away, not only after a merge
+        return span[1] - span[0] - int(np.count_nonzero(self.tombstones[self.post_docs[span[0]:span[1]]]))
+
+    def record(self, i):
+        with self.lock:
+            self.docs_file.seek(int(self.offsets[i]))
+            data = self.docs_file.read(int(self.offsets[i + 1] - self.offsets[i]))
+        return json.loads(data)
+
+    def delete(self, doc_ids):
+        rows = self.row_ids()
+        hits = [rows[doc_id] for doc_id in doc_ids if doc_id in rows and rows[doc_id] not in self.deleted]
+        if hits:
+            self.deleted.update(hits)
+            self.tombstones[hits] = True
+            write_json(os.path.join(self.path, "deleted.json"), sorted(self.deleted))
+        return len(hits)
+
+    def close(self):
+        self.docs_file.close()
+
+class LexicalIndex:
+    """On-disk BM25 index made of memory-mapped segments.
+
+    Adding chunks writes a new segment and deleting them records tombstones, so
+    updates never rewrite existing data until segments are compacted.
+    """
+
+    def __init__(self, path, k1=1.5, b=0.75, max_segments=8):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.max_segments = max_segments
+        self.segments = []
+        self.next_segment = 0
+        self.load()
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, "index.json"))
+
+    def load(self):
+        index_path = os.path.join(self.path, "index.json")
+        if not os.path.exists(index_path):
+            return
+        with open(index_path, "r") as f:
+            index = json.load(f)
+        self.next_segment = index["next_segment"]
+        self.segments = [Segment(os.path.join(self.path, name)) for name in index["segments"]]
+
+    def save(self):
+        write_json(os.path.join(self.path, "index.json"), {
+            "segments": [os.path.basename(segment.path) for segment in self.segments],
+            "next_segment": self.next_segment,
+        })
+
+    def add(self, documents):
+        documents = list(documents)
+        if not documents:
+            return
+        os.makedirs(self.path, exist_ok=True)
+
+        # Re-adding a chunk replaces its previous copy
+        self.delete(chunk_id(doc) for doc in documents)
+
+        segment_path = os.path.join(self.path, f"seg_{self.next_segment:06d}")
+        self.next_segment += 1
+        Segment.write(segment_path, documents)
+        self.segments.append(Segment(segment_path))
+        self.save()
+
+        if len(self.segments) > self.max_segments:
+            self.compact()
+
+    def delete(self, doc_ids):
+        doc_ids = set(doc_ids)
+        if not doc_ids:
+            return 0
+        return sum(segment.delete(doc_ids) for segment in self.segments)
+
+    def compact(self):
+        # Merge all live chunks into a single segment and drop the old ones
+        old_segments = self.segments
+        self.segments = []
+        if sum(segment.live_count() for segment in old_segments):
+            segment_path = os.path.join(self.path, f"seg_{self.next_segment:06d}")
+            self.next_segment += 1
+            Segment.write(segment_path, self.live_documents(old_segments))
+            self.segments.append(Segment(segment_path))
+        self.save()
+
+        for segment in old_segments:
+            segment.close()
+            shutil.rmtree(segment.path, ignore_errors=True)
+        logging.info(f"Compacted lexical index {self.path} into {len(self.segments)} segment(s)")
+
+    def live_documents(self, segments):
+        # Streams chunks back out of the segments without holding them all in memory
+        for segment in segments:
+            for i in range(len(segment.lengths)):
+                if i not in segment.deleted:
+                    record = segment.record(i)
+                    metadata = dict(record["metadata"])
+                    metadata['chunk_id'] = record["id"]
+                    yield Document(page_content=record["text"], metadata=metadata)
+
+    def search(self, query, k):
+        terms = set(tokenize(query))
+        total_docs = sum(segment.live_count() for segment in self.segments)
+        if not terms or total_docs == 0:
+            return []
+
+        avg_length = max(sum(segment.live_length() for segment in self.segments) / total_docs, 1.0)
+        idf = {}
+        for term in terms:
+            df = sum(segment.document_frequency(term) for segment in self.segments)
+            if df:
+                idf[term] = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+
+        best = []
+        for segment_index, segment in enumerate(self.segments):
+            scores = np.zeros(len(segment.lengths), dtype=np.float32)
+            for term, term_idf in idf.items():
+                span = segment.vocab.get(term)
+                if not span:
+                    continue
+                docs = segment.post_docs[span[0]:span[1]]
+                tf = segment.post_tf[span[0]:span[1]]
+                lengths = segment.lengths[docs]
+                scores[docs] += term_idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * lengths / avg_length))
+            if segment.deleted:
+                scores[list(segment.deleted)] = 0
+
+            matched = np.nonzero(scores)[0]
+            if len(matched) > k:
+                matched = matched[np.argpartition(-scores[matched], k)[:k]]
+            best.extend((float(scores[i]), segment_index, int(i)) for i in matched)
+
+        results = []
+        for score, segment_index, i in heapq.nlargest(k, best):
+            record = self.segments[segment_index].record(i)
+            metadata = dict(record["metadata"])
+            metadata['chunk_id'] = record["id"]
+            metadata['relevance_score'] = score
+            results.append(Document(page_content=record["text"], metadata=metadata))
+        return results
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
@@ -0,0 +1,109 @@
+from collections import OrderedDict
+import threading
+import logging
+import os
+from Core.kb_version import get_kb_version, get_kb_path
+from Core.vector_store import open_vector_store, store_backend
+from Core.lexical_index import LexicalIndex, LEXICAL_DIR
+from Core.embedding_backends import read_embedding_model
+
+def directory_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return total
+
+class PooledRetriever:
+    def __init__(self, knowledge_base, store, lexical, version, size_bytes, embedding_model=None):
+        self.knowledge_base = knowledge_base
+        self.store = store
+        self.lexical = lexical
+        self.version = version
+        self.size_bytes = size_bytes
+        self.embedding_model = embedding_model
+
+class RetrieverPool:
+    """Keeps opened knowledge base stores alive between queries."""
+
+    def __init__(self, embedding_function, memory_cap_mb):
+        self.embedding_function = embedding_function
+        self.memory_cap_bytes = memory_cap_mb * 1024 * 1024
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.open_locks = {}
+
+    def get(self, knowledge_base):
+        version = get_kb_version(knowledge_base)
+        db_path = get_kb_path(knowledge_base)
+        if not os.path.exists(db_path):
+            self.invalidate(knowledge_base)
+            return None
+
+        with self.lock:
+            entry = self.entries.get(knowledge_base)
+            if entry is not None and entry.version == version:
+                self.entries.move_to_end(knowledge_base)
+                return entry
+            open_lock = self.open_locks.setdefault(knowledge_base, threading.Lock())
+
+        # Only one thread opens a given KB; others wait and reuse its result
+        with open_lock:
+            with self.lock:
+                entry = self.entries.get(knowledge_base)
+                if entry is not None and entry.version == version:
+                    self.entries.move_to_end(knowledge_base)
+                    return entry
+
+            entry = self.open(knowledge_base, db_path, version)
+
+            with self.lock:
+                previous = self.entries.get(knowledge_base)
+                self.entries[knowledge_base] = entry
+                self.entries.move_to_end(knowledge_base)
+                self.evict()
+            if previous is not None:
+                self.close_entry(previous)
+            return entry
+
+    def open(self, knowledge_base, db_path, version):
+        backend = store_backend(db_path)
+        logging.info(f"Opening knowledge base store: {knowledge_base} ({backend})")
+        store = open_vector_store(db_path, self.embedding_function, backend)
+
+        # KBs built before lexical indexing was added only support vector search
+        lexical_path = os.path.join(db_path, LEXICAL_DIR)
+        lexical = LexicalIndex(lexical_path) if LexicalIndex.exists(lexical_path) else None
+        return PooledRetriever(knowledge_base, store, lexical, version, directory_size(db_path), read_embedding_model(db_path))
+
+    def evict(self):
+        # Drop least recently used stores until under the cap, always keeping the newest one
+        total = sum(entry.size_bytes for entry in self.entries.values())
+        while total > self.memory_cap_bytes and len(self.entries) > 1:
+            kb, entry = self.entries.popitem(last=False)
+            total -= entry.size_bytes
+            self.close_entry(entry)
+            logging.info(f"Evicted knowledge base store from pool: {kb}")
+
+    def close_entry(self, entry):
+        # A query still searching this store may fail; it is reported as that KB's error
+        try:
+            entry.store.close()
+            if entry.lexical is not None:
+                entry.lexical.close()
+        except Exception as e:
+            logging.warning(f"Error closing knowledge base store {entry.knowledge_base}: {e}")
+
+    def invalidate(self, knowledge_base=None):
+        with self.lock:
+            if knowledge_base is None:
+                entries = list(self.entries.values())
+                self.entries.clear()
+            else:
+                entry = self.entries.pop(knowledge_base, None)
+                entries = [entry] if entry is not None else []
+        for entry in entries:
+            self.close_entry(entry)
@@ -0,0 +1,85 @@
+from collections import OrderedDict
+import numpy as np
+import threading
+import time
+
+class CacheEntry:
+    def __init__(self, vector, key, kb_versions, documents):
+        self.vector = vector
+        self.key = key
+        self.kb_versions = kb_versions
+        self.documents = documents
+        self.created = time.monotonic()
+
+class SemanticCache:
+    """Reuses retrieved documents for queries whose embeddings are close to an earlier query.
+
+    Entries only match queries against the same set of knowledge bases and
+    settings, expire after a TTL, and are dropped as soon as any of their
+    knowledge bases has been rebuilt since they were stored.
+    """
+
+    def __init__(self, threshold=0.95, ttl_seconds=3600, max_entries=256):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.next_id = 0
+        self.hits = 0
+        self.misses = 0
+
+    def normalize(self, query_embedding):
+        vector = np.asarray(query_embedding, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def lookup(self, query_embedding, key, kb_versions):
+        vector = self.normalize(query_embedding)
+        now = time.monotonic()
+
+        with self.lock:
+            # Drop expired entries and entries whose knowledge bases were rebuilt
+            for entry_id, entry in list(self.entries.items()):
+                if now - entry.created > self.ttl_seconds:
+                    del self.entries[entry_id]
+                elif any(kb_versions.get(kb, entry.kb_versions[kb]) != entry.kb_versions[kb] for kb in entry.kb_versions):
+                    del self.entries[entry_id]
+
+            candidates = [(entry_id, entry) for entry_id, entry in self.entries.items() if entry.key == key and entry.kb_versions == kb_versions]
+            if candidates:
+                similarities = np.stack([entry.vector for _, entry in candidates]) @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entry_id, entry = candidates[best]
+                    self.entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return list(entry.documents)
+
+            self.misses += 1
+            return None
+
+    def store(self, query_embedding, key, kb_versions, documents):
+        with self.lock:
+            self.entries[self.next_id] = CacheEntry(self.normalize(query_embedding), key, dict(kb_versions), list(documents))
+            self.next_id += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, knowledge_base=None):
+        with self.lock:
+            if knowledge_base is None:
+                self.entries.clear()
+                return
+            for entry_id, entry in list(self.entries.items()):
+                if knowledge_base in entry.kb_versions:
+                    del self.entries[entry_id]
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self.entries),
+            }
@@ -0,0 +1,86 @@
+from langchain.schema import Document
+from collections import deque
+import re
+from Core.context_packer import count_tokens
+
+# A unit runs to the end of a sentence or line, whichever comes first, and takes
+# its trailing whitespace with it. Punctuation not followed by whitespace, as in
+# "3.14" or "e.g.x", doesn't end a sentence. The scan never backtracks.
+UNIT_PATTERN = re.compile(r"(?:[^.!?\n]+|[.!?]+(?!\s|$))*(?:[.!?]+|\n|$)\s*")
+WORD_PATTERN = re.compile(r"\S+\s*")
+
+def char_length(text):
+    return len(text)
+
+class StreamingTextSplitter:
+    """Splits text in one pass over sentence and line boundaries, keeping exact offsets.
+
+    Chunks are built greedily from sentences or lines until the next one would
+    exceed chunk_size, then the window slides forward keeping up to
+    chunk_overlap of trailing units. Sizes are measured in tokens with the local
+    tokenizer, or in characters. Every chunk's text is exactly
+    text[start_index:end_index] of its document.
+    """
+
+    def __init__(self, chunk_size=250, chunk_overlap=50, unit="tokens"):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.length = count_tokens if unit == "tokens" else char_length
+        # Hard cuts inside a single huge word go by characters; a token is at least one character
+        self.max_cut_chars = chunk_size
+
+    def iter_units(self, text):
+        # Yields (start, end, length) with sentences or words longer than a chunk broken down further
+        for match in UNIT_PATTERN.finditer(text):
+            start, end = match.span()
+            while start < end and text[start].isspace():
+                start += 1
+            if start == end:
+                continue
+            length = end - start if self.length is char_length else self.length(text[start:end])
+            if length <= self.chunk_size:
+                yield start, end, length
+                continue
+            for word in WORD_PATTERN.finditer(text, start, end):
+                length = self.length(word.group())
+                if length <= self.chunk_size:
+                    yield word.start(), word.end(), length
+                    continue
+                for cut in range(word.start(), word.end(), self.max_cut_chars):
+                    cut_end = min(cut + self.max_cut_chars, word.end())
+                    yield cut, cut_end, self.length(text[cut:cut_end])
+
+    def iter_spans(self, text):
+        """Yield (start, end) offsets of each chunk of text."""
+        window = deque()
+        window_length = 0
+        for unit in self.iter_units(text):
+            if window and window_length + unit[2] > self.chunk_size:
+                yield window[0][0], self.trimmed_end(text, window[-1][1])
+                # Slide forward, keeping trailing units up to the overlap that still leave room
+                while window and (window_length > self.chunk_overlap or window_length + unit[2] > self.chunk_size):
+                    window_length -= window.popleft()[2]
+            window.append(unit)
+            window_length += unit[2]
+        if window:
+            yield window[0][0], self.trimmed_end(text, window[-1][1])
+
+    def trimmed_end(self, text, end):
+        while end > 0 and text[end - 1].isspace():
+            end -= 1
+        return end
+
+    def split_documents(self, documents):
+        chunks = []
+        for doc in documents:
+            text = doc.page_content
+            for start, end in self.iter_spans(text):
+                if start >= end:
+                    continue
+                metadata = dict(doc.metadata)
+                metadata['start_index'] = start
+                metadata['end_index'] = end
+                chunks.append(Document(page_content=text[start:end], metadata=metadata))
+        return chunks
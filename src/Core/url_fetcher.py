@@ -0,0 +1,146 @@
+from langchain.schema import Document
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+import requests
+import threading
+import json
+import os
+from Core.chunk_ids import content_hash
+from Core.document_parsers import HTMLTextExtractor
+
+URL_CACHE_FILE = "url_cache.json"
+
+class FetchResult:
+    def __init__(self, url, status, documents=None, error=None):
+        self.url = url
+        self.status = status  # "modified", "not_modified" or "error"
+        self.documents = documents or []
+        self.error = error
+
+class URLFetcher:
+    """Downloads URLs concurrently over one pooled keep-alive session.
+
+    The ETag, Last-Modified and content hash of every page are kept in
+    url_cache.json, and pages already ingested are revalidated with conditional
+    requests, so unchanged ones come back as 304 and are never parsed again.
+    Cache updates are held until save() so a failed rebuild refetches them.
+    """
+
+    def __init__(self, cache_path, session=None, max_workers=8, per_host=2, timeout=20):
+        self.cache_path = cache_path
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.timeout = timeout
+        # An injected session, such as one pointed at a local test server, is left open
+        self.owns_session = session is None
+        self.session = session or self.create_session()
+        self.cache = {}
+        self.pending = {}
+        self.host_limits = {}
+        self.lock = threading.Lock()
+        if os.path.exists(cache_path):
+            with open(cache_path, "r") as f:
+                self.cache = json.load(f)
+
+    def create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers["User-Agent"] = "OpenPI knowledge base fetcher"
+        return session
+
+    def host_limit(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.host_limits:
+                self.host_limits[host] = threading.Semaphore(self.per_host)
+            return self.host_limits[host]
+
+    def fetch(self, url, revalidate=True):
+        entry = self.cache.get(url, {}) if revalidate else {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            with self.host_limit(url):
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304:
+                return FetchResult(url, "not_modified")
+            response.raise_for_status()
+
+            # Servers without validators still skip parsing when the body is unchanged
+            body_hash = content_hash(response.text)
+            new_entry = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "hash": body_hash,
+            }
+            with self.lock:
+                self.pending[url] = new_entry
+            if entry.get("hash") == body_hash:
+                return FetchResult(url, "not_modified")
+            return FetchResult(url, "modified", self.parse(url, response))
+        except Exception as e:
+            return FetchResult(url, "error", error=e)
+
+    def parse(self, url, response):
+        content_type = response.headers.get("Content-Type", "text/html").lower()
+        metadata = {"source": url}
+        if "html" in content_type:
+            extractor = HTMLTextExtractor()
+            extractor.feed(response.text)
+            extractor.close()
+            text = extractor.text()
+            if extractor.title:
+                metadata["title"] = extractor.title
+        elif content_type.startswith("text/") or "json" in content_type or "xml" in content_type:
+            text = response.text
+        else:
+            raise ValueError(f"Unsupported content type {content_type}")
+        return [Document(page_content=text, metadata=metadata)]
+
+    def fetch_all(self, urls, revalidate_urls=None):
+        """Yield a FetchResult per URL as downloads finish.
+
+        Only URLs in revalidate_urls get conditional requests; None revalidates all.
+        At most max_workers downloads are in flight, so a slow consumer holds up fetching.
+        """
+        urls = list(dict.fromkeys(urls))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = set()
+            for url in urls:
+                if len(running) >= self.max_workers:
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                revalidate = revalidate_urls is None or url in revalidate_urls
+                running.add(executor.submit(self.fetch, url, revalidate))
+            while running:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+    def save(self, urls=None):
+        # Commits the validators fetched so far, dropping URLs no longer listed
+        with self.lock:
+            self.cache.update(self.pending)
+            self.pending = {}
+            if urls is not None:
+                urls = set(urls)
+                self.cache = {url: entry for url, entry in self.cache.items() if url in urls}
+            cache = dict(self.cache)
+        if not cache and not os.path.exists(self.cache_path):
+            return
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_path, self.cache_path)
+
+    def close(self):
+        if self.owns_session:
+            self.session.close()
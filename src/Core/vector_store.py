@@ -0,0 +1,347 @@
+from langchain_community.vectorstores import Chroma
+from chromadb.api.client import SharedSystemClient
+from langchain.schema import Document
+import numpy as np
+import threading
+import sqlite3
+import json
+import os
+
+VECTOR_BACKENDS = ["chroma", "numpy"]
+VECTOR_DTYPES = ["float32", "float16", "int8"]
+NUMPY_DIR = "vectors"
+SEARCH_BLOCK_ROWS = 1024  # Rows converted to float32 at a time while scoring, small enough to stay in cache
+
+def cosine_similarity(query_vector, matrix):
+    query_vector = np.asarray(query_vector, dtype=np.float32)
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vector)
+    return matrix @ query_vector / np.maximum(norms, 1e-12)
+
+def maximal_marginal_relevance(query_vector, embeddings, k, lambda_mult=0.5, relevance=None):
+    """Return the indices of up to k rows of embeddings chosen by MMR, best first.
+
+    relevance replaces the similarity to query_vector when the candidates were
+    ranked some other way. All-zero rows are never counted as redundant.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if len(embeddings) == 0 or k <= 0:
+        return []
+
+    normalized = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    if relevance is None:
+        relevance = cosine_similarity(query_vector, normalized)
+    else:
+        relevance = np.asarray(relevance, dtype=np.float32)
+    pairwise = normalized @ normalized.T
+
+    selected = [int(np.argmax(relevance))]
+    # Highest similarity of each candidate to anything already selected
+    redundancy = pairwise[selected[0]].copy()
+    while len(selected) < min(k, len(embeddings)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, pairwise[best])
+    return selected
+
+def dequantize(vectors, scales, rows):
+    embeddings = np.asarray(vectors[rows], dtype=np.float32)
+    if scales is not None:
+        embeddings *= np.asarray(scales[rows])[:, None]
+    return embeddings
+
+def clean_metadata(metadata):
+    # Chroma only stores scalar metadata values
+    cleaned = {}
+    for key, value in metadata.items():
+        if value is None:
+            continue
+        cleaned[key] = value if isinstance(value, (str, int, float, bool)) else str(value)
+    return cleaned
+
+class ChromaStore:
+    """Chroma persist directory searched directly by vector, returning scores and embeddings."""
+
+    def __init__(self, db_path, embedding_function):
+        self.db = Chroma(persist_directory=db_path, embedding_function=embedding_function)
+
+    def search(self, query_embedding, fetch_k):
+        # Returns the candidate documents, with their cosine similarity to the query
+        # stored in metadata['relevance_score'], and their embedding matrix
+        count = self.db._collection.count()
+        if count == 0:
+            return [], np.zeros((0, len(query_embedding)), dtype=np.float32)
+
+        results = self.db._collection.query(
+            query_embeddings=[list(query_embedding)],
+            n_results=min(fetch_k, count),
+            include=["documents", "metadatas", "embeddings"]
+        )
+        embeddings = np.asarray(results["embeddings"][0], dtype=np.float32)
+        scores = cosine_similarity(query_embedding, embeddings)
+
+        docs = []
+        for text, metadata, score in zip(results["documents"][0], results["metadatas"][0], scores):
+            metadata = dict(metadata or {})
+            metadata['relevance_score'] = float(score)
+            docs.append(Document(page_content=text, metadata=metadata))
+        return docs, embeddings
+
+    def add(self, ids, texts, metadatas, embeddings, batch_size=1000):
+        # Vectors are computed by the caller, so nothing is embedded here
+        for i in range(0, len(ids), batch_size):
+            self.db._collection.upsert(
+                ids=ids[i:i + batch_size],
+                documents=texts[i:i + batch_size],
+                metadatas=[clean_metadata(metadata) for metadata in metadatas[i:i + batch_size]],
+                embeddings=[list(map(float, vector)) for vector in embeddings[i:i + batch_size]]
+            )
+
+    def iter_batches(self, batch_size=1000):
+        """Yield (ids, texts, metadatas, embeddings) for every stored chunk."""
+        offset = 0
+        while True:
+            results = self.db._collection.get(include=["documents", "metadatas", "embeddings"], limit=batch_size, offset=offset)
+            if not results["ids"]:
+                return
+            yield results["ids"], results["documents"], results["metadatas"], np.asarray(results["embeddings"], dtype=np.float32)
+            offset += len(results["ids"])
+
+    def delete(self, ids, batch_size=1000):
+        ids = list(ids)
+        for i in range(0, len(ids), batch_size):
+            self.db._collection.delete(ids=ids[i:i + batch_size])
+
+    def close(self):
+        # Chroma keeps one system per directory alive for the whole process unless it is released
+        identifier = getattr(self.db._client, "_identifier", None)
+        system = SharedSystemClient._identifier_to_system.pop(identifier, None)
+        if system is not None:
+            system.stop()
+
+class NumpyStore:
+    """Brute-force vector store kept in a memory-mapped matrix.
+
+    Vectors are normalized and stored as float32, float16, or int8 with a
+    per-row scale, one row per chunk appended to vectors.bin. Chunk IDs, text
+    and metadata live in a SQLite side table keyed by row number. Deleting a
+    chunk only removes its row from the table; the matrix is rewritten once
+    more than half of it is dead. Opening reads no vectors, so it takes
+    milliseconds, and a search scores the whole matrix in blocks.
+    """
+
+    def __init__(self, path, dtype="float32"):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(path, "chunks.sqlite"), check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS chunks (row INTEGER PRIMARY KEY, chunk_id TEXT UNIQUE, text TEXT, metadata TEXT)")
+        self.db.commit()
+        self.lock = threading.Lock()
+
+        index_path = os.path.join(path, "index.json")
+        if os.path.exists(index_path):
+            with open(index_path, "r") as f:
+                index = json.load(f)
+            self.dtype, self.dimensions = index["dtype"], index["dimensions"]
+        else:
+            self.dtype, self.dimensions = dtype, None
+        self.vectors = None
+        self.scales = None
+        self.live = None
+        self.modified = False
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, "index.json"))
+
+    def row_count(self):
+        vectors_path = os.path.join(self.path, "vectors.bin")
+        if self.dimensions is None or not os.path.exists(vectors_path):
+            return 0
+        size = os.path.getsize(vectors_path)
+        return size // (self.dimensions * np.dtype(self.dtype).itemsize)
+
+    def count(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def ids(self):
+        with self.lock:
+            return [chunk_id for chunk_id, in self.db.execute("SELECT chunk_id FROM chunks")]
+
+    def load(self):
+        # Maps the matrix and builds the live-row mask; called again after every write
+        if self.vectors is not None:
+            return
+        rows = self.row_count()
+        if rows == 0:
+            self.vectors = np.zeros((0, self.dimensions or 0), dtype=self.dtype)
+            self.scales = None
+            self.live = np.zeros(0, dtype=bool)
+            return
+        self.vectors = np.memmap(os.path.join(self.path, "vectors.bin"), dtype=self.dtype, mode="r", shape=(rows, self.dimensions))
+        self.scales = None
+        if self.dtype == "int8":
+            self.scales = np.memmap(os.path.join(self.path, "scales.bin"), dtype=np.float32, mode="r", shape=(rows,))
+        self.live = np.zeros(rows, dtype=bool)
+        live_rows = np.fromiter((row for row, in self.db.execute("SELECT row FROM chunks")), dtype=np.int64)
+        self.live[live_rows] = True
+
+    def quantize(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        if self.dtype == "int8":
+            scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+            return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+        return vectors.astype(self.dtype), None
+
+    def search(self, query_embedding, fetch_k):
+        # Same contract as ChromaStore.search
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        with self.lock:
+            self.load()
+            vectors, scales, live = self.vectors, self.scales, self.live
+        count = int(live.sum())
+        if count == 0:
+            return [], np.zeros((0, len(query)), dtype=np.float32)
+
+        scores = np.empty(len(vectors), dtype=np.float32)
+        buffer = None if vectors.dtype == np.float32 else np.empty((min(SEARCH_BLOCK_ROWS, len(vectors)), vectors.shape[1]), dtype=np.float32)
+        for start in range(0, len(vectors), SEARCH_BLOCK_ROWS):
+            rows = vectors[start:start + SEARCH_BLOCK_ROWS]
+            if rows.dtype == np.float32:
+                block = rows
+            else:
+                block = buffer[:len(rows)]
+                np.copyto(block, rows, casting="unsafe")
+            scores[start:start + len(rows)] = block @ query
+        if scales is not None:
+            scores *= scales
+        scores[~live] = -np.inf
+
+        k = min(fetch_k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        with self.lock:
+            placeholders = ",".join("?" * len(top))
+            records = {row: (text, metadata) for row, text, metadata in self.db.execute(
+                f"SELECT row, text, metadata FROM chunks WHERE row IN ({placeholders})", [int(row) for row in top]
+            )}
+        docs = []
+        for row in top:
+            text, metadata = records[int(row)]
+            metadata = json.loads(metadata)
+            metadata['relevance_score'] = float(scores[row])
+            docs.append(Document(page_content=text, metadata=metadata))
+        return docs, dequantize(vectors, scales, top)
+
+    def add(self, ids, texts, metadatas, embeddings, batch_size=1000):
+        if not len(ids):
+            return
+        # Within one call the last copy of an id wins, as it does across calls
+        last = {chunk_id: i for i, chunk_id in enumerate(ids)}
+        if len(last) < len(ids):
+            keep = sorted(last.values())
+            ids = [ids[i] for i in keep]
+            texts = [texts[i] for i in keep]
+            metadatas = [metadatas[i] for i in keep]
+            embeddings = [embeddings[i] for i in keep]
+        vectors, scales = self.quantize(embeddings)
+        with self.lock:
+            if self.dimensions is None:
+                self.dimensions = vectors.shape[1]
+                with open(os.path.join(self.path, "index.json"), "w") as f:
+                    json.dump({"dtype": self.dtype, "dimensions": self.dimensions}, f)
+            # Re-adding a chunk replaces its previous row
+            self.delete_rows(ids)
+            first_row = self.row_count()
+            with open(os.path.join(self.path, "vectors.bin"), "ab") as f:
+                f.write(vectors.tobytes())
+            if scales is not None:
+                with open(os.path.join(self.path, "scales.bin"), "ab") as f:
+                    f.write(scales.tobytes())
+            self.db.executemany(
+                "INSERT INTO chunks (row, chunk_id, text, metadata) VALUES (?, ?, ?, ?)",
+                [(first_row + i, ids[i], texts[i], json.dumps(clean_metadata(metadatas[i]))) for i in range(len(ids))]
+            )
+            self.db.commit()
+            self.vectors = None
+            self.modified = True
+
+    def iter_batches(self, batch_size=1000):
+        """Yield (ids, texts, metadatas, embeddings) for every stored chunk, in row order."""
+        with self.lock:
+            self.load()
+            vectors, scales = self.vectors, self.scales
+        last_row = -1
+        while True:
+            with self.lock:
+                rows = self.db.execute(
+                    "SELECT row, chunk_id, text, metadata FROM chunks WHERE row > ? ORDER BY row LIMIT ?", (last_row, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_row = rows[-1][0]
+            yield ([row[1] for row in rows], [row[2] for row in rows], [json.loads(row[3]) for row in rows],
+                   dequantize(vectors, scales, np.asarray([row[0] for row in rows])))
+
+    def delete(self, ids, batch_size=1000):
+        with self.lock:
+            self.delete_rows(ids, batch_size)
+            self.db.commit()
+            self.vectors = None
+            self.modified = True
+
+    def delete_rows(self, ids, batch_size=1000):
+        ids = list(ids)
+        for i in range(0, len(ids), batch_size):
+            batch = ids[i:i + batch_size]
+            placeholders = ",".join("?" * len(batch))
+            self.db.execute(f"DELETE FROM chunks WHERE chunk_id IN ({placeholders})", batch)
+
+    def compact(self):
+        # Rewrites the matrix with only live rows, renumbering them in order
+        self.load()
+        live_rows = np.nonzero(self.live)[0]
+        tmp_path = os.path.join(self.path, "vectors.bin.tmp")
+        with open(tmp_path, "wb") as f:
+            for start in range(0, len(live_rows), SEARCH_BLOCK_ROWS):
+                f.write(np.asarray(self.vectors[live_rows[start:start + SEARCH_BLOCK_ROWS]]).tobytes())
+        if self.scales is not None:
+            with open(os.path.join(self.path, "scales.bin.tmp"), "wb") as f:
+                f.write(np.asarray(self.scales[live_rows]).tobytes())
+        self.db.execute("CREATE TEMP TABLE renumber (old INTEGER PRIMARY KEY, new INTEGER)")
+        self.db.executemany("INSERT INTO renumber (old, new) VALUES (?, ?)", [(int(row), i) for i, row in enumerate(live_rows)])
+        # Through negative numbers so no new row number collides with an old one
+        self.db.execute("UPDATE chunks SET row = -1 - (SELECT new FROM renumber WHERE old = chunks.row)")
+        self.db.execute("UPDATE chunks SET row = -1 - row")
+        self.db.execute("DROP TABLE renumber")
+        self.db.commit()
+        self.vectors = self.scales = self.live = None
+        os.replace(tmp_path, os.path.join(self.path, "vectors.bin"))
+        if self.dtype == "int8":
+            os.replace(os.path.join(self.path, "scales.bin.tmp"), os.path.join(self.path, "scales.bin"))
+
+    def close(self):
+        with self.lock:
+            # Only a writer compacts; committed builds are never changed by readers
+            if self.modified and self.dimensions is not None:
+                self.load()
+                if len(self.live) and self.live.sum() < len(self.live) / 2:
+                    self.compact()
+            self.vectors = self.scales = self.live = None
+            self.db.close()
+
+def store_backend(db_path):
+    # The backend a build was written with; builds without a NumPy index are Chroma builds
+    return "numpy" if NumpyStore.exists(os.path.join(db_path, NUMPY_DIR)) else "chroma"
+
+def open_vector_store(db_path, embedding_function, backend=None, dtype="float32"):
+    backend = backend or store_backend(db_path)
+    if backend == "numpy":
+        return NumpyStore(os.path.join(db_path, NUMPY_DIR), dtype)
+    return ChromaStore(db_path, embedding_function)
@@ -12,10 +12,82 @@ INTERPRETER_SETTINGS = {
     "temperature": 0.3,
     "max_tokens": 4096,
     "context_window": 10000,
-    "conversation_history_path": "conversation_history",
     "import_computer_api": True
     }
 
+# Retrieval settings
+RETRIEVAL_SETTINGS = {
+    "pool_memory_mb": 256,  # Approximate memory cap for opened knowledge base stores
+    "max_concurrent_kbs": 4,  # Knowledge bases queried in parallel
+    "kb_deadline_seconds": 8.0,  # Per-KB time limit before answering with partial results
+    "fetch_k": 20,  # Candidates fetched from each knowledge base
+    "top_k": 6,  # Documents kept across all knowledge bases
+    "mmr_pool_size": 30,  # Best-scoring merged candidates considered by MMR
+    "mmr_lambda": 0.5,  # 1.0 favours relevance only, 0.0 favours diversity only
+    "query_cache_size": 512,  # Query embeddings kept in memory
+    "query_cache_path": "src/Databases/query_embeddings.sqlite",  # Set to None to keep the cache in memory only
+    "query_cache_persist_size": 10000,  # Query embeddings kept on disk; the least recently used are removed
+    "compression_mode": "llm",  # "llm", "extractive" (embeds every retrieved sentence, one embedding request per query) or "none"
+    "compression_max_chars": 500,  # Per-document budget for extractive compression
+    "semantic_cache_threshold": 0.95,  # Cosine similarity needed to reuse an earlier query's context
+    "semantic_cache_ttl_seconds": 3600,
+    "semantic_cache_size": 256,
+    "retrieval_mode": "hybrid",  # "vector", "hybrid" or "lexical"
+    "lexical_fast_path": True,  # Answer keyword-like queries from the lexical index without embedding them
+    "rrf_k": 60,  # Reciprocal rank fusion constant
+    "max_context_tokens": 3000,  # Upper bound for knowledge base context in a prompt
+    "prompt_reserve_tokens": 1500  # Kept free for the system message and the query itself
+    }
+
+# Embedding settings, shared by ingestion and retrieval
+EMBEDDING_SETTINGS = {
+    "backend": "openai",  # "openai", or "hashing" to embed on the CPU without network access
+    "openai_model": "text-embedding-ada-002",
+    "hashing_dimensions": 1024  # Vector size of the hashing backend
+    }
+
+# Conversation history settings
+CONVERSATION_SETTINGS = {
+    "store_path": "src/Databases/conversations.sqlite",  # Every session's messages, searchable, in one file
+    "resume_last_session": True,  # Continue the most recent session at startup
+    "resume_max_messages": 40,  # Latest messages of that session loaded back into the interpreter
+    "keep_days": 90  # Sessions unused for longer are removed at startup, None to keep everything
+    }
+
+# Long-term chat memory, retrieved from earlier sessions into the prompt
+MEMORY_SETTINGS = {
+    "enabled": True,
+    "path": "src/Databases/.chat_memory",  # Vector collection of past exchanges, rebuilt from the conversation store if removed
+    "max_tokens": 600,  # Budget for recalled exchanges in a prompt, taken before the knowledge base context
+    "top_k": 4,  # Most similar exchanges recalled
+    "min_score": 0.8  # Cosine similarity a past exchange needs to be recalled; lower it for the hashing embedding backend
+    }
+
+# Ingestion settings
+INGEST_SETTINGS = {
+    "chunk_unit": "tokens",  # "tokens" or "chars"
+    "chunk_size": 250,
+    "chunk_overlap": 50,
+    "dedup_threshold": 0.9,  # Estimated Jaccard similarity above which a chunk is skipped as a near-duplicate, 0 to disable
+    "dedup_scope": "kb",  # "kb" compares chunks within a knowledge base, "all" also against the other knowledge bases
+    "embedding_batch_size": 64,  # Chunks sent per embedding request
+    "embedding_max_in_flight": 4,  # Embedding requests running at once
+    "embedding_max_retries": 6,  # Retries after rate limit errors, with exponential backoff
+    "embedding_cache_path": "src/Databases/embedding_cache.sqlite",  # Shared by all knowledge bases
+    "max_buffered_mb": 32,  # Loaded documents and chunks held between pipeline stages
+    "flush_chunks": 256,  # Chunks embedded and written to the store at a time
+    "vector_store": "chroma",  # "chroma", or "numpy" for a memory-mapped matrix searched by brute force; a KB switches on its next rebuild
+    "vector_dtype": "float32",  # Vector precision of the numpy backend and chat memory; "float16" and "int8" use less memory but search more slowly
+    "parse_workers": None,  # Processes parsing PDFs and office documents, None for one per CPU core
+    "parse_timeout_seconds": 120,  # Files taking longer to parse are skipped
+    "url_workers": 8,  # URLs downloaded at once
+    "url_per_host": 2,  # Concurrent downloads from the same host
+    "url_timeout_seconds": 20,
+    "watch_knowledge_bases": False,  # Reindex a knowledge base automatically when files change in its docs folder
+    "watch_quiet_seconds": 5.0,  # Wait this long after the last change before reindexing
+    "watch_poll_seconds": 2.0  # Scan interval when inotify_simple isn't installed
+    }
+
 # System message for the interpreter
 SYSTEM_MESSAGE = '''
 ### Permissions and Environment:
@@ -27,14 +99,16 @@ SYSTEM_MESSAGE = '''
 - If additional context is provided, use it to inform your actions and responses.
 - Expect prompts in the format:
 
+Earlier conversations: {memory}
+
 Context: {context}
 
 Query: {query}
 
 - Use the provided context to shape your response accurately.
+- Earlier conversations are past exchanges with the user, with their date and time, recalled when relevant. Either section may be missing.
 
 ### Referencing and Searching:
-- If you need to refer to prior interactions, access the "conversation_history" folder.
 - For web-based queries, utilize the `computer.browser.search(query)` function as needed.
 - Only search the internet if there is no context provided.
 
@@ -63,4 +137,9 @@ DEFAULT_SELECTED_KBS = []
 
 # Audio settings
 BEEP_FREQUENCY = 440  # Frequency of the beep in Hz (A4 note)
-BEEP_DURATION = 0.2  # Duration of the beep in seconds
\ No newline at end of file
+BEEP_DURATION = 0.2  # Duration of the beep in seconds
+
+# Chat window settings
+CHAT_RENDER_FPS = 20  # Streamed text is drawn into the chat window at most this many times per second
+CHAT_TRANSCRIPT_MESSAGES = 200  # Messages kept in the chat window; older ones are reloaded when scrolled to
+CHAT_HISTORY_PAGE_MESSAGES = 20  # Messages reloaded at a time when scrolling past either end
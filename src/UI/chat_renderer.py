@@ -0,0 +1,107 @@
+from collections import deque
+import threading
+import logging
+import time
+
+CLEAR = object()
+MESSAGE = object()
+END_STREAM = object()
+
+def coalesce(items):
+  # Merges consecutive pieces with the same tag so each run is one insert
+  runs = []
+  for text, tag in items:
+    if runs and isinstance(text, str) and isinstance(runs[-1][0], str) and runs[-1][1] == tag:
+      runs[-1] = (runs[-1][0] + text, tag)
+    else:
+      runs.append((text, tag))
+  return runs
+
+class ChatRenderer:
+  """Draws text produced on any thread into the chat window from the Tk thread.
+
+  Workers only queue (text, tag) pieces. A fixed-rate root.after loop takes
+  everything queued since the last frame and inserts it with one call per run
+  of the same tag, so a fast stream costs one redraw per frame rather than one
+  per token. Text goes into the widget through a ChatTranscript, which keeps
+  the number of messages in it bounded. The view follows new text only if it
+  was already at the bottom, so scrolling back to read isn't interrupted.
+  """
+
+  def __init__(self, root, transcript, fps=20):
+    self.root = root
+    self.transcript = transcript
+    self.interval_ms = max(1, int(1000 / fps))
+    self.pending = deque()
+    self.lock = threading.Lock()
+    self.stream = None
+    self.after_id = self.root.after(self.interval_ms, self.drain)
+
+  def write(self, text, tag=None):
+    if not text:
+      return
+    text = str(text)
+    with self.lock:
+      self.pending.append((text, tag))
+      if self.stream is not None:
+        self.stream["pieces"] += 1
+
+  def begin_message(self):
+    with self.lock:
+      self.pending.append((MESSAGE, None))
+
+  def clear(self):
+    with self.lock:
+      self.pending.append((CLEAR, None))
+
+  def begin_stream(self):
+    # CPU use is measured from here until the stream's last piece is drawn
+    with self.lock:
+      self.stream = {"wall": time.monotonic(), "cpu": time.process_time(), "pieces": 0, "frames": 0, "inserts": 0}
+
+  def end_stream(self):
+    with self.lock:
+      self.pending.append((END_STREAM, None))
+
+  def drain(self):
+    self.after_id = self.root.after(self.interval_ms, self.drain)
+    widget = self.transcript.widget
+    if widget is None or not widget.winfo_exists():
+      return  # Kept queued until a chat window is attached again
+    with self.lock:
+      items = list(self.pending)
+      self.pending.clear()
+    if not items:
+      return
+
+    runs = coalesce(items)
+    with self.lock:
+      if self.stream is not None:
+        self.stream["frames"] += 1
+        self.stream["inserts"] += sum(isinstance(text, str) for text, _ in runs)
+
+    at_bottom = widget.yview()[1] >= 0.999
+    widget.configure(state="normal")
+    for text, tag in runs:
+      if text is CLEAR:
+        self.transcript.clear()
+      elif text is MESSAGE:
+        self.transcript.begin_message()
+      elif text is END_STREAM:
+        self.finish_stream()
+      else:
+        self.transcript.append(text, tag)
+    self.transcript.trim()
+    widget.configure(state="disabled")
+    if at_bottom:
+      widget.see("end")
+
+  def finish_stream(self):
+    with self.lock:
+      stream, self.stream = self.stream, None
+    if stream is None:
+      return
+    wall = time.monotonic() - stream["wall"]
+    cpu = time.process_time() - stream["cpu"]
+    logging.info(f"Streamed {stream['pieces']} pieces in {stream['frames']} frames with {stream['inserts']} inserts, "
+                 f"{cpu * 1000:.0f}ms CPU over {wall:.1f}s ({cpu / wall if wall else 0:.0%} of one core)")
@@ -2,27 +2,23 @@ import customtkinter as ctk
 import os
 import threading
 import logging
-from datetime import datetime
 from Settings.config import *
 from Core.chat_manager import ChatManager
 from Core.audio_manager import AudioManager
 from Core.knowledge_manager import KnowledgeManager
 from Core.interpreter_manager import InterpreterManager
 from Core.context_manager import ContextManager
+from Core.ingest_scheduler import IngestScheduler
+from Core.kb_watcher import KBWatcher
+from Core.kb_snapshot import SNAPSHOT_EXTENSION, KBSnapshot, SnapshotError
 from interpreter import interpreter
 from UI.settings_window import SettingsWindow
+from UI.chat_renderer import ChatRenderer
+from UI.transcript import ChatTranscript, StoredHistory
 from Settings.color_settings import *
-import re
 import tkinter as tk
 from tkinter import ttk, filedialog, simpledialog, messagebox
 
-def sanitize_filename(filename):
-  # Remove or replace invalid characters
-  sanitized = re.sub(r'[\\/*?:"<>|\n\r\t]', '', filename)
-  sanitized = re.sub(r'\s+', '_', sanitized)  # Replace whitespace with underscore
-  sanitized = sanitized.strip('._')  # Remove leading/trailing dots and underscores
-  return sanitized or 'unnamed_conversation'  # Default name if empty
-
 class ChatUI:
   def __init__(self, root, interpreter_manager):
     self.root = root
@@ -35,6 +31,7 @@ class ChatUI:
     self.is_voice_mode = False
     self.continuous_listen_thread = None
     self.interpreter_settings = INTERPRETER_SETTINGS.copy()
+    self.retrieval_settings = RETRIEVAL_SETTINGS.copy()
     self.env_vars = {k: v for k, v in os.environ.items() if k.startswith("CUSTOM_")}
     self.streaming_message = ""
     self.last_message_type = None  # To keep track of the last message type (user or AI)
@@ -43,7 +40,29 @@ class ChatUI:
     self.audio_manager = AudioManager()
     self.knowledge_manager = KnowledgeManager(self)
     self.interpreter_manager = interpreter_manager
-    self.context_manager = ContextManager(self)
+    self.context_manager = self.chat_manager.context_manager
+    # Rebuilds run off the Tk thread; queries keep using the previous build until each one commits
+    self.ingest_scheduler = IngestScheduler(self.knowledge_manager, on_update=self.on_ingest_update)
+    self.ingest_status_var = ctk.StringVar(value="")
+    self.kb_watcher = None
+    if INGEST_SETTINGS["watch_knowledge_bases"]:
+      self.kb_watcher = KBWatcher(
+        KB_PATH,
+        self.ingest_scheduler.submit,
+        quiet_seconds=INGEST_SETTINGS["watch_quiet_seconds"],
+        poll_seconds=INGEST_SETTINGS["watch_poll_seconds"]
+      )
+      self.kb_watcher.start()
+
+    # Worker threads queue chat text; the Tk thread draws it at a fixed frame rate into a bounded transcript
+    conversation_store = self.chat_manager.conversation_store
+    self.transcript = ChatTranscript(
+      StoredHistory(conversation_store),
+      CHAT_TRANSCRIPT_MESSAGES,
+      CHAT_HISTORY_PAGE_MESSAGES,
+      base=conversation_store.transcript_start()
+    )
+    self.renderer = ChatRenderer(root, self.transcript, fps=CHAT_RENDER_FPS)
 
     self.input_box = ctk.CTkTextbox(root, height=50, fg_color=get_color("BG_INPUT"), text_color=get_color("TEXT_PRIMARY"))
     
@@ -125,6 +144,23 @@ class ChatUI:
     )
     rebuild_kb_button.pack(pady=10, padx=20, fill="x")
 
+    # Progress of background rebuilds
+    ingest_status = ctk.CTkLabel(self.sidebar, textvariable=self.ingest_status_var, anchor="w", justify="left", wraplength=210)
+    ingest_status.pack(padx=20, pady=(0, 5), fill="x")
+    self.cancel_rebuild_button = ctk.CTkButton(
+      self.sidebar,
+      text="⏹ Cancel Rebuild",
+      command=self.cancel_rebuild,
+      fg_color=get_color("BG_INPUT"),
+      text_color=BRAND_PRIMARY,
+      hover_color=BRAND_ACCENT,
+      border_width=2,
+      border_color=BRAND_PRIMARY,
+      font=("Helvetica", 16),
+      state="normal" if self.ingest_scheduler.is_busy() else "disabled"
+    )
+    self.cancel_rebuild_button.pack(pady=(0, 10), padx=20, fill="x")
+
   def create_chat_window(self, parent):
     chat_frame = ctk.CTkFrame(parent, fg_color=get_color("BG_TERTIARY"))
     chat_frame.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
@@ -143,7 +179,7 @@ class ChatUI:
     scrollbar = ctk.CTkScrollbar(chat_frame, command=self.chat_window.yview)
     scrollbar.grid(row=0, column=1, sticky="ns")
 
-    self.chat_window.configure(yscrollcommand=scrollbar.set)
+    self.transcript.attach(self.chat_window, scrollbar)
 
   def create_input_area(self, parent):
     input_frame = ctk.CTkFrame(parent, fg_color=get_color("BG_PRIMARY"))
@@ -177,10 +213,8 @@ class ChatUI:
         wake_word_detected = self.audio_manager.listen_for_wake_word(wake_word=self.wake_word)
         if wake_word_detected:
           self.audio_manager.generate_beep()
-          self.chat_window.configure(state="normal")
-          self.chat_window.insert(ctk.END, "Listening...\n", "bot_stream")
-          self.chat_window.configure(state="disabled")
-          self.chat_window.yview(ctk.END)
+          self.renderer.begin_message()
+          self.renderer.write("Listening...\n", "bot_stream")
           self.process_speech_input()
       except Exception as e:
         logging.error(f"Error in continuous listening: {str(e)}")
@@ -209,46 +243,36 @@ class ChatUI:
     else:
       self.selected_kbs.remove(kb)
     self.knowledge_manager.update_selected_kbs(self.selected_kbs)
+    if is_active:
+      # Open the KB in the background so the first query doesn't pay for it
+      threading.Thread(target=self.context_manager.warm_up, args=(kb,), daemon=True).start()
 
   def send_message(self, user_input=None):
     if not self.is_voice_mode:
       user_input = self.input_box.get("1.0", ctk.END).strip()
     
     if user_input:
-      self.chat_window.configure(state="normal")
-      self.chat_window.insert(ctk.END, "You: " + user_input + "\n", "user")
-      self.chat_window.configure(state="disabled")
-      self.chat_window.see(ctk.END)
-      self.root.update_idletasks()
+      self.renderer.begin_message()
+      self.renderer.write("You: " + user_input + "\n", "user")
 
       if not self.is_voice_mode:
         self.input_box.delete("1.0", ctk.END)
       
-      # Modify the filename generation for the interpreter
-      timestamp = datetime.now().strftime("%Y_%m_%d_%H-%M-%S")
-      sanitized_query = sanitize_filename(user_input[:50])  # Limit to first 50 characters
-      filename = f"Context_{sanitized_query}_{timestamp}.json"
-      
-      # Set the custom filename for the interpreter
-      interpreter.conversation_filename = filename
-      
       # Start a new thread for processing the response
       threading.Thread(target=self.process_response, args=(user_input,), daemon=True).start()
       
   def process_response(self, user_input):
     response_generator, sources = self.chat_manager.process_input(user_input, self.selected_kbs)
-    self.chat_window.configure(state="normal")
-    self.chat_window.insert(ctk.END, "Bot: ", "bot")
+    self.renderer.begin_stream()
+    self.renderer.begin_message()
+    self.renderer.write("Bot: ", "bot")
     
     # Add indicator for knowledge base query
     if self.selected_kbs:
-      self.chat_window.insert(ctk.END, "Knowledge bases being queried:\n", "bot_stream")
+      self.renderer.write("Knowledge bases being queried:\n", "bot_stream")
       for kb in self.selected_kbs:
-        self.chat_window.insert(ctk.END, f"- {kb}\n", "bot_stream")
-    self.chat_window.see(ctk.END)
-    self.root.update_idletasks()
+        self.renderer.write(f"- {kb}\n", "bot_stream")
     
-    stream_start = self.chat_window.index(ctk.END)
     full_response = ""
 
     try:
@@ -258,39 +282,36 @@ class ChatUI:
           if content is not None:
             content = str(content)
             full_response += content
-            self.chat_window.insert(ctk.END, content, "bot_stream")
-            self.chat_window.see(ctk.END)
-            self.root.update_idletasks()
+            self.renderer.write(content, "bot_stream")
     except Exception as e:
       logging.exception("Error processing response")
 
+    self.chat_manager.save_conversation(user_input)
+
     # Get the final response from the last message
     final_response = interpreter.messages[-1]['content'] if interpreter.messages else full_response
     
     # Insert a newline before the final response
-    self.chat_window.insert(ctk.END, "\n", "bot")
+    self.renderer.write("\n", "bot")
     
     # Insert the final response on a new line
-    self.chat_window.insert(ctk.END, "Final response:\n", "bot_final")
-    self.chat_window.insert(ctk.END, final_response, "bot_final")
+    self.renderer.write("Final response:\n", "bot_final")
+    self.renderer.write(final_response, "bot_final")
     
     if sources:
-      self.chat_window.insert(ctk.END, "\nSources:\n", "bot_final")
+      self.renderer.write("\nSources:\n", "bot_final")
       for source in sources:
-        self.chat_window.insert(ctk.END, f"- {source}\n", "bot_stream")
+        self.renderer.write(f"- {source}\n", "bot_stream")
     
-    self.chat_window.insert(ctk.END, "\n")
-    self.chat_window.configure(state="disabled")
-    self.chat_window.see(ctk.END)
+    self.renderer.write("\n")
+    self.renderer.end_stream()
     
     if self.is_voice_mode:
       threading.Thread(target=self.audio_manager.text_to_speech, args=(final_response,), daemon=True).start()
 
   def reset_chat(self):
-    interpreter.reset()
-    self.chat_window.configure(state="normal")
-    self.chat_window.delete("1.0", ctk.END)
-    self.chat_window.configure(state="disabled")
+    self.chat_manager.new_conversation()
+    self.renderer.clear()
 
   def open_settings(self):
     # Clear the main frame and display settings
@@ -314,6 +335,13 @@ class ChatUI:
     # Update ChatManager
     self.chat_manager.update_interpreter_settings(self.interpreter_settings)
 
+  def update_retrieval_settings(self, new_settings):
+    self.retrieval_settings.update(new_settings)
+    self.context_manager.retrieval_mode = new_settings["retrieval_mode"]
+    # Swap the compressor used for subsequent queries
+    if self.context_manager.compression_mode != new_settings["compression_mode"]:
+      self.context_manager.set_compression_mode(new_settings["compression_mode"])
+
   def update_env_vars(self, new_env_vars):
     self.env_vars.update(new_env_vars)
     for key, value in new_env_vars.items():
@@ -333,6 +361,7 @@ class ChatUI:
     # Create collapsible sections
     self.create_collapsible_section("Add to Existing Knowledge Base", self.create_existing_kb_section)
     self.create_collapsible_section("Create New Knowledge Base", self.create_new_kb_section)
+    self.create_collapsible_section("Share Knowledge Base Snapshot", self.create_snapshot_section)
 
     # Back button to return to chat window
     ctk.CTkButton(self.main_frame, text="Back", command=self.create_ui).pack(pady=10, anchor="w")
@@ -378,6 +407,53 @@ class ChatUI:
     self.url_entry.pack(pady=5, anchor="w")
     ctk.CTkButton(parent, text="Create and Add to New KB", command=self.submit_new_kb, fg_color=get_color("BG_INPUT"), text_color=get_color("TEXT_PRIMARY"), hover_color=get_color("BG_SECONDARY")).pack(pady=10, anchor="w")
 
+  def create_snapshot_section(self, parent):
+    ctk.CTkLabel(parent, text="Select Knowledge Base to Export:", text_color=get_color("TEXT_PRIMARY")).pack(anchor="w")
+    self.snapshot_kb_dropdown = ctk.CTkComboBox(parent, values=self.knowledge_manager.get_knowledge_bases(), fg_color=get_color("BG_INPUT"), text_color=get_color("TEXT_PRIMARY"))
+    self.snapshot_kb_dropdown.pack(pady=10, anchor="w")
+    ctk.CTkButton(parent, text="Export Snapshot", command=self.export_snapshot, fg_color=get_color("BG_INPUT"), text_color=get_color("TEXT_PRIMARY"), hover_color=get_color("BG_SECONDARY")).pack(pady=5, anchor="w")
+    ctk.CTkButton(parent, text="Import Snapshot", command=self.import_snapshot, fg_color=get_color("BG_INPUT"), text_color=get_color("TEXT_PRIMARY"), hover_color=get_color("BG_SECONDARY")).pack(pady=10, anchor="w")
+
+  def export_snapshot(self):
+    kb_name = self.snapshot_kb_dropdown.get()
+    if not kb_name:
+      messagebox.showerror("Error", "Please select a knowledge base to export.")
+      return
+    snapshot_path = filedialog.asksaveasfilename(defaultextension=SNAPSHOT_EXTENSION, initialfile=kb_name + SNAPSHOT_EXTENSION)
+    if snapshot_path:
+      self.run_snapshot_task(kb_name, "export", f"Exported {kb_name} to {snapshot_path}",
+                             lambda: self.knowledge_manager.export_knowledge_base(kb_name, snapshot_path))
+
+  def import_snapshot(self):
+    snapshot_path = filedialog.askopenfilename(filetypes=[("Knowledge base snapshots", "*" + SNAPSHOT_EXTENSION)])
+    if not snapshot_path:
+      return
+    try:
+      # Only the header is read here; the KB name keys the job on the ingest queue
+      kb_name = KBSnapshot(snapshot_path).knowledge_base
+    except (OSError, SnapshotError) as e:
+      messagebox.showerror("Error", str(e))
+      return
+    self.run_snapshot_task(kb_name, "import", f"Imported {snapshot_path}",
+                           lambda: self.knowledge_manager.import_knowledge_base(snapshot_path, kb_name))
+
+  def run_snapshot_task(self, kb_name, description, message, task):
+    # Queued with the rebuilds, so a snapshot never reads or replaces a build another job is writing
+    def on_update(progress):
+      self.on_ingest_update(progress)
+      if progress.status in ("done", "failed", "cancelled"):
+        error = progress.error or ("Cancelled" if progress.status == "cancelled" else None)
+        self.root.after(0, self.finish_snapshot_task, message, error)
+    self.ingest_scheduler.submit_task(kb_name, description, task, on_update)
+
+  def finish_snapshot_task(self, message, error):
+    self.ingest_status_var.set(error or message)
+    if error:
+      messagebox.showerror("Error", error)
+      return
+    messagebox.showinfo("Snapshot", message)
+    self.update_sidebar()
+
   def select_file(self):
     file_path = filedialog.askopenfilename()
     if file_path:
@@ -398,7 +474,7 @@ class ChatUI:
 
     logging.info(f"Adding file: {file_path} to knowledge base: {kb_name}")
     self.knowledge_manager.add_to_knowledge_base(kb_name, url, file_path)
-    self.knowledge_manager.build_vector_database(kb_name)
+    self.ingest_scheduler.submit(kb_name)
     self.update_sidebar()
     self.create_ui()
 
@@ -417,7 +493,7 @@ class ChatUI:
 
     logging.info(f"Creating new knowledge base: {kb_name} with file: {file_path}")
     self.knowledge_manager.add_to_knowledge_base(kb_name, url, file_path)
-    self.knowledge_manager.build_vector_database(kb_name)
+    self.ingest_scheduler.submit(kb_name)
     self.update_sidebar()
     self.create_ui()
 
@@ -430,5 +506,24 @@ class ChatUI:
     self.create_sidebar()
 
   def rebuild_knowledge_bases(self):
-    self.knowledge_manager.build_vector_database()
-    self.update_sidebar()
+    self.ingest_scheduler.submit_all()
+
+  def cancel_rebuild(self):
+    self.ingest_scheduler.cancel()
+
+  def close(self):
+    # Background work stops before the stores it writes to are closed
+    if self.kb_watcher is not None:
+      self.kb_watcher.stop()
+    self.ingest_scheduler.shutdown()
+    self.chat_manager.close()
+
+  def on_ingest_update(self, progress):
+    # Called from the scheduler thread; widgets are only touched on the Tk thread
+    self.root.after(0, self.show_ingest_progress, progress.summary(), progress.status)
+
+  def show_ingest_progress(self, summary, status):
+    self.ingest_status_var.set(summary)
+    self.cancel_rebuild_button.configure(state="normal" if self.ingest_scheduler.is_busy() else "disabled")
+    if status == "done" and set(self.knowledge_manager.get_knowledge_bases()) != set(self.kb_toggles):
+      self.update_sidebar()
@@ -2,6 +2,8 @@ import customtkinter as ctk
 from tkinter import messagebox, simpledialog, filedialog
 from Settings.config import INTERPRETER_SETTINGS, CHROMA_PATH, KB_PATH
 from Core.knowledge_manager import KnowledgeManager
+from Core.compressors import COMPRESSION_MODES
+from Core.context_manager import RETRIEVAL_MODES
 import json
 import os
 import shutil
@@ -24,6 +26,9 @@ class SettingsWindow:
     # Interpreter Settings
     self.create_collapsible_section("Interpreter Settings", self.create_interpreter_settings)
 
+    # Retrieval Settings
+    self.create_collapsible_section("Retrieval Settings", self.create_retrieval_settings)
+
     # Wake Word
     self.create_collapsible_section("Wake Word", self.create_wake_word_settings)
 
@@ -79,6 +84,15 @@ class SettingsWindow:
     self.context_window_var = ctk.IntVar()
     ctk.CTkEntry(parent, textvariable=self.context_window_var, fg_color=get_color("BG_INPUT"), text_color=get_color("TEXT_PRIMARY")).pack(pady=2, anchor="w")
 
+  def create_retrieval_settings(self, parent):
+    ctk.CTkLabel(parent, text="Retrieval Mode:", text_color=get_color("TEXT_PRIMARY")).pack(pady=2, anchor="w")
+    self.retrieval_mode_var = ctk.StringVar()
+    ctk.CTkComboBox(parent, values=RETRIEVAL_MODES, variable=self.retrieval_mode_var, state="readonly", fg_color=get_color("BG_INPUT"), text_color=get_color("TEXT_PRIMARY")).pack(pady=2, anchor="w")
+
+    ctk.CTkLabel(parent, text="Compression Mode:", text_color=get_color("TEXT_PRIMARY")).pack(pady=2, anchor="w")
+    self.compression_mode_var = ctk.StringVar()
+    ctk.CTkComboBox(parent, values=COMPRESSION_MODES, variable=self.compression_mode_var, state="readonly", fg_color=get_color("BG_INPUT"), text_color=get_color("TEXT_PRIMARY")).pack(pady=2, anchor="w")
+
   def create_wake_word_settings(self, parent):
     ctk.CTkLabel(parent, text="Wake Word:", text_color=get_color("TEXT_PRIMARY")).pack(pady=5, anchor="w")
     self.wake_word_entry = ctk.CTkEntry(parent, width=50, fg_color=get_color("BG_INPUT"), text_color=get_color("TEXT_PRIMARY"))
@@ -126,6 +140,9 @@ class SettingsWindow:
     self.temperature_var.set(self.chat_ui.interpreter_settings["temperature"])
     self.max_tokens_var.set(self.chat_ui.interpreter_settings["max_tokens"])
     self.context_window_var.set(self.chat_ui.interpreter_settings["context_window"])
+
+    self.retrieval_mode_var.set(self.chat_ui.retrieval_settings["retrieval_mode"])
+    self.compression_mode_var.set(self.chat_ui.retrieval_settings["compression_mode"])
     
     # Load environment variables
     for key, value in self.chat_ui.env_vars.items():
@@ -147,6 +164,12 @@ class SettingsWindow:
       "context_window": self.context_window_var.get()
     })
 
+    # Update retrieval settings through ChatUI
+    self.chat_ui.update_retrieval_settings({
+      "retrieval_mode": self.retrieval_mode_var.get(),
+      "compression_mode": self.compression_mode_var.get()
+    })
+
     # Update environment variables
     self.chat_ui.update_env_vars({key: var.get() for key, var in self.env_vars.items()})
 
@@ -0,0 +1,175 @@
+class StoredHistory:
+  """Transcript history kept in the ConversationStore, so it survives restarts."""
+
+  def __init__(self, store):
+    self.store = store
+
+  def count(self):
+    return self.store.transcript_count()
+
+  def append(self, segments):
+    self.store.append_transcript(segments)
+
+  def load(self, start, stop):
+    return self.store.load_transcript(start, stop)
+
+class ChatTranscript:
+  """Keeps at most max_messages messages in the chat widget.
+
+  Every finished message goes to the history, which is anything with count(),
+  append(segments) and load(start, stop); a message is a list of (text, tag)
+  segments. The widget only shows a
+  contiguous window of messages, and each one starts at a text mark. When the
+  window grows past max_messages, messages are evicted from the end farther
+  from the view. When the user scrolls to the top or bottom edge of the window,
+  the next page is loaded back from the history. The message still being
+  written is kept in memory. It is drawn only while the window reaches the end
+  of the conversation.
+
+  Every method must be called on the Tk thread. ChatRenderer calls the ones
+  that write text.
+  """
+
+  def __init__(self, history, max_messages=200, page_messages=20, base=0):
+    self.history = history
+    self.max_messages = max_messages
+    self.page_messages = page_messages
+    self.widget = None
+    self.base = base  # First message of the current conversation
+    self.first = 0  # First message in the widget
+    self.last = 0  # One past the last message in the widget
+    self.current = None  # Segments of the message still being written
+    self.loading = False
+
+  def mark(self, index):
+    return f"message{index}"
+
+  def total(self):
+    return self.history.count() + (self.current is not None)
+
+  def is_live(self):
+    return self.last == self.total()
+
+  def attach(self, widget, scrollbar=None):
+    # The chat window is recreated whenever the main view is rebuilt; the new one starts at the latest messages
+    self.widget = widget
+
+    def on_scroll(first, last):
+      if scrollbar is not None:
+        scrollbar.set(first, last)
+      self.on_view(float(first), float(last))
+    widget.configure(yscrollcommand=on_scroll)
+
+    widget.configure(state="normal")
+    count = self.history.count()
+    self.first = self.last = max(self.base, count - self.max_messages)
+    for segments in self.history.load(self.first, count):
+      self.insert_message(self.last, segments, "end-1c")
+      self.last += 1
+    if self.current is not None:
+      self.insert_message(self.last, self.current, "end-1c")
+      self.last += 1
+    widget.configure(state="disabled")
+    widget.see("end")
+
+  def insert_message(self, index, segments, at):
+    self.widget.mark_set(self.mark(index), at)
+    self.widget.mark_gravity(self.mark(index), "left")
+    for text, tag in segments:
+      self.widget.insert(at, text, tag)
+
+  def begin_message(self):
+    live = self.is_live()
+    self.close_message()
+    self.current = []
+    if live:
+      self.insert_message(self.last, [], "end-1c")
+      self.last += 1
+
+  def close_message(self):
+    if self.current:
+      self.history.append(self.current)
+    elif self.current is not None:
+      # Nothing was written, so the message is dropped rather than stored
+      if self.last == self.total():
+        self.widget.mark_unset(self.mark(self.last - 1))
+        self.last -= 1
+    self.current = None
+
+  def append(self, text, tag=None):
+    if self.current is None:
+      self.begin_message()
+    if self.current and self.current[-1][1] == tag:
+      self.current[-1] = (self.current[-1][0] + text, tag)
+    else:
+      self.current.append((text, tag))
+    if self.is_live():
+      self.widget.insert("end-1c", text, tag)
+
+  def clear(self):
+    self.close_message()
+    self.widget.delete("1.0", "end")
+    for index in range(self.first, self.last):
+      self.widget.mark_unset(self.mark(index))
+    self.base = self.first = self.last = self.history.count()
+
+  def trim(self):
+    if self.last - self.first <= self.max_messages:
+      return
+    top, bottom = self.widget.yview()
+    # Keeps the line at the top of the view in place while text above it is removed
+    self.widget.mark_set("transcript_view", "@0,0")
+    while self.last - self.first > self.max_messages:
+      if top + bottom >= 1:
+        self.widget.delete("1.0", self.mark(self.first + 1))
+        self.widget.mark_unset(self.mark(self.first))
+        self.first += 1
+      else:
+        self.widget.delete(self.mark(self.last - 1), "end")
+        self.widget.mark_unset(self.mark(self.last - 1))
+        self.last -= 1
+    self.widget.yview("transcript_view")
+
+  def on_view(self, top, bottom):
+    if self.loading:
+      return
+    if top <= 0 and bottom < 1 and self.first > self.base:
+      self.loading = True
+      self.widget.after_idle(self.load_older)
+    elif bottom >= 1 and top > 0 and not self.is_live():
+      self.loading = True
+      self.widget.after_idle(self.load_newer)
+
+  def load_older(self):
+    try:
+      start = max(self.base, self.first - self.page_messages)
+      self.widget.configure(state="normal")
+      self.widget.mark_set("transcript_view", "@0,0")
+      self.widget.mark_set("transcript_insert", "1.0")
+      self.widget.mark_gravity("transcript_insert", "right")
+      # The old first mark shares the insert position and must move with the new text
+      self.widget.mark_gravity(self.mark(self.first), "right")
+      for offset, segments in enumerate(self.history.load(start, self.first)):
+        self.insert_message(start + offset, segments, "transcript_insert")
+      self.widget.mark_gravity(self.mark(self.first), "left")
+      self.first = start
+      self.widget.yview("transcript_view")
+      self.trim()
+      self.widget.configure(state="disabled")
+    finally:
+      self.loading = False
+
+  def load_newer(self):
+    try:
+      self.widget.configure(state="normal")
+      stop = min(self.history.count(), self.last + self.page_messages)
+      for segments in self.history.load(self.last, stop):
+        self.insert_message(self.last, segments, "end-1c")
+        self.last += 1
+      if self.current is not None and self.last == self.history.count():
+        self.insert_message(self.last, self.current, "end-1c")
+        self.last += 1
+      self.trim()
+      self.widget.configure(state="disabled")
+    finally:
+      self.loading = False
@@ -0,0 +1,31 @@
+import numpy as np
+from langchain.schema import Document
+from Core.context_manager import ContextManager, KBResult, reciprocal_rank_fusion
+
+def make_doc(kb, chunk, score=0.0):
+    return Document(page_content=f"{kb} chunk {chunk}", metadata={"knowledge_base": kb, "chunk_id": f"{kb}-{chunk}", "relevance_score": score})
+
+def test_rrf_ranks_documents_found_by_both_lists_first():
+    vector = [make_doc("a", 1), make_doc("a", 2), make_doc("a", 3)]
+    lexical = [make_doc("a", 3), make_doc("a", 4)]
+    fused = reciprocal_rank_fusion([vector, lexical], k=60)
+    assert [doc.metadata["chunk_id"] for doc in fused[:2]] == ["a-3", "a-1"]
+    assert fused[0].metadata["relevance_score"] == 1 / 63 + 1 / 61
+    # Second place in either list is worth the same
+    assert fused[2].metadata["relevance_score"] == fused[3].metadata["relevance_score"]
+
+def test_rrf_keeps_equal_chunk_ids_of_different_kbs_apart():
+    fused = reciprocal_rank_fusion([[make_doc("a", 1)], [Document(page_content="other", metadata={"knowledge_base": "b", "chunk_id": "a-1"})]])
+    assert len(fused) == 2
+
+def test_hybrid_fusion_drops_near_duplicate_vectors():
+    rng = np.random.default_rng(0)
+    query = rng.normal(size=8).astype(np.float32)
+    result = KBResult("a")
+    result.vector_docs = [make_doc("a", i, 0.99 - i * 0.01) for i in range(4)]
+    # The first three chunks have nearly the same embedding, the last one points elsewhere
+    result.embeddings = np.vstack([query, query * 1.001, query * 0.999, rng.normal(size=8)]).astype(np.float32)
+    picked = ContextManager.fuse_documents(None, [result], query)
+    ids = [doc.metadata["chunk_id"] for doc in picked]
+    assert ids[0] == "a-0"
+    assert "a-3" in ids[:2]
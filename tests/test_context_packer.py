@@ -0,0 +1,28 @@
+from langchain.schema import Document
+from Core.context_packer import count_tokens, pack_context
+
+def test_overlapping_chunks_of_one_source_are_merged():
+    text = "one two three four five six seven eight nine ten"
+    first = Document(page_content=text[:23], metadata={"source": "s", "start_index": 0, "relevance_score": 0.5})
+    second = Document(page_content=text[14:], metadata={"source": "s", "start_index": 14, "relevance_score": 0.9})
+    packed = pack_context([first, second], 1000)
+    assert [doc.page_content for doc in packed] == [text]
+    assert packed[0].metadata["relevance_score"] == 0.9
+
+def test_best_documents_are_kept_within_the_budget():
+    docs = [Document(page_content=f"document {i} " + "word " * 100, metadata={"relevance_score": i}) for i in range(5)]
+    budget = count_tokens(docs[0].page_content) * 2 + 5
+    packed = pack_context(docs, budget, min_fragment_tokens=1000)
+    assert [doc.metadata["relevance_score"] for doc in packed] == [4, 3]
+    assert sum(count_tokens(doc.page_content) for doc in packed) <= budget
+
+def test_documents_contained_in_another_are_dropped():
+    outer = Document(page_content="the router restarts after the update", metadata={"relevance_score": 1.0})
+    inner = Document(page_content="restarts after the update", metadata={"relevance_score": 0.5, "compressed": True})
+    assert pack_context([outer, inner], 1000) == [outer]
+
+def test_a_document_that_doesnt_fit_is_cut_to_the_remaining_budget():
+    doc = Document(page_content="word " * 500, metadata={"relevance_score": 1.0})
+    packed = pack_context([doc], 100, min_fragment_tokens=50)
+    assert len(packed) == 1
+    assert count_tokens(packed[0].page_content) <= 100
@@ -0,0 +1,76 @@
+import time
+import pytest
+from Core.conversation_store import ConversationStore
+from Core.chat_memory import ChatMemory
+from Core.embedding_backends import HashingEmbeddingBackend
+
+def exchange(question, answer="Try restarting it."):
+    return [{"role": "user", "type": "message", "content": question}, {"role": "assistant", "type": "message", "content": answer}]
+
+@pytest.fixture
+def store(tmp_path):
+    store = ConversationStore(str(tmp_path / "conversations.sqlite"))
+    yield store
+    store.close()
+
+def age_sessions(store, sessions, days):
+    store.db.execute(f"UPDATE sessions SET updated = ? WHERE id IN ({','.join('?' * len(sessions))})",
+                     [time.time() - days * 86400] + sessions)
+    store.db.commit()
+
+def add_sessions(store, count):
+    sessions = []
+    for i in range(count):
+        store.start_session()
+        store.append_messages(exchange(f"printer question {i}"))
+        sessions.append(store.session)
+    return sessions
+
+def test_compact_removes_old_sessions_with_their_messages(store):
+    sessions = add_sessions(store, 4)
+    store.append_transcript([("text", None)])
+    age_sessions(store, sessions[:2], 100)
+    assert store.compact(90) == sessions[:2]
+    assert [session["id"] for session in store.list_sessions()] == sessions[:1:-1]
+    assert store.messages(sessions[0]) == []
+    assert len(store.messages(sessions[2])) == 2
+    # The full-text index no longer returns the removed messages
+    assert {hit["session"] for hit in store.search("printer")} == set(sessions[2:])
+
+def test_compact_keeps_the_current_session(store):
+    sessions = add_sessions(store, 2)
+    age_sessions(store, sessions, 100)
+    assert store.compact(90) == sessions[:1]
+    assert store.messages(sessions[1]) != []
+
+def test_compact_returns_freed_pages(store):
+    store.start_session()
+    store.append_messages(exchange("long question " * 2000))
+    old = store.session
+    add_sessions(store, 1)
+    age_sessions(store, [old], 100)
+    pages = store.db.execute("PRAGMA page_count").fetchone()[0]
+    store.compact(90)
+    assert store.db.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    assert store.db.execute("PRAGMA page_count").fetchone()[0] < pages
+
+def test_chat_memory_forgets_compacted_sessions(store, tmp_path):
+    sessions = add_sessions(store, 3)
+    memory = ChatMemory(store, HashingEmbeddingBackend(64), str(tmp_path / "memory"), min_score=0.0)
+    memory.index_pending().result()
+    assert memory.vectors.count() == 3
+    age_sessions(store, sessions[:2], 100)
+    store.compact(90)
+    memory.prune_pending().result()
+    question = store.db.execute("SELECT MIN(id) FROM messages WHERE session = ?", (sessions[2],)).fetchone()[0]
+    assert memory.vectors.ids() == [f"exchange-{question}"]
+    memory.close()
+
+def test_exchanges_returns_an_exchange_longer_than_the_page_whole(store):
+    store.start_session()
+    steps = [{"role": "assistant", "type": "message", "content": f"step {i}"} for i in range(10)]
+    store.append_messages([exchange("printer question")[0]] + steps)
+    store.append_messages(exchange("second question"))
+    exchanges, _ = store.exchanges(limit=4)
+    assert exchanges[0]["answer"].split("\n") == [f"step {i}" for i in range(10)]
+    assert [e["question"] for e in exchanges] == ["printer question", "second question"]
@@ -0,0 +1,48 @@
+import os
+from Core.kb_manifest import KBManifest
+
+def write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+def test_new_and_changed_files_are_reported(tmp_path):
+    first, second = str(tmp_path / "first.txt"), str(tmp_path / "second.txt")
+    write(first, "one")
+    write(second, "two")
+    manifest = KBManifest(str(tmp_path / "db"))
+    changed = manifest.scan_files([first, second])
+    assert sorted(changed) == [first, second]
+    for path, entry in changed.items():
+        manifest.update(path, entry, [path + "-chunk"])
+
+    assert manifest.scan_files([first, second]) == {}
+    write(second, "changed")
+    assert list(manifest.scan_files([first, second])) == [second]
+
+def test_touched_but_identical_files_are_not_reported(tmp_path):
+    path = str(tmp_path / "doc.txt")
+    write(path, "same")
+    manifest = KBManifest(str(tmp_path / "db"))
+    manifest.update(path, manifest.scan_files([path])[path], ["chunk"])
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert manifest.scan_files([path]) == {}
+    assert manifest.entries[path]["mtime"] == stat.st_mtime_ns + 10 ** 9
+
+def test_removed_sources_and_their_chunks(tmp_path):
+    manifest = KBManifest(str(tmp_path / "db"))
+    manifest.update("a.txt", {"kind": "file", "size": 1, "mtime": 1, "hash": "a"}, ["a1", "a2"])
+    manifest.update("b.txt", {"kind": "file", "size": 1, "mtime": 1, "hash": "b"}, ["b1"])
+    manifest.update("https://example.com", {"kind": "url", "hash": "c"}, ["c1"])
+    removed = manifest.removed_sources("file", ["b.txt"])
+    assert removed == ["a.txt"]
+    assert manifest.chunk_ids(removed) == ["a1", "a2"]
+    manifest.remove(removed)
+    assert sorted(manifest.entries) == ["b.txt", "https://example.com"]
+
+def test_save_and_load(tmp_path):
+    manifest = KBManifest(str(tmp_path / "db"))
+    manifest.update("a.txt", {"kind": "file", "size": 1, "mtime": 1, "hash": "a"}, ["a1"])
+    manifest.save()
+    assert KBManifest.load(str(tmp_path / "db")).entries == manifest.entries
+    assert KBManifest.load(str(tmp_path / "missing")) is None
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from Core.kb_snapshot import KBSnapshot, SnapshotError, write_snapshot
+from Core.vector_store import NumpyStore
+
+def build_store(path, count=30):
+    store = NumpyStore(path)
+    vectors = np.random.default_rng(0).normal(size=(count, 8)).astype(np.float32)
+    store.add([f"chunk-{i}" for i in range(count)], [f"text {i}" for i in range(count)],
+              [{"source": "doc.txt", "start_index": i} for i in range(count)], vectors)
+    return store, vectors
+
+def test_export_and_import_round_trip(tmp_path):
+    store, vectors = build_store(str(tmp_path / "source"))
+    entries = {"doc.txt": {"kind": "file", "size": 1, "mtime": 1, "hash": "h", "chunk_ids": ["chunk-0"]}}
+    header = write_snapshot(str(tmp_path / "kb.snapshot"), "kb", store.iter_batches(7), entries, "model")
+    store.close()
+    assert header["count"] == 30
+
+    snapshot = KBSnapshot(str(tmp_path / "kb.snapshot"))
+    snapshot.verify()
+    assert (snapshot.knowledge_base, snapshot.embedding_model, snapshot.count) == ("kb", "model", 30)
+    assert snapshot.manifest_entries() == entries
+    assert snapshot.record(3)["text"] == "text 3"
+
+    imported = NumpyStore(str(tmp_path / "imported"))
+    for ids, texts, metadatas, embeddings in snapshot.iter_batches(8):
+        imported.add(ids, texts, metadatas, embeddings)
+    assert imported.count() == 30
+    docs, _ = imported.search(vectors[12], 1)
+    assert docs[0].page_content == "text 12"
+    assert docs[0].metadata["start_index"] == 12
+    imported.close()
+
+def test_float16_snapshots_keep_vectors_close(tmp_path):
+    store, vectors = build_store(str(tmp_path / "source"), 5)
+    write_snapshot(str(tmp_path / "kb.snapshot"), "kb", store.iter_batches(), {}, "model", "float16")
+    store.close()
+    exported = np.vstack([embeddings for _, _, _, embeddings in KBSnapshot(str(tmp_path / "kb.snapshot")).iter_batches()])
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    assert np.allclose(exported, normalized, atol=1e-3)
+
+def test_corruption_is_detected(tmp_path):
+    store, _ = build_store(str(tmp_path / "source"), 5)
+    path = str(tmp_path / "kb.snapshot")
+    write_snapshot(path, "kb", store.iter_batches(), {}, "model")
+    store.close()
+    with open(path, "r+b") as f:
+        f.seek(-10, 2)
+        byte = f.read(1)
+        f.seek(-10, 2)
+        f.write(bytes([byte[0] ^ 0xFF]))
+    with pytest.raises(SnapshotError):
+        KBSnapshot(path).verify()
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("not a snapshot")
+    with pytest.raises(SnapshotError):
+        KBSnapshot(str(path))
@@ -0,0 +1,52 @@
+import os
+import pytest
+from Core import kb_version
+from Core.kb_version import create_staging, commit_staging, get_kb_path, get_kb_version, STAGING_PREFIX
+
+@pytest.fixture
+def chroma_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(kb_version, "CHROMA_PATH", str(tmp_path))
+    return tmp_path
+
+def test_commit_publishes_the_staged_build(chroma_path):
+    staging = create_staging("kb")
+    with open(os.path.join(staging, "data.txt"), "w") as f:
+        f.write("first")
+    version = commit_staging("kb", staging)
+    assert get_kb_version("kb") == version
+    with open(os.path.join(get_kb_path("kb"), "data.txt")) as f:
+        assert f.read() == "first"
+
+def test_commit_keeps_the_previous_build_and_removes_older_ones(chroma_path):
+    paths = []
+    for _ in range(3):
+        commit_staging("kb", create_staging("kb"))
+        paths.append(get_kb_path("kb"))
+    assert not os.path.exists(paths[0])
+    assert os.path.isdir(paths[1])
+    assert os.path.isdir(paths[2])
+
+def test_commit_leaves_other_writers_staging_folders(chroma_path):
+    commit_staging("kb", create_staging("kb"))
+    other = create_staging("kb")
+    commit_staging("kb", create_staging("kb"))
+    assert os.path.isdir(other)
+    assert os.path.basename(other).startswith(STAGING_PREFIX)
+
+def test_staging_copies_the_current_build(chroma_path):
+    staging = create_staging("kb")
+    with open(os.path.join(staging, "data.txt"), "w") as f:
+        f.write("first")
+    commit_staging("kb", staging)
+    assert os.listdir(create_staging("kb")) == ["data.txt"]
+    assert os.listdir(create_staging("kb", copy_current=False)) == []
+
+def test_commit_replaces_a_build_in_the_pre_versioning_layout(chroma_path):
+    legacy = chroma_path / "kb"
+    legacy.mkdir()
+    (legacy / "chroma.sqlite3").write_text("old")
+    commit_staging("kb", create_staging("kb", copy_current=False))
+    # The legacy files are the previous build, kept until the next commit
+    assert (legacy / "chroma.sqlite3").exists()
+    commit_staging("kb", create_staging("kb", copy_current=False))
+    assert not (legacy / "chroma.sqlite3").exists()
@@ -0,0 +1,47 @@
+import pytest
+from langchain.schema import Document
+from Core.lexical_index import LexicalIndex, is_keyword_query
+
+@pytest.mark.parametrize("query", ['"exact phrase"', "error E1234", "config.py", "set_dtype", "v2 release"])
+def test_identifier_and_quoted_queries_are_keyword_queries(query):
+    assert is_keyword_query(query)
+
+@pytest.mark.parametrize("query", ["", "how do I restart the router", "what does the error on line 12 of the printer manual mean"])
+def test_questions_are_not_keyword_queries(query):
+    assert not is_keyword_query(query)
+
+def make_docs(count, text):
+    return [Document(page_content=f"{text} {i}", metadata={"chunk_id": f"{text}-{i}"}) for i in range(count)]
+
+def test_search_ranks_by_bm25(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    index.add(make_docs(3, "router firmware") + [Document(page_content="router router firmware", metadata={"chunk_id": "both"})])
+    index.add(make_docs(3, "printer toner"))
+    results = index.search("router", 10)
+    assert results[0].metadata["chunk_id"] == "both"
+    assert len(results) == 4
+
+def test_deleted_chunks_leave_results_and_document_frequency(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    index.add(make_docs(5, "router"))
+    assert index.delete(["router-1", "router-2", "missing"]) == 2
+    assert index.delete(["router-1"]) == 0
+    assert sum(segment.document_frequency("router") for segment in index.segments) == 3
+    assert sorted(doc.metadata["chunk_id"] for doc in index.search("router", 10)) == ["router-0", "router-3", "router-4"]
+    index.close()
+
+    # Tombstones survive reopening, and re-adding a chunk replaces it
+    index = LexicalIndex(str(tmp_path))
+    assert sum(segment.document_frequency("router") for segment in index.segments) == 3
+    index.add([Document(page_content="router again", metadata={"chunk_id": "router-0"})])
+    assert [doc.page_content for doc in index.search("again", 10)] == ["router again"]
+    assert len(index.search("router", 10)) == 3
+
+def test_compaction_keeps_only_live_chunks(tmp_path):
+    index = LexicalIndex(str(tmp_path), max_segments=2)
+    for i in range(3):
+        index.add(make_docs(2, f"batch{i}"))
+    index.delete(["batch0-0"])
+    index.compact()
+    assert len(index.segments) == 1
+    assert index.segments[0].live_count() == 5
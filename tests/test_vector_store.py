@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from Core.vector_store import NumpyStore, maximal_marginal_relevance
+
+def random_vectors(count, dimensions=16, seed=0):
+    return np.random.default_rng(seed).normal(size=(count, dimensions)).astype(np.float32)
+
+def add_chunks(store, vectors, start=0):
+    ids = [f"chunk-{start + i}" for i in range(len(vectors))]
+    store.add(ids, [f"text {start + i}" for i in range(len(vectors))], [{"source": "doc.txt"} for _ in ids], vectors)
+    return ids
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_search_finds_the_stored_vector(tmp_path, dtype):
+    store = NumpyStore(str(tmp_path), dtype)
+    vectors = random_vectors(50)
+    add_chunks(store, vectors)
+    docs, embeddings = store.search(vectors[7], 3)
+    assert docs[0].page_content == "text 7"
+    assert docs[0].metadata["relevance_score"] == pytest.approx(1.0, abs=0.02)
+    assert embeddings.shape == (3, 16)
+    store.close()
+
+def test_deleted_chunks_are_not_returned(tmp_path):
+    store = NumpyStore(str(tmp_path))
+    vectors = random_vectors(10)
+    ids = add_chunks(store, vectors)
+    store.delete(ids[:5])
+    assert store.count() == 5
+    docs, _ = store.search(vectors[2], 10)
+    assert sorted(doc.page_content for doc in docs) == [f"text {i}" for i in range(5, 10)]
+    store.close()
+
+def test_adding_an_id_again_replaces_it(tmp_path):
+    store = NumpyStore(str(tmp_path))
+    vectors = random_vectors(3)
+    store.add(["a", "b", "a"], ["first", "second", "third"], [{}, {}, {}], vectors)
+    store.add(["b"], ["fourth"], [{}], vectors[:1])
+    assert store.count() == 2
+    docs, _ = store.search(vectors[2], 2)
+    assert docs[0].page_content == "third"
+    docs, _ = store.search(vectors[0], 2)
+    assert sorted(doc.page_content for doc in docs) == ["fourth", "third"]
+    store.close()
+
+def test_chunks_survive_reopening(tmp_path):
+    store = NumpyStore(str(tmp_path), "int8")
+    vectors = random_vectors(20)
+    add_chunks(store, vectors)
+    store.delete(["chunk-0"])
+    store.close()
+    store = NumpyStore(str(tmp_path), "int8")
+    assert store.count() == 19
+    docs, _ = store.search(vectors[4], 1)
+    assert docs[0].page_content == "text 4"
+    store.close()
+
+def test_mmr_prefers_a_different_document_over_a_duplicate():
+    query = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+    embeddings = np.array([[1.0, 0.1, 0.0], [1.0, 0.1, 0.0], [0.7, 0.0, 0.7]], dtype=np.float32)
+    assert maximal_marginal_relevance(query, embeddings, 2, 0.5) == [0, 2]